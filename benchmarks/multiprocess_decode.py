@@ -0,0 +1,130 @@
+"""Benchmark frames/sec decoded across three loaded busses.
+
+Compares decoding on the RX threads of each ``Can``, which share the GIL with a
+busy test script, against ``Can(decode_process_bus_kwargs=...)``, which receives and
+decodes each bus in its own process.
+
+The busses are python-can ``udp_multicast`` busses, so sender and decode processes
+can share them, each flooded by its own sender process.
+
+Run with:
+    python benchmarks/multiprocess_decode.py [--dbc PATH_OR_URL] [--secs N]
+"""
+
+import argparse
+import multiprocessing
+import random
+import time
+import can
+from formula_e_hil.can import Can, LATEST_DBC_URL
+
+CHANNELS = ["239.74.163.10", "239.74.163.11", "239.74.163.12"]
+
+
+def flood(channel, dbc_source, secs, ready, start):
+    """Send random frames from the dbc as fast as possible, in a sender process."""
+
+    from formula_e_hil import dbc
+
+    db = dbc.default_registry.get(dbc_source)
+    rng = random.Random(channel)
+    frames = [
+        can.Message(
+            arbitration_id=message.frame_id,
+            is_extended_id=message.is_extended_frame,
+            data=bytes(rng.getrandbits(8) for _ in range(message.length)),
+        )
+        for message in db.messages
+        for _ in range(16)
+    ]
+    rng.shuffle(frames)
+
+    with can.Bus(interface="udp_multicast", channel=channel) as bus:
+        ready.set()
+        start.wait()
+        end = time.perf_counter() + secs
+        while time.perf_counter() < end:
+            for frame in frames:
+                bus.send(frame)
+
+
+def busy_script(secs):
+    """Stand-in for a test script, holding the GIL in pure Python."""
+
+    end = time.perf_counter() + secs
+    total = 0
+    while time.perf_counter() < end:
+        for value in range(1000):
+            total += value * value
+    return total
+
+
+def run(dbc_source, secs, decode_process):
+    """Return frames/sec decoded over all busses."""
+
+    received = [0]
+
+    def count(_message):
+        received[0] += 1
+
+    busses = []
+    for channel in CHANNELS:
+        kwargs = {"interface": "udp_multicast", "channel": channel}
+        bus = Can(
+            can.Bus(**kwargs),
+            dbc_source,
+            decode_process_bus_kwargs=kwargs if decode_process else None,
+        )
+        if not decode_process:
+            bus.add_rx_listener(count)
+        busses.append(bus)
+
+    context = multiprocessing.get_context("spawn")
+    start = context.Event()
+    senders = []
+    for channel in CHANNELS:
+        ready = context.Event()
+        sender = context.Process(
+            target=flood, args=(channel, dbc_source, secs, ready, start)
+        )
+        sender.start()
+        ready.wait()
+        senders.append(sender)
+
+    start.set()
+    begin = time.perf_counter()
+    busy_script(secs)
+    elapsed = time.perf_counter() - begin
+
+    if decode_process:
+        decoded = sum(
+            bus.rx_table.frames_decoded + bus.rx_table.unknown_frames for bus in busses
+        )
+    else:
+        decoded = received[0]
+
+    for sender in senders:
+        sender.join()
+    for bus in busses:
+        bus.__exit__()
+        bus._can_bus.shutdown()
+
+    return decoded / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--dbc", default=LATEST_DBC_URL)
+    parser.add_argument("--secs", type=float, default=5.0)
+    args = parser.parse_args()
+
+    before = run(args.dbc, args.secs, decode_process=False)
+    after = run(args.dbc, args.secs, decode_process=True)
+
+    print(f"busses: {len(CHANNELS)}")
+    print(f"rx threads:      {before:12,.0f} frames/sec")
+    print(f"decode process:  {after:12,.0f} frames/sec ({after / before:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""Benchmark frames/sec decoded by the CAN RX path.
+
+Compares the original RX path (a frame id lookup, then a second lookup inside
+``decode_message``) against the prebuilt frame id dispatch table used by ``Can``,
+and against ``Can(lazy_decode=True)``, which defers decoding to the reader.
+
+Run with:
+    python benchmarks/rx_dispatch.py [--dbc PATH_OR_URL] [--frames N]
+"""
+
+import argparse
+import random
+import time
+import can
+from formula_e_hil.can import Can, LATEST_DBC_URL
+
+
+def make_frames(db, count):
+    """Build random frames, drawn uniformly from every message in the dbc."""
+
+    rng = random.Random(0)
+    templates = [
+        (message.frame_id, message.length, message.is_extended_frame)
+        for message in db.messages
+    ]
+    frames = []
+    for _ in range(count):
+        frame_id, length, is_extended = rng.choice(templates)
+        frames.append(
+            can.Message(
+                arbitration_id=frame_id,
+                is_extended_id=is_extended,
+                data=bytes(rng.getrandbits(8) for _ in range(length)),
+            )
+        )
+    return frames
+
+
+def legacy_handle_rx_frame(bus, raw_message):
+    """Original RX loop body, before the dispatch table."""
+
+    name = bus._db.get_message_by_frame_id(raw_message.arbitration_id).name
+    message = bus._db.decode_message(raw_message.arbitration_id, raw_message.data)
+    bus.rx_table[name] = message
+
+
+def measure(handler, bus, frames):
+    """Return frames/sec decoded by handler."""
+
+    start = time.perf_counter()
+    for frame in frames:
+        handler(bus, frame)
+    return len(frames) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--dbc", default=LATEST_DBC_URL)
+    parser.add_argument("--frames", type=int, default=200_000)
+    args = parser.parse_args()
+
+    with can.Bus(interface="virtual", channel="rx_dispatch_benchmark") as bus_handle:
+        bus = Can(bus_handle, args.dbc)
+        lazy_bus = Can(bus_handle, args.dbc, lazy_decode=True)
+        frames = make_frames(bus._db, args.frames)
+
+        before = measure(legacy_handle_rx_frame, bus, frames)
+        after = measure(Can._handle_rx_frame, bus, frames)
+        lazy = measure(Can._handle_rx_frame, lazy_bus, frames)
+
+        bus.__exit__()
+        lazy_bus.__exit__()
+
+    print(f"messages in dbc: {len(bus._db.messages)}")
+    print(f"before: {before:12,.0f} frames/sec")
+    print(f"after:  {after:12,.0f} frames/sec ({after / before:.2f}x)")
+    print(f"lazy:   {lazy:12,.0f} frames/sec ({lazy / before:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
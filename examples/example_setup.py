@@ -29,13 +29,20 @@ hil.rsm_fakes.set_flow_rate(60)
 time.sleep(1)
 
 # Transmit "magic_message" message every 0.5 seconds over the bms can bus.
+start_time = time.time()
 periodic_handler = hil.bms_bus.transmit_message_periodic(
     0.5, "magic_message", {"magic_signal": 10, "magic_signal_2": 10}
 )
-time.sleep(1)
 
-# Check that inverter_signal is 10
-assert hil.inverter_bus.receive("inverter_message", "inverter_signal") == 10
+# Wait (up to 1 second) for inverter_signal to be 10.
+# Returns as soon as the matching frame is received, with its timestamp.
+response_timestamp = hil.inverter_bus.wait_for(
+    "inverter_message", "inverter_signal", lambda value: value == 10, timeout=1
+)
+print("Response time (s):", response_timestamp - start_time)
+
+# Change one signal while transmitting, the other keeps its value.
+periodic_handler.update(magic_signal=20)
 time.sleep(1)
 
 # Stop transmit of "magic_message"
@@ -1,24 +1,382 @@
-from .fsm_fakes import FsmFakes
-from .rsm_fakes import RsmFakes
-from .can import Can
-import can
+from __future__ import annotations
+from typing import TYPE_CHECKING, Any, Callable, Dict, Optional
+import concurrent.futures
+import importlib
+import logging
+import signal
+import threading
+import time
+
+if TYPE_CHECKING:
+    import can
+    from .can import Can
+    from .fsm_fakes import FsmFakes
+    from .metrics import MetricsServer
+    from .rsm_fakes import RsmFakes
+    from .signal_log import SignalLogger
+
+logger = logging.getLogger(__name__)
+
+# Exports, imported on first access so ``import formula_e_hil`` stays cheap.
+# Maps from exported name to the submodule defining it.
+_LAZY_EXPORTS = {
+    "FsmFakes": ".fsm_fakes",
+    "RsmFakes": ".rsm_fakes",
+    "Can": ".can",
+    "LATEST_DBC_URL": ".can",
+    "VirtualSsm": ".virtual_ssm",
+    "BusMetrics": ".metrics",
+    "MetricsServer": ".metrics",
+    "SsmMetrics": ".metrics",
+    "prometheus_text": ".metrics",
+    "SignalLogger": ".signal_log",
+    "read_signal_log": ".signal_log",
+}
+
+# Subsystems of a HIL, in the order they are reported.
+_SUBSYSTEMS = ("fsm_fakes", "rsm_fakes", "bms_bus", "inverter_bus", "sensor_bus")
+
+
+def __getattr__(name: str) -> Any:
+    """Import exports on first access, see PEP 562."""
+
+    if name not in _LAZY_EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    value = getattr(importlib.import_module(_LAZY_EXPORTS[name], __name__), name)
+    globals()[name] = value
+    return value
 
 
 class Hil:
     def __init__(
-        self, bms_bus: can.BusABC, inverter_bus: can.BusABC, sensor_bus: can.BusABC
+        self,
+        bms_bus: can.BusABC,
+        inverter_bus: can.BusABC,
+        sensor_bus: can.BusABC,
+        fsm_backend: Optional[Any] = None,
+        rsm_backend: Optional[Any] = None,
+        dbc_url: Optional[str] = None,
+        decode_process_bus_kwargs: Optional[Dict[str, Dict[str, Any]]] = None,
+        metrics: bool = False,
+        lazy: bool = False,
     ):
         """Wrapper for the HIL system.
 
+        The SSMs and busses are brought up concurrently, on a thread each.
+        The time each took is reported in ``startup_secs``. If any fails to come up,
+        the ones that did are shut down before the error is raised.
+        In both modes, SIGINT stops the RX thread of every bus brought up.
+
         Args:
             bms_bus: python-can CAN bus handle for bms bus.
             inverter_bus: python-can CAN bus handle for inverter bus.
             sensor_bus: python-can CAN bus handle for sensor bus.
+            fsm_backend: Chimera SSM handle for the FSM, defaults to real hardware.
+            rsm_backend: Chimera SSM handle for the RSM, defaults to real hardware.
+            dbc_url: Source of the dbc file, defaults to latest release.
+            decode_process_bus_kwargs: Busses to receive and decode in separate
+                processes, keyed by "bms", "inverter", or "sensor",
+                see ``Can(decode_process_bus_kwargs=...)``.
+            metrics: If true, collect runtime metrics, see ``metrics_snapshot``.
+                Off by default, can be enabled later with ``set_metrics_enabled``.
+            lazy: If true, bring up each SSM and bus on first access instead,
+                so subsystems a test never touches cost nothing.
+
+        """
+
+        decode_process_bus_kwargs = decode_process_bus_kwargs or {}
+
+        def make_fsm_fakes() -> FsmFakes:
+            from .fsm_fakes import FsmFakes
+
+            return FsmFakes(fsm_backend)
+
+        def make_rsm_fakes() -> RsmFakes:
+            from .rsm_fakes import RsmFakes
+
+            return RsmFakes(rsm_backend)
+
+        def make_bus(name: str, bus_handle: can.BusABC) -> Callable[[], Can]:
+            def make() -> Can:
+                from .can import Can, LATEST_DBC_URL
+
+                return Can(
+                    bus_handle,
+                    LATEST_DBC_URL if dbc_url is None else dbc_url,
+                    decode_process_bus_kwargs=decode_process_bus_kwargs.get(name),
+                )
+
+            return make
+
+        self._factories: Dict[str, Callable[[], Any]] = {
+            "fsm_fakes": make_fsm_fakes,
+            "rsm_fakes": make_rsm_fakes,
+            "bms_bus": make_bus("bms", bms_bus),
+            "inverter_bus": make_bus("inverter", inverter_bus),
+            "sensor_bus": make_bus("sensor", sensor_bus),
+        }
+
+        # Subsystems brought up so far, each created once under its own lock.
+        self._subsystems: Dict[str, Any] = {}
+        self._subsystem_locks = {name: threading.Lock() for name in _SUBSYSTEMS}
+        self._metrics_enabled = metrics
+
+        # Time taken to bring up each subsystem, and the whole HIL, in seconds.
+        self.startup_secs: Dict[str, float] = {}
+
+        self._install_sigint_handler()
+        if lazy:
+            return
+
+        start = time.perf_counter()
+        with concurrent.futures.ThreadPoolExecutor(len(_SUBSYSTEMS)) as executor:
+            futures = [executor.submit(self._subsystem, name) for name in _SUBSYSTEMS]
+
+        errors = [
+            future.exception() for future in futures if future.exception() is not None
+        ]
+        if errors:
+            # Don't leave the subsystems that did come up running.
+            self.__exit__()
+            raise errors[0]
+        self.startup_secs["total"] = time.perf_counter() - start
+
+        logger.info(
+            "HIL up in %.3f s (%s).",
+            self.startup_secs["total"],
+            ", ".join(
+                f"{name} {self.startup_secs[name]:.3f} s" for name in _SUBSYSTEMS
+            ),
+        )
+
+    def _subsystem(self, name: str) -> Any:
+        """Get a subsystem, bringing it up on first access. For internal use only."""
+
+        subsystem = self._subsystems.get(name)
+        if subsystem is not None:
+            return subsystem
+
+        with self._subsystem_locks[name]:
+            subsystem = self._subsystems.get(name)
+            if subsystem is None:
+                start = time.perf_counter()
+                subsystem = self._factories[name]()
+                self.startup_secs[name] = time.perf_counter() - start
+
+                self._apply_metrics_enabled(subsystem)
+                self._subsystems[name] = subsystem
+
+                # A bus brought up on the main thread replaced the handler.
+                self._install_sigint_handler()
+
+        return subsystem
+
+    def _install_sigint_handler(self):
+        """Stop every bus's RX thread on SIGINT, rather than a single bus's.
+        For internal use only.
+
+        Signal handlers can only be installed from the main thread,
+        busses brought up elsewhere install none.
 
         """
 
-        self.fsm_fakes = FsmFakes()
-        self.rsm_fakes = RsmFakes()
-        self.bms_bus = Can(bms_bus)
-        self.inverter_bus = Can(inverter_bus)
-        self.sensor_bus = Can(sensor_bus)
+        if threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGINT, lambda _signalnum, _handler: self._on_sigint())
+
+    def _on_sigint(self):
+        """Stop every bus's RX thread. For internal use only."""
+
+        for name in ("bms_bus", "inverter_bus", "sensor_bus"):
+            bus = self._subsystems.get(name)
+            if bus is not None:
+                bus._can_rx_exit_event.set()
+
+    @property
+    def fsm_fakes(self) -> FsmFakes:
+        """Interface to the FSM, through its SSM."""
+
+        return self._subsystem("fsm_fakes")
+
+    @property
+    def rsm_fakes(self) -> RsmFakes:
+        """Interface to the RSM, through its SSM."""
+
+        return self._subsystem("rsm_fakes")
+
+    @property
+    def bms_bus(self) -> Can:
+        """Interface to the bms bus."""
+
+        return self._subsystem("bms_bus")
+
+    @property
+    def inverter_bus(self) -> Can:
+        """Interface to the inverter bus."""
+
+        return self._subsystem("inverter_bus")
+
+    @property
+    def sensor_bus(self) -> Can:
+        """Interface to the sensor bus."""
+
+        return self._subsystem("sensor_bus")
+
+    def __exit__(self):
+        """Destruct Hil."""
+
+        # Make sure every background thread closes when the class destructs.
+        for name in ("bms_bus", "inverter_bus", "sensor_bus"):
+            bus = self._subsystems.get(name)
+            if bus is not None:
+                bus.__exit__()
+
+        rsm_fakes = self._subsystems.get("rsm_fakes")
+        if rsm_fakes is not None:
+            rsm_fakes.__exit__()
+
+    def set_metrics_enabled(self, enabled: bool):
+        """Enable or disable runtime metrics on every bus and SSM.
+
+        Disabled metrics cost one attribute check per frame or transaction.
+        Enabling starts from zero.
+
+        Args:
+            enabled: True to collect metrics.
+
+        """
+
+        self._metrics_enabled = enabled
+        for subsystem in list(self._subsystems.values()):
+            self._apply_metrics_enabled(subsystem)
+
+    def _apply_metrics_enabled(self, subsystem: Any):
+        """Enable or disable metrics on one subsystem. For internal use only."""
+
+        from .metrics import BusMetrics, SsmMetrics
+
+        enabled = self._metrics_enabled
+        if hasattr(subsystem, "ssm"):
+            subsystem.ssm.metrics = SsmMetrics() if enabled else None
+        else:
+            subsystem.metrics = BusMetrics() if enabled else None
+
+    def metrics_snapshot(self) -> Dict[str, Any]:
+        """Get runtime metrics of the whole HIL.
+
+        Subsystems not yet brought up, see ``lazy``, are left out.
+
+        Returns:
+            Metrics of each bus, see ``Can.metrics_snapshot``,
+            each SSM, see ``Ssm.metrics_snapshot``,
+            and each PWM channel on the RSM, see ``PwmGenerator.stats``.
+
+        """
+
+        subsystems = dict(self._subsystems)
+        rsm_fakes = subsystems.get("rsm_fakes")
+
+        return {
+            "busses": {
+                name: subsystems[f"{name}_bus"].metrics_snapshot()
+                for name in ("bms", "inverter", "sensor")
+                if f"{name}_bus" in subsystems
+            },
+            "ssms": {
+                name: subsystems[f"{name}_fakes"].ssm.metrics_snapshot()
+                for name in ("fsm", "rsm")
+                if f"{name}_fakes" in subsystems
+            },
+            "pwm": {}
+            if rsm_fakes is None
+            else {
+                channel.name: rsm_fakes.pwm.stats(channel)
+                for channel in rsm_fakes.pwm.channels()
+            },
+        }
+
+    def serve_metrics(self, port: int = 9464, host: str = "127.0.0.1") -> MetricsServer:
+        """Serve metrics in Prometheus text format over HTTP, at ``/metrics``.
+
+        Each scrape takes a snapshot, restarting the frames/sec rate window.
+
+        Args:
+            port: Port to listen on, 0 picks a free port.
+            host: Address to listen on, defaults to localhost only.
+
+        Returns:
+            The server, call ``stop`` on it to stop serving.
+
+        """
+
+        from .metrics import MetricsServer, prometheus_text
+
+        return MetricsServer(
+            lambda: prometheus_text(self.metrics_snapshot()), port, host
+        )
+
+    def log_signals(
+        self, directory: str, batch_rows: int = 4096
+    ) -> Dict[str, SignalLogger]:
+        """Stream decoded signals from every bus to disk, see ``SignalLogger``.
+
+        Args:
+            directory: Directory to write the logs into,
+                in a subdirectory per bus, ie. ``<directory>/bms/BMS_Status.npy``.
+            batch_rows: Number of rows per write.
+
+        Returns:
+            The logger of each bus, keyed by "bms", "inverter", and "sensor",
+            call ``stop`` on each to finalize its logs.
+
+        """
+
+        import os
+        from .signal_log import SignalLogger
+
+        return {
+            name: SignalLogger(
+                self._subsystem(f"{name}_bus"),
+                os.path.join(directory, name),
+                batch_rows=batch_rows,
+            )
+            for name in ("bms", "inverter", "sensor")
+        }
+
+    @classmethod
+    def virtual(
+        cls,
+        dbc_url: Optional[str] = None,
+        transaction_latency_secs: float = 0.0,
+        channel_prefix: str = "hil",
+        lazy: bool = False,
+    ) -> Hil:
+        """Create a HIL that needs no hardware,
+        with virtual SSMs and python-can virtual busses.
+
+        Args:
+            dbc_url: Source of the dbc file, defaults to latest release.
+            transaction_latency_secs: Modelled latency of each SSM transaction.
+            channel_prefix: Prefix of the virtual bus channels,
+                other virtual busses on the same channels see the HIL's traffic.
+            lazy: If true, bring up each SSM and bus on first access.
+
+        Returns:
+            The virtual HIL.
+
+        """
+
+        import can
+        from .virtual_ssm import VirtualSsm
+
+        return cls(
+            bms_bus=can.Bus(interface="virtual", channel=f"{channel_prefix}_bms"),
+            inverter_bus=can.Bus(
+                interface="virtual", channel=f"{channel_prefix}_inverter"
+            ),
+            sensor_bus=can.Bus(interface="virtual", channel=f"{channel_prefix}_sensor"),
+            fsm_backend=VirtualSsm(transaction_latency_secs),
+            rsm_backend=VirtualSsm(transaction_latency_secs),
+            dbc_url=dbc_url,
+            lazy=lazy,
+        )
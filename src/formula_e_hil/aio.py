@@ -0,0 +1,221 @@
+from __future__ import annotations
+from typing import Any, AsyncIterator, Callable, Dict, Optional, Sequence, Tuple
+import asyncio
+import concurrent.futures
+import functools
+from .can import Can
+
+
+class AsyncCan:
+    def __init__(self, bus: Can, message_names: Optional[Sequence[str]] = None):
+        """asyncio front-end for a ``Can`` bus. Must be created inside a running loop.
+
+        Built on the bus's public API only. Decoded frames come from subscriptions,
+        whose callbacks hand them to a queue on the loop, the same way
+        ``can.Notifier`` hands frames to an ``AsyncBufferedReader``.
+        Waits are ``Can.expect`` conditions that resolve a future on the loop,
+        so no thread is tied up while waiting.
+
+        Args:
+            bus: Bus to wrap.
+            message_names: If set, only these messages are delivered to ``async for``,
+                defaults to every message in the dbc. They are subscribed to,
+                so with ``filter_to_subscriptions`` the bus's filters are widened
+                to them.
+
+        """
+
+        self._bus = bus
+        self._loop = asyncio.get_running_loop()
+
+        # Decoded frames for ``async for``, None once closed.
+        self._frames_queue: asyncio.Queue = asyncio.Queue()
+
+        # Sends periodic frames, off the loop.
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+
+        self._subscriptions = [
+            bus.subscribe(name, self._on_message)
+            for name in (list(bus.rx_table) if message_names is None else message_names)
+        ]
+
+    def _on_message(self, message_name: str, signals: Dict[str, Any], timestamp: float):
+        """Hand a decoded frame from the dispatcher thread to the loop.
+        For internal use only.
+
+        """
+
+        # Callbacks queued before ``close`` may still run after the loop is gone.
+        if not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(
+                self._frames_queue.put_nowait, (message_name, signals, timestamp)
+            )
+
+    def close(self):
+        """Stop delivering frames to ``async for``, and stop the send worker thread.
+        Cancel periodic tasks first.
+
+        """
+
+        for subscription in self._subscriptions:
+            subscription.unsubscribe()
+        self._loop.call_soon_threadsafe(self._frames_queue.put_nowait, None)
+        self._executor.shutdown(wait=False)
+
+    def __aiter__(self) -> AsyncIterator[Tuple[str, Dict[str, Any], float]]:
+        return self._frames()
+
+    async def _frames(self) -> AsyncIterator[Tuple[str, Dict[str, Any], float]]:
+        """Deliver frames as they arrive, until closed. For internal use only.
+
+        Yields:
+            Tuples of message name, decoded signals, and frame timestamp.
+
+        """
+
+        while True:
+            frame = await self._frames_queue.get()
+            if frame is None:
+                return
+            yield frame
+
+    def receive(self, message_name: str, signal_name: str) -> Optional[Any]:
+        """Receive the latest value of a signal, see ``Can.receive``. Never blocks."""
+
+        return self._bus.receive(message_name, signal_name)
+
+    def transmit_message(self, message_name: str, signals: Dict[str, Any]):
+        """Transmit a message, see ``Can.transmit_message``."""
+
+        self._bus.transmit_message(message_name, signals)
+
+    async def wait_for(
+        self,
+        message_name: str,
+        signal_name: str,
+        predicate: Callable[[Any], bool],
+        timeout: Optional[float] = None,
+    ) -> float:
+        """Await a received frame whose signal satisfies a predicate.
+
+        See ``Can.wait_for``, the RX thread resolves a future on the loop
+        through ``Can.expect``, so no thread is tied up while waiting.
+
+        Args:
+            message_name: Name of the message.
+            signal_name: Name of the signal.
+            predicate: Called with each newly received value of the signal.
+            timeout: Maximum time to wait in seconds, None to wait forever.
+
+        Returns:
+            Timestamp of the matching frame.
+
+        Raises:
+            TimeoutError: No matching frame arrived within the timeout.
+
+        """
+
+        future = self._loop.create_future()
+
+        def resolve():
+            if not future.done():
+                future.set_result(None)
+
+        def predicate_and_notify(value: Any) -> bool:
+            # Wake the loop once the expectation is met, or its predicate raised.
+            try:
+                matched = predicate(value)
+            except Exception:
+                self._loop.call_soon_threadsafe(resolve)
+                raise
+            if matched:
+                self._loop.call_soon_threadsafe(resolve)
+            return matched
+
+        expectation = self._bus.expect(message_name, signal_name, predicate_and_notify)
+
+        try:
+            await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            raise TimeoutError(
+                f"Timed out waiting for {message_name}.{signal_name}."
+            ) from None
+        finally:
+            expectation.cancel()
+
+        # Already met, returns at once, or re-raises the predicate's error.
+        return expectation.wait(0)
+
+    def transmit_message_periodic(
+        self, period_secs: float, message_name: str, signals: Dict[str, Any]
+    ) -> asyncio.Task:
+        """Transmit a message periodically from a task on the loop.
+
+        The frame is sent at absolute deadlines in loop time,
+        so time spent sending never accumulates into drift.
+        Sends go through ``Can.transmit_message`` on a worker thread,
+        so they are counted in the bus's metrics and never block the loop.
+
+        Args:
+            period_secs: Period between succesive transmissions.
+            message_name: Name of message.
+            signals: Map between name of signal and value.
+
+        Returns:
+            The task, cancel it to stop transmitting.
+            If a send fails, the task ends with the ``can.CanError``.
+
+        """
+
+        signals = dict(signals)
+
+        async def transmit_periodic():
+            deadline = self._loop.time()
+            while True:
+                await self._loop.run_in_executor(
+                    self._executor,
+                    self._bus.transmit_message,
+                    message_name,
+                    signals,
+                )
+                deadline += period_secs
+                await asyncio.sleep(max(0.0, deadline - self._loop.time()))
+
+        return self._loop.create_task(transmit_periodic())
+
+
+class AsyncFakes:
+    def __init__(self, fakes: Any):
+        """Non-blocking front-end for ``FsmFakes`` or ``RsmFakes``.
+
+        Every ``set_*`` method of the wrapped fakes becomes a coroutine,
+        run on a single worker thread per SSM so writes keep their order,
+        while the loop carries on during the USB round trip.
+
+        Args:
+            fakes: ``FsmFakes`` or ``RsmFakes`` to wrap.
+
+        """
+
+        self.fakes = fakes
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+
+    def __getattr__(self, name: str) -> Callable:
+        """Wrap ``set_*`` methods of the fakes as coroutines."""
+
+        setter = getattr(self.fakes, name)
+        if not name.startswith("set_"):
+            return setter
+
+        @functools.wraps(setter)
+        async def set_async(*args, **kwargs):
+            return await asyncio.get_running_loop().run_in_executor(
+                self._executor, functools.partial(setter, *args, **kwargs)
+            )
+
+        return set_async
+
+    def close(self):
+        """Stop the worker thread, after finishing queued writes."""
+
+        self._executor.shutdown(wait=True)
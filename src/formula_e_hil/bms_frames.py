@@ -0,0 +1,592 @@
+from __future__ import annotations
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple, Union
+import functools
+import math
+import threading
+import time
+import cantools
+import can
+import numpy as np
+from .can import Can
+from .metrics import Histogram
+from .scheduler import JitterStats
+
+# Signal name for a cell, either a format string with ``{segment}`` and ``{cell}``
+# fields, ie. "BMS_Seg{segment}_Cell{cell}_Voltage", or a function of the two.
+SignalNaming = Union[str, Callable[[int, int], str]]
+
+# Quantities a generator emulates.
+_QUANTITIES = ("voltage", "temperature")
+
+
+def _format_signal_name(pattern: str, segment: int, cell: int) -> str:
+    """Format a cell's signal name. For internal use only."""
+
+    return pattern.format(segment=segment, cell=cell)
+
+
+class CellFault(NamedTuple):
+    """A fault profile applied to one cell's voltage or temperature."""
+
+    # "voltage" or "temperature".
+    quantity: str
+
+    # Cell the fault applies to.
+    segment: int
+    cell: int
+
+    # Value the cell is held at, None to follow the pack state.
+    value: Optional[float] = None
+
+    # Change per second, added on top of the value or pack state.
+    drift_per_sec: float = 0.0
+
+    # Time since the generator started, when the fault takes effect.
+    start_secs: float = 0.0
+
+    @classmethod
+    def overvoltage(
+        cls, segment: int, cell: int, volts: float, start_secs: float = 0.0
+    ) -> CellFault:
+        """Hold a cell at a fixed voltage, ie. above the overvoltage limit.
+
+        Args:
+            segment: Segment of the cell.
+            cell: Cell within the segment.
+            volts: Voltage to hold the cell at.
+            start_secs: Time since the generator started, when the fault takes effect.
+
+        Returns:
+            The fault.
+
+        """
+
+        return cls("voltage", segment, cell, value=volts, start_secs=start_secs)
+
+    @classmethod
+    def drifting(
+        cls,
+        segment: int,
+        cell: int,
+        volts_per_sec: float,
+        start_secs: float = 0.0,
+    ) -> CellFault:
+        """Drift a cell's voltage away from the pack state, ie. a failing cell.
+
+        Args:
+            segment: Segment of the cell.
+            cell: Cell within the segment.
+            volts_per_sec: Rate of the drift, negative to drift down.
+            start_secs: Time since the generator started, when the drift starts.
+
+        Returns:
+            The fault.
+
+        """
+
+        return cls(
+            "voltage",
+            segment,
+            cell,
+            drift_per_sec=volts_per_sec,
+            start_secs=start_secs,
+        )
+
+    @classmethod
+    def overtemperature(
+        cls, segment: int, cell: int, celsius: float, start_secs: float = 0.0
+    ) -> CellFault:
+        """Hold a temperature sensor at a fixed temperature.
+
+        Args:
+            segment: Segment of the sensor.
+            cell: Sensor within the segment.
+            celsius: Temperature to hold the sensor at.
+            start_secs: Time since the generator started, when the fault takes effect.
+
+        Returns:
+            The fault.
+
+        """
+
+        return cls("temperature", segment, cell, value=celsius, start_secs=start_secs)
+
+
+class _Layout:
+    def __init__(self):
+        """Precomputed bit layout of every signal of one quantity, sorted by frame.
+        For internal use only.
+
+        """
+
+        # One entry per signal, filled by ``BmsFrameGenerator._add_signal``,
+        # then frozen into arrays.
+        self.value_index: Any = []
+        self.frame_index: Any = []
+        self.big_endian: Any = []
+        self.shift: Any = []
+        self.scale: Any = []
+        self.offset: Any = []
+        self.raw_min: Any = []
+        self.raw_max: Any = []
+        self.length: Any = []
+
+    def freeze(self):
+        """Convert the entries to arrays, sorted by frame for ``reduceat``."""
+
+        order = np.argsort(self.frame_index, kind="stable")
+        for name, dtype in (
+            ("value_index", np.intp),
+            ("frame_index", np.intp),
+            ("big_endian", bool),
+            ("shift", np.uint64),
+            ("scale", np.float64),
+            ("offset", np.float64),
+            ("raw_min", np.float64),
+            ("raw_max", np.float64),
+            ("length", np.uint64),
+        ):
+            setattr(self, name, np.asarray(getattr(self, name), dtype=dtype)[order])
+
+        # Mask of each signal's raw bits, before shifting into place.
+        self.value_mask = (np.uint64(1) << self.length) - np.uint64(1)
+
+        # Start of each frame's run of entries, and the frame it belongs to.
+        if len(self.frame_index):
+            self.starts = np.flatnonzero(
+                np.r_[True, self.frame_index[1:] != self.frame_index[:-1]]
+            )
+            self.frames = self.frame_index[self.starts]
+        else:
+            self.starts = self.frames = np.zeros(0, dtype=np.intp)
+
+    def pack(self, values: np.ndarray, words: np.ndarray):
+        """OR the raw bits of every value into the frames, in one vectorized pass.
+
+        Args:
+            values: Physical values, flattened.
+            words: Payload of each frame as a 64 bit integer, little endian byte order.
+
+        """
+
+        if not len(self.frames):
+            return
+
+        raw = np.clip(
+            np.rint((values[self.value_index] - self.offset) / self.scale),
+            self.raw_min,
+            self.raw_max,
+        )
+        raw = np.nan_to_num(raw).astype(np.int64).view(np.uint64) & self.value_mask
+        bits = raw << self.shift
+
+        # Big endian signals are contiguous in the byte-reversed payload.
+        big_endian = self.big_endian
+        if big_endian.any():
+            bits[big_endian] = bits[big_endian].byteswap()
+
+        words[self.frames] |= np.bitwise_or.reduceat(bits, self.starts)
+
+
+class BmsFrameGenerator:
+    def __init__(
+        self,
+        bus: Can,
+        segments: int,
+        cells_per_segment: int,
+        voltage_signal: SignalNaming,
+        temperatures_per_segment: int = 0,
+        temperature_signal: Optional[SignalNaming] = None,
+        static_signals: Optional[Dict[str, Dict[str, Any]]] = None,
+    ):
+        """Emulate the accumulator's cell voltage and temperature frames in bulk.
+
+        The pack state is held in ``voltages`` and ``temperatures``, one row per
+        segment and one column per cell or temperature sensor, update them
+        in place. Each cycle, every frame is packed in one vectorized pass
+        from bit layouts precomputed from the dbc, multiplexed messages included,
+        and sent back to back as a burst.
+
+        Args:
+            bus: Bus to emulate the accumulator on.
+            segments: Number of segments in the pack.
+            cells_per_segment: Number of cells in each segment.
+            voltage_signal: Name of each cell's voltage signal, in volts.
+            temperatures_per_segment: Number of temperature sensors per segment.
+            temperature_signal: Name of each sensor's temperature signal, in celsius.
+            static_signals: Values of any other signals in the emulated messages,
+                keyed by message name. Others are raw zero.
+
+        """
+
+        self.voltages = np.zeros((segments, cells_per_segment))
+        self.temperatures = np.zeros((segments, temperatures_per_segment))
+
+        self._bus = bus
+        self._faults: List[CellFault] = []
+        self._fault_arrays: Dict[str, Tuple[np.ndarray, ...]] = {}
+
+        # Map from signal name to its message.
+        db = bus._db
+        messages_by_signal = {
+            signal.name: message
+            for message in db.messages
+            for signal in message.signals
+        }
+
+        # Frames, keyed by (message name, multiplexer value or None).
+        frame_keys: Dict[Tuple[str, Optional[int]], int] = {}
+        layouts = {
+            "voltage": _Layout(),
+            "temperature": _Layout(),
+        }
+        for quantity, naming, shape in (
+            ("voltage", voltage_signal, self.voltages.shape),
+            ("temperature", temperature_signal, self.temperatures.shape),
+        ):
+            layout = layouts[quantity]
+            if shape[1] == 0:
+                continue
+
+            assert naming is not None, f"No {quantity} signal naming given."
+            name_of = (
+                functools.partial(_format_signal_name, naming)
+                if isinstance(naming, str)
+                else naming
+            )
+
+            for segment in range(shape[0]):
+                for cell in range(shape[1]):
+                    signal_name = name_of(segment, cell)
+                    message_type = messages_by_signal.get(signal_name)
+                    if message_type is None:
+                        raise ValueError(f"{signal_name} is not in the dbc.")
+
+                    signal_type = message_type.get_signal_by_name(signal_name)
+                    for multiplexer_id in signal_type.multiplexer_ids or [None]:
+                        frame_index = frame_keys.setdefault(
+                            (message_type.name, multiplexer_id), len(frame_keys)
+                        )
+                        self._add_signal(
+                            layout,
+                            segment * shape[1] + cell,
+                            frame_index,
+                            message_type,
+                            signal_type,
+                            multiplexer_id,
+                        )
+
+        for layout in layouts.values():
+            layout.freeze()
+        self._layouts = layouts
+
+        # Payload of each frame with every cell signal zeroed,
+        # and a reusable message per frame.
+        static_signals = static_signals or {}
+        self._base_words = np.zeros(len(frame_keys), dtype="<u8")
+        self._messages: List[can.Message] = []
+        for (message_name, multiplexer_id), frame_index in frame_keys.items():
+            message_type = db.get_message_by_name(message_name)
+            data = self._encode_base(
+                message_type, multiplexer_id, static_signals.get(message_name, {})
+            )
+            self._base_words[frame_index] = int.from_bytes(
+                data.ljust(8, b"\x00"), "little"
+            )
+            self._messages.append(
+                can.Message(
+                    arbitration_id=message_type.frame_id,
+                    is_extended_id=message_type.is_extended_frame,
+                    data=data,
+                )
+            )
+
+        # Background cycle state.
+        self._exit_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._start_time = time.perf_counter()
+
+        # Statistics.
+        self.cycles = 0
+        self.frames_sent = 0
+        self.send_errors = 0
+        self.pack_secs = Histogram()
+        self.burst_secs = Histogram()
+        self.cycle_lateness = JitterStats()
+
+    @staticmethod
+    def _add_signal(
+        layout: _Layout,
+        value_index: int,
+        frame_index: int,
+        message_type: cantools.database.can.Message,
+        signal_type: cantools.database.can.Signal,
+        multiplexer_id: Optional[int],
+    ):
+        """Add a signal's bit layout. For internal use only."""
+
+        assert message_type.length <= 8, "Only classic CAN frames are supported."
+        assert not signal_type.is_float, f"{signal_type.name} is a float signal."
+
+        big_endian = signal_type.byte_order == "big_endian"
+        byteorder = "big" if big_endian else "little"
+
+        # Encode raw one with every other signal zeroed, letting cantools work out
+        # the layout. Positions are in the payload padded to 8 bytes.
+        signals = {signal.name: 0 for signal in message_type.signals}
+        if multiplexer_id is not None:
+            signals[signal_type.multiplexer_signal] = multiplexer_id
+        zero = message_type.encode(signals, scaling=False, strict=False)
+        signals[signal_type.name] = 1
+        one = message_type.encode(signals, scaling=False, strict=False)
+        bit = int.from_bytes(one.ljust(8, b"\x00"), byteorder) ^ int.from_bytes(
+            zero.ljust(8, b"\x00"), byteorder
+        )
+
+        length = signal_type.length
+        if signal_type.is_signed:
+            raw_min, raw_max = -(1 << (length - 1)), (1 << (length - 1)) - 1
+        else:
+            raw_min, raw_max = 0, (1 << length) - 1
+
+        layout.value_index.append(value_index)
+        layout.frame_index.append(frame_index)
+        layout.big_endian.append(big_endian)
+        layout.shift.append(bit.bit_length() - 1)
+        layout.scale.append(signal_type.scale)
+        layout.offset.append(signal_type.offset)
+        layout.raw_min.append(raw_min)
+        layout.raw_max.append(raw_max)
+        layout.length.append(length)
+
+    @staticmethod
+    def _encode_base(
+        message_type: cantools.database.can.Message,
+        multiplexer_id: Optional[int],
+        static_signals: Dict[str, Any],
+    ) -> bytes:
+        """Encode a frame's payload with only its static signals set.
+        For internal use only.
+
+        """
+
+        # Cell signals are raw zero, so their bits can be ORed in each cycle.
+        raw_signals = {}
+        for signal in message_type.signals:
+            if signal.is_multiplexer and multiplexer_id is not None:
+                raw_signals[signal.name] = multiplexer_id
+            elif signal.name in static_signals:
+                raw_signals[signal.name] = int(
+                    round((static_signals[signal.name] - signal.offset) / signal.scale)
+                )
+            else:
+                raw_signals[signal.name] = 0
+
+        return bytes(message_type.encode(raw_signals, scaling=False, strict=False))
+
+    def add_fault(self, fault: CellFault):
+        """Apply a fault profile from the next cycle on.
+
+        Args:
+            fault: Fault to apply.
+
+        """
+
+        assert fault.quantity in _QUANTITIES
+        self._faults.append(fault)
+        self._build_fault_arrays()
+
+    def clear_faults(self):
+        """Remove every fault profile."""
+
+        self._faults = []
+        self._build_fault_arrays()
+
+    def _build_fault_arrays(self):
+        """Precompute the faults as arrays, per quantity. For internal use only."""
+
+        fault_arrays = {}
+        for quantity, state in (
+            ("voltage", self.voltages),
+            ("temperature", self.temperatures),
+        ):
+            faults = [fault for fault in self._faults if fault.quantity == quantity]
+            if not faults:
+                continue
+
+            fault_arrays[quantity] = (
+                np.array(
+                    [fault.segment * state.shape[1] + fault.cell for fault in faults],
+                    dtype=np.intp,
+                ),
+                np.array(
+                    [
+                        math.nan if fault.value is None else fault.value
+                        for fault in faults
+                    ]
+                ),
+                np.array([fault.drift_per_sec for fault in faults]),
+                np.array([fault.start_secs for fault in faults]),
+            )
+
+        # Swapped in whole, so a running cycle sees either the old or new faults.
+        self._fault_arrays = fault_arrays
+
+    def _faulted(
+        self, quantity: str, state: np.ndarray, elapsed_secs: float
+    ) -> np.ndarray:
+        """Get the flattened state of a quantity, with faults applied.
+        For internal use only.
+
+        """
+
+        values = state.ravel()
+        fault_arrays = self._fault_arrays.get(quantity)
+        if fault_arrays is None:
+            return values
+
+        indices, held, drift_per_sec, start_secs = fault_arrays
+        active = start_secs <= elapsed_secs
+        if not active.any():
+            return values
+
+        indices, held = indices[active], held[active]
+        drift = drift_per_sec[active] * (elapsed_secs - start_secs[active])
+
+        values = values.copy()
+        values[indices] = np.where(np.isnan(held), values[indices], held) + drift
+        return values
+
+    def pack(self, elapsed_secs: float = 0.0) -> List[can.Message]:
+        """Pack every frame for one cycle from the current pack state.
+
+        Args:
+            elapsed_secs: Time since the generator started, for fault profiles.
+
+        Returns:
+            The frames, reused across cycles, so send them before the next cycle.
+
+        """
+
+        words = self._base_words.copy()
+        self._layouts["voltage"].pack(
+            self._faulted("voltage", self.voltages, elapsed_secs), words
+        )
+        self._layouts["temperature"].pack(
+            self._faulted("temperature", self.temperatures, elapsed_secs), words
+        )
+
+        payloads = words.astype("<u8", copy=False).tobytes()
+        for index, message in enumerate(self._messages):
+            offset = index * 8
+            message.data = bytearray(payloads[offset : offset + message.dlc])
+
+        return self._messages
+
+    def send(self, elapsed_secs: Optional[float] = None) -> int:
+        """Pack and send every frame for one cycle, as a burst.
+
+        Args:
+            elapsed_secs: Time since the generator started, for fault profiles,
+                defaults to the time since construction or ``start``.
+
+        Returns:
+            Number of frames that failed to send.
+
+        """
+
+        if elapsed_secs is None:
+            elapsed_secs = time.perf_counter() - self._start_time
+
+        start = time.perf_counter()
+        messages = self.pack(elapsed_secs)
+        packed = time.perf_counter()
+        self.pack_secs.observe(packed - start)
+
+        # Sent through the bus, so frames are counted in its metrics.
+        send = self._bus._send
+        failed = 0
+        for message in messages:
+            try:
+                send(message)
+            except can.CanError:
+                failed += 1
+
+        self.burst_secs.observe(time.perf_counter() - packed)
+
+        self.cycles += 1
+        self.frames_sent += len(messages) - failed
+        self.send_errors += failed
+
+        return failed
+
+    def start(self, period_secs: float):
+        """Send a burst every period in the background, at absolute deadlines.
+
+        Args:
+            period_secs: Time between bursts.
+
+        """
+
+        assert self._thread is None, "Already running."
+
+        self._start_time = time.perf_counter()
+        self._exit_event.clear()
+        self._thread = threading.Thread(
+            target=self._run, args=(period_secs,), daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        """Stop sending."""
+
+        self._exit_event.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def __exit__(self):
+        """Destruct the generator."""
+
+        self.stop()
+
+    def stats(self) -> Dict[str, Any]:
+        """Get generator statistics.
+
+        Returns:
+            Number of cycles, frames per cycle, frames sent, failed sends,
+            time to pack and to send each burst, see ``Histogram.as_dict``,
+            and lateness of each cycle, see ``JitterStats.as_dict``.
+
+        """
+
+        return {
+            "cycles": self.cycles,
+            "frames_per_cycle": len(self._messages),
+            "frames_sent": self.frames_sent,
+            "send_errors": self.send_errors,
+            "pack_secs": self.pack_secs.as_dict(),
+            "burst_secs": self.burst_secs.as_dict(),
+            "cycle_lateness": self.cycle_lateness.as_dict(),
+        }
+
+    def _run(self, period_secs: float):
+        """Cycle loop. For internal use only."""
+
+        deadline = self._start_time
+        while not self._exit_event.is_set():
+            now = time.perf_counter()
+            if deadline > now:
+                self._exit_event.wait(deadline - now)
+                continue
+
+            self.cycle_lateness.record(now - deadline)
+            self.send(now - self._start_time)
+
+            # Skip deadlines already missed, rather than bursting to catch up.
+            deadline += period_secs
+            finished = time.perf_counter()
+            if deadline <= finished:
+                missed = int((finished - deadline) // period_secs) + 1
+                self.cycle_lateness.missed += missed
+                deadline += missed * period_secs
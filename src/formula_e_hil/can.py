@@ -1,47 +1,158 @@
 from __future__ import annotations
-from typing import Any, Dict, Optional
-import urllib.request
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    MutableMapping,
+    Optional,
+    Sequence,
+    Tuple,
+)
 import can
-import cantools.database
+import cantools
 import threading
 import signal
 import time
+import weakref
+from . import dbc
+from .history import SignalHistory
+from .metrics import BusMetrics
+from .scheduler import PeriodicScheduler
+from .shared_rx import SharedRxTable
+from .subscriptions import CallbackDispatcher, Subscription, SubscriptionCallback
 
 LATEST_DBC_URL = "https://github.com/UBCFormulaElectric/Consolidated-Firmware/releases/download/latest/quintuna.dbc"
 
+# SocketCAN error frame encoding, for counting receive queue overruns.
+# The controller error class bit in the id, and the RX overflow bit in data byte 1.
+_CAN_ERR_CRTL = 0x00000004
+_CAN_ERR_CRTL_RX_OVERFLOW = 0x01
+
 
 class Can:
-    def __init__(self, bus_handle: can.BusABC, dbc_url: str = LATEST_DBC_URL):
+    def __init__(
+        self,
+        bus_handle: can.BusABC,
+        dbc_url: str = LATEST_DBC_URL,
+        dbc_registry: Optional[dbc.DbcRegistry] = None,
+        lazy_decode: bool = False,
+        filter_to_subscriptions: bool = False,
+        decode_process_bus_kwargs: Optional[Dict[str, Any]] = None,
+        metrics: bool = False,
+    ):
         """Create an interface to a can bus.
 
         Args:
             bus_handle: python-can handle.
             dbc_url: Source of the dbc file, defaults to latest release.
+                Can also be a local path or a file:// URL.
+            dbc_registry: Registry to load the dbc through,
+                defaults to a process-wide registry shared by all buses.
+            lazy_decode: If true, the RX thread only stores raw frames,
+                and each message is decoded when first read after a new frame arrives.
+                Frames that fail to decode are counted when read,
+                like the RX thread counts them otherwise.
+            filter_to_subscriptions: If true, install acceptance filters on the bus
+                so only subscribed messages are received, see ``subscribe``.
+            decode_process_bus_kwargs: If set, receive and decode in a separate process,
+                which opens its own bus with ``can.Bus(**decode_process_bus_kwargs)``.
+                ``bus_handle`` is then only used to transmit, and the RX table only
+                holds the latest values, see ``SharedRxTable``. Features that need
+                every frame, ie. ``wait_for``, histories, subscriptions,
+                and RX listeners, are unavailable.
+            metrics: If true, count frames, time decodes, and record the jitter of
+                periodic sends, see ``metrics_snapshot``. Off by default, timing
+                costs clock reads on every frame. Can also be toggled later
+                by setting ``metrics`` to a ``BusMetrics`` or None.
 
         """
 
+        assert not (lazy_decode and decode_process_bus_kwargs is not None)
+
         self._can_bus = bus_handle
 
-        # Parse out dbc.
-        with urllib.request.urlopen(dbc_url) as response:
-            dbc = response.read()
-            self._db = cantools.database.load_string(dbc, database_format="dbc")
+        # Runtime counters, None when disabled so the hot paths skip them.
+        self._metrics: Optional[BusMetrics] = BusMetrics() if metrics else None
+
+        # Parse out dbc, shared with every other bus using the same source.
+        registry = dbc_registry if dbc_registry is not None else dbc.default_registry
+        self._db = registry.get(dbc_url)
 
         # Build RX table.
         # This table can be accessed with:
         # self.rx_table[message_name][signal_name]
         # Eg. self.rx_table["VC_ImuAngularData"]["VC_ImuAngularVelocityYaw"]
 
-        self.rx_table: Dict[str, Dict[str, Optional[Any]]] = {
+        self.rx_table: MutableMapping[str, Dict[str, Optional[Any]]] = {
             message.name: {signal.name: None for signal in message.signals}
             for message in self._db.messages
         }
 
+        # Build RX dispatch table, mapping arbitration id to message name and decoder.
+        # Built once, so the RX loop costs a single dict lookup per frame.
+        self._rx_dispatch: Dict[int, Tuple[str, Callable[[bytes], Dict[str, Any]]]] = {
+            message.frame_id: (message.name, message.decode)
+            for message in self._db.messages
+        }
+
+        # In lazy mode, the RX table decodes on access instead.
+        self._lazy_decode = lazy_decode
+        if lazy_decode:
+            self.rx_table = _LazyRxTable(
+                self.rx_table,
+                {name: decode for name, decode in self._rx_dispatch.values()},
+                self._record_decode_failure,
+            )
+
+        # In decode process mode, the RX table is filled by another process instead.
+        self._decode_process = decode_process_bus_kwargs is not None
+        if self._decode_process:
+            self.rx_table = SharedRxTable(self._db, decode_process_bus_kwargs)
+
+        # Frames with arbitration ids not in the dbc are skipped,
+        # this maps each unknown arbitration id to the number of frames seen.
+        self.unknown_frame_counts: Dict[int, int] = {}
+
+        # Frames that failed to decode or dispatch, ie. truncated payloads or
+        # a raising listener, by arbitration id. The RX thread carries on past them,
+        # keeping the most recent error for debugging.
+        self.rx_failure_counts: Dict[int, int] = {}
+        self.last_rx_error: Optional[Exception] = None
+
+        # Opt-in signal histories, keyed by message name.
+        self._histories: Dict[str, SignalHistory] = {}
+
+        # Pending ``wait_for`` calls, keyed by message name.
+        # Woken directly by the RX thread when a matching frame arrives.
+        self._waiters: Dict[str, List[_Waiter]] = {}
+        self._waiters_lock = threading.Lock()
+
+        # Subscriptions, keyed by message name, copy-on-write like the listeners.
+        # Callbacks run on a dispatcher thread, created with the first callback.
+        self._subscriptions: Dict[str, Tuple[Subscription, ...]] = {}
+        self._subscriptions_lock = threading.Lock()
+        self._filter_to_subscriptions = filter_to_subscriptions
+        self._callback_dispatcher: Optional[CallbackDispatcher] = None
+
+        # Called by the RX thread with every raw frame, before it is decoded.
+        # Copy-on-write, so the RX thread can iterate without a lock.
+        self._rx_listeners: Tuple[Callable[[can.Message], None], ...] = ()
+
+        # Single scheduler for every periodic transmitter on this bus.
+        self._periodic_scheduler = PeriodicScheduler(
+            self._can_bus, record_jitter=metrics
+        )
+
         # Setup the exit event for the CAN RX thread.
+        # Signal handlers can only be installed from the main thread.
         self._can_rx_exit_event = threading.Event()
-        signal.signal(
-            signal.SIGINT, lambda _signalnum, _handler: self._can_rx_exit_event.set()
-        )
+        if threading.current_thread() is threading.main_thread():
+            signal.signal(
+                signal.SIGINT,
+                lambda _signalnum, _handler: self._can_rx_exit_event.set(),
+            )
 
         def can_rx_loop():
             """Background CAN RX loop."""
@@ -50,23 +161,317 @@ class Can:
                 # Receive raw message, parse, and dump to rx table.
                 raw_message = self._can_bus.recv(0.1)
                 if raw_message is not None:
-                    name = self._db.get_message_by_frame_id(
-                        raw_message.arbitration_id
-                    ).name
-                    message = self._db.decode_message(
-                        raw_message.arbitration_id, raw_message.data
-                    )
-                    self.rx_table[name] = message
+                    self._handle_rx_frame(raw_message)
 
-        # Spin up thread.
-        self._can_rx_thread = threading.Thread(target=can_rx_loop)
+        # Spin up thread, unless the decode process receives instead.
+        self._can_rx_thread = threading.Thread(target=can_rx_loop, daemon=True)
+        if not self._decode_process:
+            self._can_rx_thread.start()
 
     def __exit__(self):
         """Destruct Can."""
 
-        # Make sure CAN rx thread closes when the class destructs.
+        # Make sure CAN rx thread and periodic transmitters close when the class destructs.
         self._can_rx_exit_event.set()
-        self._can_rx_thread.join()
+        if self._decode_process:
+            self.rx_table.close()
+        else:
+            self._can_rx_thread.join()
+        self._periodic_scheduler.stop()
+        if self._callback_dispatcher is not None:
+            self._callback_dispatcher.stop()
+
+    @property
+    def metrics(self) -> Optional[BusMetrics]:
+        """Runtime counters of the bus, None while metrics are disabled."""
+
+        return self._metrics
+
+    @metrics.setter
+    def metrics(self, metrics: Optional[BusMetrics]):
+        """Enable metrics with fresh counters, or disable them with None."""
+
+        self._metrics = metrics
+        self._periodic_scheduler.record_jitter = metrics is not None
+
+    def _handle_rx_frame(self, raw_message: can.Message):
+        """Decode a received frame into the RX table. For internal use only.
+
+        Args:
+            raw_message: Frame received from the bus.
+
+        """
+
+        metrics = self._metrics
+        if metrics is not None:
+            metrics.rx_frames += 1
+            if raw_message.is_error_frame:
+                metrics.rx_error_frames += 1
+                if (
+                    raw_message.arbitration_id & _CAN_ERR_CRTL
+                    and len(raw_message.data) > 1
+                    and raw_message.data[1] & _CAN_ERR_CRTL_RX_OVERFLOW
+                ):
+                    metrics.rx_overruns += 1
+
+        arbitration_id = raw_message.arbitration_id
+        for listener in self._rx_listeners:
+            try:
+                listener(raw_message)
+            except Exception as error:
+                self._record_rx_failure(arbitration_id, error)
+
+        dispatch = self._rx_dispatch.get(arbitration_id)
+        if dispatch is None:
+            self.unknown_frame_counts[arbitration_id] = (
+                self.unknown_frame_counts.get(arbitration_id, 0) + 1
+            )
+            return
+
+        name, decode = dispatch
+        try:
+            if self._lazy_decode:
+                self.rx_table.store(name, raw_message.data, raw_message.timestamp)
+
+                # Only decode now if something needs every frame.
+                if (
+                    name not in self._histories
+                    and name not in self._waiters
+                    and name not in self._subscriptions
+                ):
+                    return
+                message = self.rx_table.decode(name)
+            elif metrics is not None:
+                decode_start = time.perf_counter()
+                message = decode(raw_message.data)
+                metrics.decode_secs.observe(time.perf_counter() - decode_start)
+                self.rx_table[name] = message
+            else:
+                message = decode(raw_message.data)
+                self.rx_table[name] = message
+
+            history = self._histories.get(name)
+            if history is not None:
+                history.append(raw_message.timestamp, message)
+
+            if name in self._waiters:
+                self._wake_waiters(name, message, raw_message.timestamp)
+
+            for subscription in self._subscriptions.get(name, ()):
+                if subscription.callback is not None:
+                    self._callback_dispatcher.dispatch(
+                        subscription, message, raw_message.timestamp
+                    )
+        except Exception as error:
+            self._record_rx_failure(arbitration_id, error)
+
+    def _record_rx_failure(self, arbitration_id: int, error: Exception):
+        """Count a frame the RX thread failed to handle. For internal use only.
+
+        Args:
+            arbitration_id: Arbitration id of the frame.
+            error: Error raised while handling it.
+
+        """
+
+        self.rx_failure_counts[arbitration_id] = (
+            self.rx_failure_counts.get(arbitration_id, 0) + 1
+        )
+        self.last_rx_error = error
+        metrics = self._metrics
+        if metrics is not None:
+            metrics.rx_failures += 1
+
+    def _record_decode_failure(self, message_name: str, error: Exception):
+        """Count a frame that failed to decode when read from the lazy RX table.
+        For internal use only.
+
+        Args:
+            message_name: Name of the message.
+            error: Error raised while decoding it.
+
+        """
+
+        self._record_rx_failure(
+            self._db.get_message_by_name(message_name).frame_id, error
+        )
+
+    def subscribe(
+        self,
+        message_name: str,
+        callback: Optional[SubscriptionCallback] = None,
+        signal_names: Optional[Sequence[str]] = None,
+    ) -> Subscription:
+        """Declare interest in a message, optionally with a callback.
+
+        With ``filter_to_subscriptions``, the bus's acceptance filters are narrowed
+        to subscribed messages, so the interface drops every other frame before
+        Python sees it. With no subscriptions, the bus is left unfiltered.
+
+        Args:
+            message_name: Name of the message.
+            callback: Called with the message name, decoded signals, and frame timestamp
+                of each received frame. Runs on a dedicated dispatcher thread.
+            signal_names: If set, the callback only receives these signals.
+
+        Returns:
+            The subscription, call ``unsubscribe`` on it to remove it.
+
+        """
+
+        self._require_rx_thread("Subscriptions")
+
+        # Fail early on unknown names.
+        message_type = self._db.get_message_by_name(message_name)
+        if signal_names is not None:
+            for signal_name in signal_names:
+                message_type.get_signal_by_name(signal_name)
+
+        subscription = Subscription(self, message_name, callback, signal_names)
+        with self._subscriptions_lock:
+            if callback is not None and self._callback_dispatcher is None:
+                self._callback_dispatcher = CallbackDispatcher()
+
+            self._subscriptions[message_name] = self._subscriptions.get(
+                message_name, ()
+            ) + (subscription,)
+            self._update_filters()
+
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        """Remove a subscription.
+
+        Args:
+            subscription: Subscription returned by ``subscribe``.
+
+        """
+
+        with self._subscriptions_lock:
+            remaining = tuple(
+                registered
+                for registered in self._subscriptions.get(subscription.message_name, ())
+                if registered is not subscription
+            )
+            if remaining:
+                self._subscriptions[subscription.message_name] = remaining
+            else:
+                self._subscriptions.pop(subscription.message_name, None)
+            self._update_filters()
+
+    def _update_filters(self):
+        """Set the bus's acceptance filters to the subscribed messages.
+        For internal use only, call with the subscriptions lock held.
+
+        """
+
+        if not self._filter_to_subscriptions:
+            return
+
+        filters = []
+        for message_name in self._subscriptions:
+            message_type = self._db.get_message_by_name(message_name)
+            filters.append(
+                {
+                    "can_id": message_type.frame_id,
+                    "can_mask": 0x1FFFFFFF if message_type.is_extended_frame else 0x7FF,
+                    "extended": message_type.is_extended_frame,
+                }
+            )
+
+        # python-can treats no filters as accepting everything.
+        self._can_bus.set_filters(filters or None)
+
+    def add_rx_listener(self, listener: Callable[[can.Message], None]):
+        """Register a callback for every raw frame received, including unknown ids.
+
+        Listeners run on the RX thread, so they must be quick.
+
+        Args:
+            listener: Called with each received frame.
+
+        """
+
+        self._require_rx_thread("RX listeners")
+        self._rx_listeners = self._rx_listeners + (listener,)
+
+    def remove_rx_listener(self, listener: Callable[[can.Message], None]):
+        """Unregister a callback added with ``add_rx_listener``.
+
+        Args:
+            listener: Callback to remove.
+
+        """
+
+        self._rx_listeners = tuple(
+            registered for registered in self._rx_listeners if registered != listener
+        )
+
+    def _require_rx_thread(self, feature: str):
+        """Fail if frames are not received in this process. For internal use only.
+
+        Args:
+            feature: Name of the feature that needs every frame.
+
+        """
+
+        if self._decode_process:
+            raise RuntimeError(
+                f"{feature} are unavailable when decoding in a separate process."
+            )
+
+    def _wake_waiters(
+        self, message_name: str, message: Dict[str, Any], timestamp: float
+    ):
+        """Wake every waiter on a message whose predicate now holds. For internal use only.
+
+        Args:
+            message_name: Name of the received message.
+            message: Decoded signals of the received message.
+            timestamp: Timestamp of the received frame.
+
+        """
+
+        with self._waiters_lock:
+            waiters = self._waiters.get(message_name, [])
+            for waiter in list(waiters):
+                # Absent from frames of other multiplexer branches, wait for the next.
+                if waiter.signal_name not in message:
+                    continue
+
+                try:
+                    matched = waiter.predicate(message[waiter.signal_name])
+                except Exception as error:
+                    # Surface the error in the waiting thread, not the RX thread.
+                    waiter.error = error
+                    matched = True
+
+                if matched:
+                    waiter.timestamp = timestamp
+                    waiter.event.set()
+                    waiters.remove(waiter)
+
+            if not waiters:
+                self._waiters.pop(message_name, None)
+
+    def _add_waiters(self, waiters: Sequence[_Waiter]):
+        """Register waiters with the RX thread. For internal use only."""
+
+        self._require_rx_thread("wait_for calls")
+        with self._waiters_lock:
+            for waiter in waiters:
+                self._waiters.setdefault(waiter.message_name, []).append(waiter)
+
+    def _remove_waiters(self, waiters: Sequence[_Waiter]):
+        """Unregister waiters that have not fired. For internal use only."""
+
+        with self._waiters_lock:
+            for waiter in waiters:
+                message_waiters = self._waiters.get(waiter.message_name, [])
+                if waiter in message_waiters:
+                    message_waiters.remove(waiter)
+                if not message_waiters:
+                    self._waiters.pop(waiter.message_name, None)
 
     def receive(self, message_name: str, signal_name: str) -> Optional[Any]:
         """Receive a signal given it's name the parent's message name.
@@ -95,6 +500,222 @@ class Can:
 
         return self.rx_table[message_name]
 
+    def wait_for(
+        self,
+        message_name: str,
+        signal_name: str,
+        predicate: Callable[[Any], bool],
+        timeout: Optional[float] = None,
+    ) -> float:
+        """Block until a received frame has a signal satisfying a predicate.
+
+        Only frames received after the call are considered.
+        The caller is woken by the RX thread as soon as the matching frame is decoded.
+
+        Args:
+            message_name: Name of the message.
+            signal_name: Name of the signal.
+            predicate: Called with each newly received value of the signal.
+            timeout: Maximum time to wait in seconds, None to wait forever.
+
+        Returns:
+            Timestamp of the matching frame.
+
+        Raises:
+            TimeoutError: No matching frame arrived within the timeout.
+
+        """
+
+        return self.wait_for_all([(message_name, signal_name, predicate)], timeout)[0]
+
+    def expect(
+        self,
+        message_name: str,
+        signal_name: str,
+        predicate: Callable[[Any], bool],
+    ) -> Expectation:
+        """Start watching for a received frame with a signal satisfying a predicate,
+        without blocking.
+
+        Unlike ``wait_for``, frames received between this call and
+        ``Expectation.wait`` are not missed, so call this before triggering
+        the response, then wait on the result.
+
+        Args:
+            message_name: Name of the message.
+            signal_name: Name of the signal.
+            predicate: Called with each newly received value of the signal.
+
+        Returns:
+            The expectation, call ``cancel`` on it once done.
+
+        """
+
+        return Expectation(self, message_name, signal_name, predicate)
+
+    def wait_for_all(
+        self,
+        conditions: Sequence[Tuple[str, str, Callable[[Any], bool]]],
+        timeout: Optional[float] = None,
+    ) -> List[float]:
+        """Block until every condition has been met by a received frame.
+
+        Args:
+            conditions: Tuples of message name, signal name, and predicate,
+                see ``wait_for``.
+            timeout: Maximum time to wait in seconds for all conditions,
+                None to wait forever.
+
+        Returns:
+            Timestamp of the frame that met each condition, in order.
+
+        Raises:
+            TimeoutError: Not every condition was met within the timeout.
+
+        """
+
+        waiters = [_Waiter(*condition, threading.Event()) for condition in conditions]
+        self._add_waiters(waiters)
+
+        try:
+            deadline = None if timeout is None else time.monotonic() + timeout
+            for waiter in waiters:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if not waiter.event.wait(remaining):
+                    raise TimeoutError(
+                        f"Timed out waiting for {waiter.message_name}.{waiter.signal_name}."
+                    )
+        finally:
+            self._remove_waiters(waiters)
+
+        return [waiter.result() for waiter in waiters]
+
+    def wait_for_any(
+        self,
+        conditions: Sequence[Tuple[str, str, Callable[[Any], bool]]],
+        timeout: Optional[float] = None,
+    ) -> Tuple[int, float]:
+        """Block until any condition has been met by a received frame.
+
+        Args:
+            conditions: Tuples of message name, signal name, and predicate,
+                see ``wait_for``.
+            timeout: Maximum time to wait in seconds, None to wait forever.
+
+        Returns:
+            A tuple of the index of the condition that was met first,
+            and the timestamp of the frame that met it.
+
+        Raises:
+            TimeoutError: No condition was met within the timeout.
+
+        """
+
+        # All waiters share one event, so the first match wakes us.
+        event = threading.Event()
+        waiters = [_Waiter(*condition, event) for condition in conditions]
+        self._add_waiters(waiters)
+
+        try:
+            if not event.wait(timeout):
+                raise TimeoutError("Timed out waiting for any condition.")
+        finally:
+            self._remove_waiters(waiters)
+
+        # Several may have matched before we woke up, report the earliest frame.
+        index, waiter = min(
+            (
+                (index, waiter)
+                for index, waiter in enumerate(waiters)
+                if waiter.timestamp is not None
+            ),
+            key=lambda indexed: indexed[1].timestamp,
+        )
+        return index, waiter.result()
+
+    def enable_history(
+        self,
+        message_name: str,
+        signal_names: Optional[Sequence[str]] = None,
+        capacity: int = 10000,
+    ) -> SignalHistory:
+        """Start recording a bounded history of a message's signals.
+
+        Args:
+            message_name: Name of the message.
+            signal_names: Signals to record, defaults to all signals in the message.
+            capacity: Maximum number of samples kept, older samples are overwritten.
+
+        Returns:
+            The history, also available through ``history``.
+
+        Raises:
+            KeyError: The message, or one of the signals, is not in the dbc.
+
+        """
+
+        self._require_rx_thread("Histories")
+
+        # Resolve every signal up front, so the RX thread never meets an unknown one.
+        message_type = self._db.get_message_by_name(message_name)
+        if signal_names is None:
+            signal_names = [signal.name for signal in message_type.signals]
+        signal_types = [
+            message_type.get_signal_by_name(signal_name) for signal_name in signal_names
+        ]
+
+        history = SignalHistory(
+            signal_names,
+            capacity,
+            [signal_type.name for signal_type in signal_types if signal_type.choices],
+        )
+        self._histories[message_name] = history
+        return history
+
+    def disable_history(self, message_name: str):
+        """Stop recording the history of a message.
+
+        Args:
+            message_name: Name of the message.
+
+        """
+
+        self._histories.pop(message_name, None)
+
+    def history(self, message_name: str) -> SignalHistory:
+        """Get the history of a message, see ``enable_history``.
+
+        Args:
+            message_name: Name of the message.
+
+        Returns:
+            The history, timestamped with the received frames' timestamps.
+
+        """
+
+        return self._histories[message_name]
+
+    def _encode_message(
+        self, message_name: str, signals: Dict[str, Any]
+    ) -> can.Message:
+        """Encode a message into a frame ready to send. For internal use only.
+
+        Args:
+            message_name: Name of the message.
+            signals: Dictonary containing the signals to encode.
+
+        Returns:
+            The encoded frame.
+
+        """
+
+        message_type = self._db.get_message_by_name(message_name)
+        return can.Message(
+            arbitration_id=message_type.frame_id,
+            is_extended_id=message_type.is_extended_frame,
+            data=message_type.encode(signals),
+        )
+
     def transmit_message(self, message_name: str, signals: Dict[str, Any]):
         """Transmit a message given it's signals.
 
@@ -104,35 +725,392 @@ class Can:
 
         """
 
-        message_type = self._db.get_message_by_name(message_name)
-        raw_signals = message_type.encode(signals)
-        raw_message = can.Message(
-            arbitration_id=message_type.frame_id, data=raw_signals
-        )
-        self._can_bus.send(raw_message)
+        self._send(self._encode_message(message_name, signals))
+
+    def _send(self, message: can.Message):
+        """Send an encoded frame, counting it in the metrics. For internal use only.
+
+        Args:
+            message: Frame to send.
+
+        """
+
+        metrics = self._metrics
+        try:
+            self._can_bus.send(message)
+        except can.CanError:
+            if metrics is not None:
+                metrics.tx_errors += 1
+            raise
+
+        if metrics is not None:
+            metrics.tx_frames += 1
+
+    def metrics_snapshot(self) -> Dict[str, Any]:
+        """Get runtime metrics of the bus.
+
+        Returns:
+            Number of frames with unknown ids, number of frames that failed
+            to decode or dispatch, and jitter statistics of each periodic
+            frame keyed by hex arbitration id, see ``PeriodicScheduler.jitter_stats``,
+            only recorded while metrics are enabled.
+            If metrics are enabled, also RX frame, error frame and overrun counts,
+            TX frame and error counts, RX and TX frames/sec since the previous
+            snapshot, and a histogram of decode times, see ``Histogram.as_dict``.
+            Only the rate window is restarted, counters are left untouched.
+
+        """
+
+        snapshot: Dict[str, Any] = {
+            "unknown_frames": sum(self.unknown_frame_counts.values()),
+            "rx_failures": sum(self.rx_failure_counts.values()),
+            "periodic_jitter": self._periodic_scheduler.jitter_stats(),
+        }
+
+        # The decode process counts received frames instead.
+        rx_frames = None
+        if self._decode_process:
+            snapshot["unknown_frames"] = self.rx_table.unknown_frames
+            snapshot["rx_failures"] = self.rx_table.decode_failures
+            rx_frames = (
+                self.rx_table.frames_decoded
+                + self.rx_table.unknown_frames
+                + self.rx_table.decode_failures
+            )
+
+        metrics = self._metrics
+        if metrics is not None:
+            if rx_frames is None:
+                rx_frames = metrics.rx_frames
+
+            snapshot.update(
+                {
+                    "rx_frames": rx_frames,
+                    "rx_error_frames": metrics.rx_error_frames,
+                    "rx_overruns": metrics.rx_overruns,
+                    "tx_frames": metrics.tx_frames,
+                    "tx_errors": metrics.tx_errors,
+                    "decode_secs": metrics.decode_secs.as_dict(),
+                }
+            )
+
+            snapshot.update(metrics.rates(rx_frames))
+
+        return snapshot
 
     def transmit_message_periodic(
-        self, period_secs: int, message_name: str, signals: Dict[str, Any]
+        self,
+        period_secs: int,
+        message_name: str,
+        signals: Dict[str, Any],
+        counter_signal: Optional[str] = None,
+        checksum_signal: Optional[str] = None,
+        checksum: Optional[Callable[[bytes], int]] = None,
     ) -> PeriodicCanTransmitter:
         """Create a new periodic can transmitter.
 
+        All periodic transmitters on a bus share one scheduler,
+        and are offloaded to the interface where the backend supports it.
+        The frame is encoded once, and only re-encoded when signals change,
+        see ``PeriodicCanTransmitter.update``.
+
+        Alive counters and checksums are patched into the encoded frame each tick,
+        emulating ECUs that need them without a full encode per tick.
+        Such transmitters are always sent by the scheduler thread.
+
         Args:
             period_secs: Period between succesive transmissions.
             message_name: Name of message.
             signals: Map between name of signal and value.
+            counter_signal: Name of an alive counter signal,
+                incremented every tick and wrapped at its bit length.
+            checksum_signal: Name of a checksum signal, recomputed every tick
+                after the counter.
+            checksum: Computes the raw checksum from the payload,
+                with the checksum signal zeroed. Required with ``checksum_signal``.
+
+        Returns:
+            A handle to the periodic transmission.
+            To stop periodic transmission, call ``stop`` or simply ``del`` the handle.
+
+        Raises:
+            ValueError: The period is not positive.
+
+        """
+
+        return PeriodicCanTransmitter(
+            self,
+            period_secs,
+            message_name,
+            signals,
+            counter_signal,
+            checksum_signal,
+            checksum,
+        )
+
+
+class _LazyRxTable(MutableMapping):
+    def __init__(
+        self,
+        initial: Dict[str, Dict[str, Optional[Any]]],
+        decoders: Dict[str, Callable[[bytes], Dict[str, Any]]],
+        on_decode_failure: Callable[[str, Exception], None],
+    ):
+        """RX table that holds raw frames, decoding each message when it is read.
+        For internal use only, see ``Can(lazy_decode=True)``.
+
+        Behaves like the eager RX table's dict: a frame that fails to decode
+        is counted through ``on_decode_failure`` and the message keeps its last value,
+        and assigned messages are kept until a newer frame arrives.
+
+        Args:
+            initial: Value of each message before any frame is received.
+            decoders: Map from message name to decoder.
+            on_decode_failure: Called with the message name and error when
+                a frame fails to decode on read.
+
+        """
+
+        self._decoders = decoders
+        self._on_decode_failure = on_decode_failure
+
+        # Latest raw frame per message, as (sequence number, payload, timestamp).
+        self._raw: Dict[str, Tuple[int, bytes, float]] = {}
+
+        # Decoded messages, as (sequence number decoded from, signals).
+        self._decoded: Dict[str, Tuple[int, Dict[str, Optional[Any]]]] = {
+            name: (0, signals) for name, signals in initial.items()
+        }
+
+    def store(self, name: str, data: bytes, timestamp: float):
+        """Store the latest raw frame of a message, without decoding it.
+
+        Args:
+            name: Name of the message.
+            data: Raw payload.
+            timestamp: Timestamp of the frame.
+
+        """
+
+        previous = self._raw.get(name)
+        sequence = 1 if previous is None else previous[0] + 1
+
+        # A single assignment, so readers never see a torn frame.
+        self._raw[name] = (sequence, data, timestamp)
+
+    def sequence(self, name: str) -> int:
+        """Number of frames received for a message."""
+
+        raw = self._raw.get(name)
+        return 0 if raw is None else raw[0]
+
+    def decode(self, name: str) -> Dict[str, Optional[Any]]:
+        """Get a decoded message, decoding it if a new frame arrived since last read.
+
+        Args:
+            name: Name of the message.
+
+        Returns:
+            Signals of the message.
+
+        Raises:
+            Exception: The latest frame failed to decode, it is only raised once,
+                later reads return the last value.
+
+        """
+
+        decoded_sequence, signals = self._decoded[name]
+
+        raw = self._raw.get(name)
+        if raw is not None and raw[0] != decoded_sequence:
+            sequence, data, _ = raw
+            try:
+                signals = self._decoders[name](data)
+            finally:
+                # Keep the last value on failure, so a bad frame fails only once.
+                self._decoded[name] = (sequence, signals)
+
+        return signals
+
+    def __getitem__(self, name: str) -> Dict[str, Optional[Any]]:
+        """Get a decoded message, counting a frame that fails to decode."""
+
+        if name not in self._decoded:
+            raise KeyError(name)
+
+        try:
+            return self.decode(name)
+        except Exception as error:
+            self._on_decode_failure(name, error)
+            return self._decoded[name][1]
+
+    def __setitem__(self, name: str, signals: Dict[str, Optional[Any]]):
+        """Set a message, until a newer frame arrives."""
+
+        self._decoded[name] = (self.sequence(name), signals)
+
+    def __delitem__(self, name: str):
+        """Remove a message, and its pending frame."""
+
+        del self._decoded[name]
+        self._raw.pop(name, None)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._decoded)
+
+    def __len__(self) -> int:
+        return len(self._decoded)
+
+
+class _Waiter:
+    def __init__(
+        self,
+        message_name: str,
+        signal_name: str,
+        predicate: Callable[[Any], bool],
+        event: threading.Event,
+    ):
+        """A pending ``Can.wait_for`` condition. For internal use only.
+
+        Args:
+            message_name: Name of the message.
+            signal_name: Name of the signal.
+            predicate: Called with each newly received value of the signal.
+            event: Set by the RX thread once the predicate holds.
+
+        """
+
+        self.message_name = message_name
+        self.signal_name = signal_name
+        self.predicate = predicate
+        self.event = event
+
+        self.timestamp: Optional[float] = None
+        self.error: Optional[Exception] = None
+
+    def result(self) -> float:
+        """Timestamp of the matching frame, re-raising any error from the predicate."""
+
+        if self.error is not None:
+            raise self.error
+
+        return self.timestamp
+
+
+class Expectation:
+    def __init__(
+        self,
+        parent: Can,
+        message_name: str,
+        signal_name: str,
+        predicate: Callable[[Any], bool],
+    ):
+        """A pending condition on received frames.
+
+        This constructor should never be called by the user,
+        instead use ``Can.expect``.
+
+        Args:
+            parent: Bus the frames are received on.
+            message_name: Name of the message.
+            signal_name: Name of the signal.
+            predicate: Called with each newly received value of the signal.
+
+        """
+
+        self._parent = parent
+        self._waiter = _Waiter(message_name, signal_name, predicate, threading.Event())
+        parent._add_waiters([self._waiter])
+
+    def wait(self, timeout: Optional[float] = None) -> float:
+        """Block until a frame has met the condition, returning at once if one has.
+
+        Args:
+            timeout: Maximum time to wait in seconds, None to wait forever.
 
         Returns:
-            A wrapper around the Periodic Transmitter thread.
-            To stop periodic transmission, simply ``del`` the handle.
+            Timestamp of the matching frame.
+
+        Raises:
+            TimeoutError: No matching frame arrived within the timeout.
+
+        """
+
+        if not self._waiter.event.wait(timeout):
+            raise TimeoutError(
+                f"Timed out waiting for "
+                f"{self._waiter.message_name}.{self._waiter.signal_name}."
+            )
+
+        return self._waiter.result()
+
+    def rearm(self):
+        """Forget the matching frame, and watch for the next one."""
+
+        self._parent._remove_waiters([self._waiter])
+        self._waiter.event.clear()
+        self._waiter.timestamp = None
+        self._waiter.error = None
+        self._parent._add_waiters([self._waiter])
+
+    def cancel(self):
+        """Stop watching, if no frame has matched yet."""
+
+        self._parent._remove_waiters([self._waiter])
+
+
+class _SignalBits:
+    def __init__(self, message_type: cantools.database.can.Message, signal_name: str):
+        """Where a signal's raw bits sit in its frame, to patch them without encoding.
+        For internal use only.
+
+        Args:
+            message_type: Message the signal belongs to.
+            signal_name: Name of the signal.
 
         """
 
-        return PeriodicCanTransmitter(self, period_secs, message_name, signals)
+        signal_type = message_type.get_signal_by_name(signal_name)
+        self.byteorder = (
+            "little" if signal_type.byte_order == "little_endian" else "big"
+        )
+        self.modulo = 1 << signal_type.length
+
+        # Encode raw all-ones and raw one with every other signal zeroed,
+        # letting cantools work out the layout, including big endian sawtooth numbering.
+        def raw_bits(raw: int) -> int:
+            signals = {signal.name: 0 for signal in message_type.signals}
+            signals[signal_name] = raw
+            data = message_type.encode(signals, scaling=False, strict=False)
+            return int.from_bytes(data, self.byteorder)
+
+        self.mask = raw_bits(-1 if signal_type.is_signed else self.modulo - 1)
+        self.shift = (raw_bits(1) & -raw_bits(1)).bit_length() - 1
+
+    def patch(self, data: bytearray, raw: int):
+        """Overwrite the signal's raw value in a payload, in place.
+
+        Args:
+            data: Payload to patch.
+            raw: Raw value, without scaling, wrapped to the signal's length.
+
+        """
+
+        bits = int.from_bytes(data, self.byteorder)
+        bits = (bits & ~self.mask) | ((raw << self.shift) & self.mask)
+        data[:] = bits.to_bytes(len(data), self.byteorder)
 
 
 class PeriodicCanTransmitter:
     def __init__(
-        self, parent: Can, period_secs: int, message_name: str, signals: Dict[str, Any]
+        self,
+        parent: Can,
+        period_secs: int,
+        message_name: str,
+        signals: Dict[str, Any],
+        counter_signal: Optional[str] = None,
+        checksum_signal: Optional[str] = None,
+        checksum: Optional[Callable[[bytes], int]] = None,
     ):
         """Create a new periodic can transmitter.
 
@@ -144,35 +1122,135 @@ class PeriodicCanTransmitter:
             period_secs: Period between succesive transmissions.
             message_name: Name of message.
             signals: Map between name of signal and value.
+            counter_signal: Name of an alive counter signal, incremented every tick.
+            checksum_signal: Name of a checksum signal, recomputed every tick.
+            checksum: Computes the raw checksum from the payload,
+                with the checksum signal zeroed.
 
         """
 
-        self.signals = signals
+        assert (checksum_signal is None) == (checksum is None)
 
         self._parent = parent
         self._message_name = message_name
         self._period_secs = period_secs
+        self._signals = dict(signals)
+        self._lock = threading.Lock()
+
+        # Per-tick signals are patched straight into the payload, never encoded.
+        message_type = parent._db.get_message_by_name(message_name)
+        self._counter_bits = (
+            None
+            if counter_signal is None
+            else _SignalBits(message_type, counter_signal)
+        )
+        self._checksum_bits = (
+            None
+            if checksum_signal is None
+            else _SignalBits(message_type, checksum_signal)
+        )
+        self._checksum = checksum
+        self._counter = 0
+        for signal_name in (counter_signal, checksum_signal):
+            if signal_name is not None:
+                self._signals.setdefault(signal_name, 0)
+
+        # The scheduler only holds a weak reference to us,
+        # so dropping the handle still stops transmission.
+        tick = None
+        if self._counter_bits is not None or self._checksum_bits is not None:
+            tick_method = weakref.WeakMethod(self._tick)
+
+            def tick(message: can.Message):
+                method = tick_method()
+                if method is not None:
+                    method(message)
 
-        # Setup exit event.
-        self._exit_event = threading.Event()
-        signal.signal(
-            signal.SIGINT, lambda _signalnum, _handler: self._exit_event.set()
+        # Encode once up front, the scheduler sends the same frame every tick.
+        self._scheduled_frame = self._parent._periodic_scheduler.add(
+            self._parent._encode_message(message_name, self._signals),
+            period_secs,
+            tick,
         )
 
-        # Main loop.
-        def loop():
-            """Main loop."""
+    @property
+    def signals(self) -> Dict[str, Any]:
+        """Map between name of signal and value."""
 
-            while not self._exit_event.is_set():
-                self._parent.transmit_message(self._message_name, self.signals)
-                time.sleep(self._period_secs)
+        return dict(self._signals)
 
-        # Spin up thread.
-        self._thread = threading.Thread(target=loop)
+    @signals.setter
+    def signals(self, signals: Dict[str, Any]):
+        """Replace the transmitted signals, re-encoding the frame once if they changed."""
+
+        with self._lock:
+            self._replace(dict(signals))
+
+    def update(self, **signals: Any):
+        """Change some signals, leaving the others as they are.
+
+        The frame is re-encoded once, and swapped in atomically,
+        so a tick never sends a partially updated frame.
+        Nothing is re-encoded if no value changed.
+
+        Args:
+            signals: New values of the signals to change.
+
+        """
+
+        with self._lock:
+            self._replace({**self._signals, **signals})
+
+    def _replace(self, signals: Dict[str, Any]):
+        """Swap in new signals, if they differ. For internal use only,
+        call with the lock held.
+
+        """
+
+        if signals == self._signals:
+            return
+
+        message = self._parent._encode_message(self._message_name, signals)
+        self._signals = signals
+        self._parent._periodic_scheduler.update(self._scheduled_frame, message)
+
+    def _tick(self, message: can.Message):
+        """Patch the per-tick signals into the frame. For internal use only."""
+
+        if self._counter_bits is not None:
+            self._counter_bits.patch(message.data, self._counter)
+            self._counter = (self._counter + 1) % self._counter_bits.modulo
+
+        if self._checksum_bits is not None:
+            self._checksum_bits.patch(message.data, 0)
+            self._checksum_bits.patch(message.data, self._checksum(bytes(message.data)))
+
+    def jitter_stats(self) -> Optional[Dict[str, Any]]:
+        """Get statistics on how late each transmission was past its deadline.
+
+        Returns:
+            A dictionary of jitter statistics, see ``JitterStats.as_dict``,
+            or None if transmission is offloaded to the interface.
+
+        """
+
+        if self._scheduled_frame.native_task is not None:
+            return None
+
+        return self._scheduled_frame.stats.as_dict()
+
+    def stop(self):
+        """Stop transmitting."""
+
+        self._parent._periodic_scheduler.remove(self._scheduled_frame)
 
     def __exit__(self):
         """Destruct the transmitter."""
 
-        # Make sure transmitter kills thread when dead.
-        self._exit_event.set()
-        self._thread.join()
+        self.stop()
+
+    def __del__(self):
+        """Stop transmitting once the handle is dropped."""
+
+        if hasattr(self, "_scheduled_frame"):
+            self.__exit__()
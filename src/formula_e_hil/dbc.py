@@ -0,0 +1,308 @@
+from __future__ import annotations
+from typing import Any, Dict, Optional
+import hashlib
+import json
+import logging
+import os
+import pickle
+import threading
+import urllib.error
+import urllib.parse
+import urllib.request
+import cantools
+import cantools.database
+
+logger = logging.getLogger(__name__)
+
+# Default location of the on-disk parsed dbc cache.
+DEFAULT_CACHE_DIR = os.path.join(
+    os.path.expanduser("~"), ".cache", "formula_e_hil", "dbc"
+)
+
+# Set to a non-empty value to never touch the network when loading a dbc.
+OFFLINE_ENV_VAR = "FORMULA_E_HIL_OFFLINE"
+
+
+class DbcRegistry:
+    def __init__(
+        self, cache_dir: Optional[str] = DEFAULT_CACHE_DIR, offline: bool = False
+    ):
+        """Create a registry of parsed dbc databases.
+
+        Each distinct dbc source is loaded at most once per registry, and the
+        resulting database is shared between every caller. Parsed databases are
+        also pickled to disk, keyed by the sha256 of the dbc contents, so a warm
+        start skips both the fetch and the parse.
+
+        Args:
+            cache_dir: Directory for the on-disk cache, None disables it.
+            offline: If true, never fetch remote sources, only serve from the cache.
+
+        """
+
+        self.offline = offline
+
+        self._cache_dir = cache_dir
+        self._databases: Dict[str, cantools.database.can.Database] = {}
+
+        # One lock per source, so loading two different dbcs can happen concurrently,
+        # but the same dbc is never fetched twice.
+        self._lock = threading.Lock()
+        self._source_locks: Dict[str, threading.Lock] = {}
+
+    def get(self, source: str) -> cantools.database.can.Database:
+        """Get the parsed database for a dbc source, loading it if needed.
+
+        Args:
+            source: A http(s) URL, a file:// URL, or a local path to a dbc file.
+
+        Returns:
+            The parsed database, shared between all callers of this registry.
+
+        """
+
+        with self._lock:
+            source_lock = self._source_locks.setdefault(source, threading.Lock())
+
+        with source_lock:
+            database = self._databases.get(source)
+            if database is None:
+                database = self._load(source)
+                self._databases[source] = database
+
+            return database
+
+    def invalidate(self, source: Optional[str] = None):
+        """Drop in-memory databases, forcing revalidation on the next ``get``.
+
+        Args:
+            source: Source to drop, or None to drop all sources.
+
+        """
+
+        with self._lock:
+            if source is None:
+                self._databases.clear()
+            else:
+                self._databases.pop(source, None)
+
+    def _load(self, source: str) -> cantools.database.can.Database:
+        """Load a source, going through the on-disk cache. For internal use only.
+
+        Args:
+            source: Source of the dbc file.
+
+        Returns:
+            The parsed database.
+
+        """
+
+        parsed_url = urllib.parse.urlparse(source)
+        if parsed_url.scheme in ("http", "https"):
+            return self._load_remote(source)
+        elif parsed_url.scheme == "file":
+            return self._load_local(
+                source, urllib.request.url2pathname(parsed_url.path)
+            )
+        else:
+            return self._load_local(source, source)
+
+    def _load_local(self, source: str, path: str) -> cantools.database.can.Database:
+        """Load a dbc from the local filesystem, revalidating with the file's mtime.
+
+        Args:
+            source: Source the dbc was requested with.
+            path: Path of the dbc on disk.
+
+        Returns:
+            The parsed database.
+
+        """
+
+        mtime_ns = os.stat(path).st_mtime_ns
+        metadata = self._read_metadata(source)
+
+        # Unchanged since we last parsed it, skip reading the file at all.
+        if metadata is not None and metadata.get("mtime_ns") == mtime_ns:
+            database = self._read_parsed(metadata["content_hash"])
+            if database is not None:
+                return database
+
+        with open(path, "rb") as dbc_file:
+            dbc = dbc_file.read()
+
+        database, content_hash = self._parse(dbc)
+        self._write_metadata(
+            source, {"content_hash": content_hash, "mtime_ns": mtime_ns}
+        )
+        return database
+
+    def _load_remote(self, source: str) -> cantools.database.can.Database:
+        """Load a dbc over http(s), revalidating with ETag/Last-Modified.
+
+        Args:
+            source: URL of the dbc.
+
+        Returns:
+            The parsed database.
+
+        """
+
+        metadata = self._read_metadata(source)
+        cached_database = (
+            self._read_parsed(metadata["content_hash"])
+            if metadata is not None
+            else None
+        )
+
+        if self.offline or os.environ.get(OFFLINE_ENV_VAR):
+            if cached_database is None:
+                raise FileNotFoundError(
+                    f"No cached dbc for {source}, cannot load it in offline mode."
+                )
+            return cached_database
+
+        # Ask the server if our cached copy is still valid.
+        request = urllib.request.Request(source)
+        if cached_database is not None:
+            if metadata.get("etag"):
+                request.add_header("If-None-Match", metadata["etag"])
+            if metadata.get("last_modified"):
+                request.add_header("If-Modified-Since", metadata["last_modified"])
+
+        try:
+            with urllib.request.urlopen(request) as response:
+                dbc = response.read()
+                etag = response.headers.get("ETag")
+                last_modified = response.headers.get("Last-Modified")
+        except urllib.error.HTTPError as error:
+            if error.code == 304 and cached_database is not None:
+                return cached_database
+            raise
+        except urllib.error.URLError:
+            # Network is down, fall back to whatever we last saw.
+            if cached_database is not None:
+                return cached_database
+            raise
+
+        database, content_hash = self._parse(dbc)
+        self._write_metadata(
+            source,
+            {
+                "content_hash": content_hash,
+                "etag": etag,
+                "last_modified": last_modified,
+            },
+        )
+        return database
+
+    def _parse(self, dbc: bytes):
+        """Parse dbc contents, reusing a cached parse of identical contents.
+
+        Args:
+            dbc: Raw dbc file contents.
+
+        Returns:
+            A tuple of the parsed database and the content hash of the dbc.
+
+        """
+
+        content_hash = hashlib.sha256(dbc).hexdigest()
+
+        database = self._read_parsed(content_hash)
+        if database is None:
+            database = cantools.database.load_string(
+                dbc.decode("utf-8", errors="replace"), database_format="dbc"
+            )
+            self._write_parsed(content_hash, database)
+
+        return database, content_hash
+
+    def _metadata_path(self, source: str) -> str:
+        """Path of the metadata file for a source. For internal use only."""
+
+        source_hash = hashlib.sha256(source.encode()).hexdigest()
+        return os.path.join(self._cache_dir, "sources", f"{source_hash}.json")
+
+    def _parsed_path(self, content_hash: str) -> str:
+        """Path of the pickled database for some dbc contents. For internal use only."""
+
+        # Pickles are tied to the cantools version that produced them.
+        return os.path.join(
+            self._cache_dir, "parsed", f"{content_hash}-{cantools.__version__}.pickle"
+        )
+
+    def _read_metadata(self, source: str) -> Optional[Dict[str, Any]]:
+        """Read the cached metadata for a source, if any. For internal use only."""
+
+        if self._cache_dir is None:
+            return None
+
+        try:
+            with open(self._metadata_path(source), "r") as metadata_file:
+                return json.load(metadata_file)
+        except (OSError, ValueError):
+            return None
+
+    def _write_metadata(self, source: str, metadata: Dict[str, Any]):
+        """Write the cached metadata for a source. For internal use only."""
+
+        if self._cache_dir is not None:
+            self._atomic_write(
+                self._metadata_path(source), json.dumps(metadata).encode()
+            )
+
+    def _read_parsed(
+        self, content_hash: str
+    ) -> Optional[cantools.database.can.Database]:
+        """Read a pickled database, if any. For internal use only."""
+
+        if self._cache_dir is None:
+            return None
+
+        try:
+            with open(self._parsed_path(content_hash), "rb") as parsed_file:
+                return pickle.load(parsed_file)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+            return None
+
+    def _write_parsed(
+        self, content_hash: str, database: cantools.database.can.Database
+    ):
+        """Pickle a parsed database to disk. For internal use only."""
+
+        if self._cache_dir is not None:
+            self._atomic_write(
+                self._parsed_path(content_hash),
+                pickle.dumps(database, protocol=pickle.HIGHEST_PROTOCOL),
+            )
+
+    @staticmethod
+    def _atomic_write(path: str, data: bytes):
+        """Write a file such that readers never see a partial write.
+
+        The cache is best-effort, so a failed write, ie. on a read-only or full disk,
+        is logged rather than raised.
+
+        Args:
+            path: Destination path.
+            data: Contents to write.
+
+        """
+
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(temp_path, "wb") as temp_file:
+                temp_file.write(data)
+            os.replace(temp_path, path)
+        except OSError as error:
+            logger.warning("Failed to write dbc cache file %s: %s", path, error)
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+
+
+# Registry shared by every ``Can`` that isn't given its own.
+default_registry = DbcRegistry()
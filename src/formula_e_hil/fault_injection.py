@@ -0,0 +1,553 @@
+from __future__ import annotations
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+import collections
+import copy
+import heapq
+import itertools
+import random
+import threading
+import time
+import can
+from . import dbc
+from .can import LATEST_DBC_URL
+
+# Fault actions, in the order they are applied when several rules match a frame.
+ACTIONS = ("drop", "corrupt", "duplicate", "delay", "reorder")
+
+# Directions a rule can apply in.
+_DIRECTIONS = ("tx", "rx", "both")
+
+
+class FaultRule(NamedTuple):
+    """A fault to inject on frames of one message."""
+
+    # One of ``ACTIONS``.
+    action: str
+
+    # Name of the message in the dbc.
+    message_name: str
+
+    # Frames it applies to, "tx" (sent to the bus), "rx" (received), or "both".
+    direction: str = "both"
+
+    # Chance of applying to each eligible frame.
+    probability: float = 1.0
+
+    # Only frames between these times, relative to when the rule was added,
+    # are eligible. None for no bound.
+    start_secs: Optional[float] = None
+    end_secs: Optional[float] = None
+
+    # Only every nth matching frame is eligible, ie. 10 for every tenth frame.
+    every_nth: int = 1
+
+    # "delay": time to hold the frame for.
+    # "reorder": maximum time to hold the frame for, if no other frame passes.
+    delay_secs: float = 0.0
+
+    # "duplicate": number of extra copies.
+    # "reorder": number of later frames to let pass first.
+    count: int = 1
+
+    # "corrupt": payload bits to flip, as a mask over the payload's bytes,
+    # little endian, ie. 0x1 for bit 0 of byte 0. None to flip one random bit.
+    bit_mask: Optional[int] = None
+
+
+class InjectionRecord(NamedTuple):
+    """A fault injected by a ``FaultInjectionBus``."""
+
+    # Time of the injection, from ``time.time``.
+    timestamp: float
+
+    # "tx" or "rx".
+    direction: str
+
+    # Message the frame belongs to.
+    message_name: str
+    arbitration_id: int
+
+    # Action taken, one of ``ACTIONS``.
+    action: str
+
+    # Action specific detail: delay in seconds, copies, frames let pass,
+    # or the bits flipped.
+    detail: Any = None
+
+
+class _CompiledRule:
+    def __init__(self, rule: FaultRule, arbitration_id: int):
+        """A rule, with its matching state. For internal use only."""
+
+        self.rule = rule
+        self.arbitration_id = arbitration_id
+        self.added = time.monotonic()
+        self.matches = 0
+
+
+class _Held:
+    def __init__(self, message: can.Message, frames_left: int, deadline: float):
+        """A frame held back to reorder it. For internal use only."""
+
+        self.message = message
+        self.frames_left = frames_left
+        self.deadline = deadline
+
+
+class FaultInjectionBus(can.BusABC):
+    def __init__(
+        self,
+        bus_handle: can.BusABC,
+        dbc_url: str = LATEST_DBC_URL,
+        dbc_registry: Optional[dbc.DbcRegistry] = None,
+        seed: Optional[int] = None,
+        max_records: int = 100000,
+    ):
+        """Wrap a python-can handle, injecting faults into chosen frames.
+
+        Pass it to ``Can`` or ``Hil`` in place of the handle it wraps.
+        Frames can be dropped, delayed, duplicated, reordered, or bit-corrupted,
+        on transmit, receive, or both, by rules keyed by message name.
+
+        Rules are compiled into a table keyed by arbitration id, so frames of
+        messages without rules pass straight through with one dictionary lookup.
+        Corruption flips payload bits before the controller computes the CRC,
+        so the DUT sees a valid frame with wrong data.
+        Received frames that are delayed or held are stamped with the time they
+        are released, as if they had arrived then.
+
+        Periodic frames are sent through the wrapper, so faults apply to them too.
+
+        Args:
+            bus_handle: python-can handle to wrap.
+            dbc_url: Source of the dbc file the message names are from.
+            dbc_registry: Registry to load the dbc through,
+                defaults to a process-wide registry shared by all buses.
+            seed: Seed of the random numbers behind probabilities and corruption.
+            max_records: Number of most recent injections kept, see ``injections``.
+
+        """
+
+        self._bus = bus_handle
+
+        registry = dbc_registry if dbc_registry is not None else dbc.default_registry
+        self._db = registry.get(dbc_url)
+
+        self._random = random.Random(seed)
+
+        # Rules by direction, then arbitration id. Rebuilt and swapped whole,
+        # so the hot paths read them without locking.
+        self._rules: List[_CompiledRule] = []
+        self._tables: Dict[str, Dict[int, Tuple[_CompiledRule, ...]]] = {
+            "tx": {},
+            "rx": {},
+        }
+
+        # Injections, and counts by (message name, action).
+        self._records: collections.deque = collections.deque(maxlen=max_records)
+        self._counts: Dict[Tuple[str, str], int] = collections.Counter()
+
+        # Frames delayed or held for reordering, per direction,
+        # as heaps of (release time, sequence, frame) and lists of held frames.
+        self._lock = threading.Lock()
+        self._sequence = itertools.count()
+        self._delayed: Dict[str, List[Tuple[float, int, can.Message]]] = {
+            "tx": [],
+            "rx": [],
+        }
+        self._held: Dict[str, List[_Held]] = {"tx": [], "rx": []}
+
+        # Received frames ready to return, ie. duplicates and released frames.
+        self._rx_ready: collections.deque = collections.deque()
+
+        # Delayed or held transmit frames the wrapped handle failed to send.
+        self.released_send_errors = 0
+
+        # Sends delayed and held transmit frames.
+        self._tx_condition = threading.Condition(self._lock)
+        self._exit_event = threading.Event()
+        self._tx_thread = threading.Thread(target=self._tx_loop, daemon=True)
+        self._tx_thread.start()
+
+        super().__init__(channel=getattr(bus_handle, "channel_info", None))
+        self.channel_info = f"Fault injection on {bus_handle.channel_info}"
+
+    def add_rule(self, rule: FaultRule) -> FaultRule:
+        """Start injecting a fault.
+
+        Args:
+            rule: Fault to inject.
+
+        Returns:
+            The rule, to pass to ``remove_rule``.
+
+        Raises:
+            KeyError: The message is not in the dbc.
+
+        """
+
+        assert rule.action in ACTIONS, f"Unknown action {rule.action}."
+        assert rule.direction in _DIRECTIONS, f"Unknown direction {rule.direction}."
+        assert rule.every_nth >= 1
+
+        message_type = self._db.get_message_by_name(rule.message_name)
+        with self._lock:
+            self._rules.append(_CompiledRule(rule, message_type.frame_id))
+            self._compile()
+
+        return rule
+
+    def remove_rule(self, rule: FaultRule):
+        """Stop injecting a fault.
+
+        Args:
+            rule: Rule returned by ``add_rule``.
+
+        """
+
+        with self._lock:
+            self._rules = [
+                compiled for compiled in self._rules if compiled.rule != rule
+            ]
+            self._compile()
+
+    def clear_rules(self):
+        """Stop injecting every fault. Frames already delayed or held are still sent."""
+
+        with self._lock:
+            self._rules = []
+            self._compile()
+
+    def _compile(self):
+        """Rebuild the rule tables. For internal use only, call with the lock held."""
+
+        order = {action: index for index, action in enumerate(ACTIONS)}
+        tables: Dict[str, Dict[int, List[_CompiledRule]]] = {"tx": {}, "rx": {}}
+        for compiled in sorted(self._rules, key=lambda rule: order[rule.rule.action]):
+            for direction in ("tx", "rx"):
+                if compiled.rule.direction in (direction, "both"):
+                    tables[direction].setdefault(compiled.arbitration_id, []).append(
+                        compiled
+                    )
+
+        self._tables = {
+            direction: {
+                arbitration_id: tuple(rules) for arbitration_id, rules in table.items()
+            }
+            for direction, table in tables.items()
+        }
+
+    def injections(self) -> List[InjectionRecord]:
+        """Get the most recent injections, oldest first.
+
+        Returns:
+            A record per injection, see ``InjectionRecord``.
+
+        """
+
+        with self._lock:
+            return list(self._records)
+
+    def injection_counts(self) -> Dict[Tuple[str, str], int]:
+        """Get the number of injections so far.
+
+        Returns:
+            Map from (message name, action) to number of injections.
+
+        """
+
+        with self._lock:
+            return dict(self._counts)
+
+    def send(self, msg: can.Message, timeout: Optional[float] = None):
+        """Send a frame, injecting any faults that apply.
+
+        Args:
+            msg: Frame to send.
+            timeout: Passed to the wrapped handle.
+
+        """
+
+        rules = self._tables["tx"].get(msg.arbitration_id)
+        if rules is None:
+            self._bus.send(msg, timeout)
+            self._release_held("tx", msg)
+            return
+
+        frames, delay_secs, hold = self._apply("tx", msg, rules)
+        if not frames:
+            return
+
+        if hold is not None:
+            with self._lock:
+                self._held["tx"].append(_Held(frames[0], *hold))
+                self._tx_condition.notify()
+            frames = frames[1:]
+
+        if delay_secs > 0:
+            release = time.monotonic() + delay_secs
+            with self._lock:
+                for frame in frames:
+                    heapq.heappush(
+                        self._delayed["tx"], (release, next(self._sequence), frame)
+                    )
+                self._tx_condition.notify()
+            return
+
+        for frame in frames:
+            self._bus.send(frame, timeout)
+            self._release_held("tx", frame)
+
+    def _recv_internal(
+        self, timeout: Optional[float]
+    ) -> Tuple[Optional[can.Message], bool]:
+        """Receive a frame, injecting any faults that apply.
+
+        Args:
+            timeout: Maximum time to wait in seconds, None to wait forever.
+
+        Returns:
+            The frame, or None on timeout, and True as the wrapped handle filters.
+
+        """
+
+        if self._rx_ready:
+            return self._rx_ready.popleft(), True
+
+        # Wait no longer than the next delayed or held frame is due.
+        wait = timeout
+        now = time.monotonic()
+        with self._lock:
+            due = self._due("rx", now)
+            if due is None:
+                next_release = self._next_release("rx")
+                if next_release is not None:
+                    wait = max(0.0, next_release - now)
+                    if timeout is not None:
+                        wait = min(wait, timeout)
+        if due is not None:
+            return self._restamp(due), True
+
+        msg = self._bus.recv(wait)
+        if msg is None:
+            return None, True
+
+        rules = self._tables["rx"].get(msg.arbitration_id)
+        if rules is None:
+            self._release_held("rx", msg)
+            return msg, True
+
+        frames, delay_secs, hold = self._apply("rx", msg, rules)
+        if hold is not None:
+            with self._lock:
+                self._held["rx"].append(_Held(frames[0], *hold))
+            frames = frames[1:]
+
+        if delay_secs > 0:
+            release = time.monotonic() + delay_secs
+            with self._lock:
+                for frame in frames:
+                    heapq.heappush(
+                        self._delayed["rx"], (release, next(self._sequence), frame)
+                    )
+            return None, True
+
+        for frame in frames:
+            self._release_held("rx", frame)
+        self._rx_ready.extend(frames)
+        if self._rx_ready:
+            return self._rx_ready.popleft(), True
+
+        return None, True
+
+    def _apply(
+        self, direction: str, msg: can.Message, rules: Tuple[_CompiledRule, ...]
+    ) -> Tuple[List[can.Message], float, Optional[Tuple[int, float]]]:
+        """Apply every matching rule to a frame. For internal use only.
+
+        Returns:
+            Frames to pass on, copies included, the time to delay them by,
+            and if the first is held for reordering, the number of frames to let
+            pass and the deadline to release it anyway.
+
+        """
+
+        now = time.monotonic()
+        message_name = rules[0].rule.message_name
+        frames = [msg]
+        delay_secs = 0.0
+        hold = None
+
+        for compiled in rules:
+            rule = compiled.rule
+            elapsed_secs = now - compiled.added
+            if (rule.start_secs is not None and elapsed_secs < rule.start_secs) or (
+                rule.end_secs is not None and elapsed_secs >= rule.end_secs
+            ):
+                continue
+
+            compiled.matches += 1
+            if compiled.matches % rule.every_nth != 0:
+                continue
+            if rule.probability < 1.0 and self._random.random() >= rule.probability:
+                continue
+
+            action = rule.action
+            if action == "drop":
+                self._record(direction, message_name, msg, action)
+                return [], 0.0, None
+
+            if action == "corrupt":
+                data = bytearray(msg.data)
+                if not data:
+                    continue
+                corrupted = copy.copy(msg)
+                bit_mask = rule.bit_mask
+                if bit_mask is None:
+                    bit_mask = 1 << self._random.randrange(len(data) * 8)
+                bits = int.from_bytes(data, "little") ^ bit_mask
+                corrupted.data = bytearray(bits.to_bytes(len(data), "little"))
+                frames = [corrupted]
+                self._record(direction, message_name, msg, action, bit_mask)
+            elif action == "duplicate":
+                frames = frames + [copy.copy(frames[0]) for _ in range(rule.count)]
+                self._record(direction, message_name, msg, action, rule.count)
+            elif action == "delay":
+                delay_secs += rule.delay_secs
+                self._record(direction, message_name, msg, action, rule.delay_secs)
+            elif action == "reorder":
+                hold = (rule.count, now + delay_secs + rule.delay_secs)
+                self._record(direction, message_name, msg, action, rule.count)
+
+        return frames, delay_secs, hold
+
+    def _record(
+        self,
+        direction: str,
+        message_name: str,
+        msg: can.Message,
+        action: str,
+        detail: Any = None,
+    ):
+        """Log an injection. For internal use only."""
+
+        record = InjectionRecord(
+            time.time(), direction, message_name, msg.arbitration_id, action, detail
+        )
+        with self._lock:
+            self._records.append(record)
+            self._counts[(message_name, action)] += 1
+
+    def _release_held(self, direction: str, passed: can.Message):
+        """Count a frame past every held frame, releasing those it was the last of.
+        For internal use only.
+
+        """
+
+        if not self._held[direction]:
+            return
+
+        released = []
+        with self._lock:
+            held = self._held[direction]
+            for entry in held:
+                if entry.message is not passed:
+                    entry.frames_left -= 1
+            released = [entry.message for entry in held if entry.frames_left <= 0]
+            self._held[direction] = [entry for entry in held if entry.frames_left > 0]
+
+        for message in released:
+            if direction == "tx":
+                self._send_released(message)
+            else:
+                self._rx_ready.append(self._restamp(message))
+
+    @staticmethod
+    def _restamp(message: can.Message) -> can.Message:
+        """Stamp a delayed or held received frame with the time it is released,
+        so timestamp-based consumers, ie. histories, ``Can.wait_for`` and
+        latency measurements, see the fault. For internal use only.
+
+        """
+
+        message.timestamp = time.time()
+        return message
+
+    def _send_released(self, message: can.Message):
+        """Send a delayed or held frame, counting failures. For internal use only."""
+
+        try:
+            self._bus.send(message)
+        except can.CanError:
+            self.released_send_errors += 1
+
+    def _due(self, direction: str, now: float) -> Optional[can.Message]:
+        """Pop a delayed or held frame that is due. For internal use only,
+        call with the lock held.
+
+        """
+
+        delayed = self._delayed[direction]
+        if delayed and delayed[0][0] <= now:
+            return heapq.heappop(delayed)[2]
+
+        held = self._held[direction]
+        for index, entry in enumerate(held):
+            if entry.deadline <= now:
+                return held.pop(index).message
+
+        return None
+
+    def _next_release(self, direction: str) -> Optional[float]:
+        """Get when the next delayed or held frame is due. For internal use only,
+        call with the lock held.
+
+        """
+
+        releases = [entry.deadline for entry in self._held[direction]]
+        if self._delayed[direction]:
+            releases.append(self._delayed[direction][0][0])
+
+        return min(releases) if releases else None
+
+    def _tx_loop(self):
+        """Send delayed and held frames when due. For internal use only."""
+
+        while not self._exit_event.is_set():
+            with self._lock:
+                now = time.monotonic()
+                due = self._due("tx", now)
+                if due is None:
+                    next_release = self._next_release("tx")
+                    self._tx_condition.wait(
+                        None if next_release is None else next_release - now
+                    )
+                    continue
+
+            self._send_released(due)
+            self._release_held("tx", due)
+
+    def _apply_filters(self, filters: Optional[can.typechecking.CanFilters]):
+        """Install acceptance filters on the wrapped handle."""
+
+        self._bus.set_filters(filters)
+
+    @property
+    def state(self) -> can.BusState:
+        """State of the wrapped handle."""
+
+        return self._bus.state
+
+    def shutdown(self):
+        """Stop the wrapper, then shut down the wrapped handle.
+        Frames still delayed or held are dropped.
+
+        """
+
+        self._exit_event.set()
+        with self._lock:
+            self._tx_condition.notify()
+        self._tx_thread.join()
+
+        super().shutdown()
+        self._bus.shutdown()
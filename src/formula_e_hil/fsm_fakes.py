@@ -1,3 +1,4 @@
+from typing import Any, Optional
 from .ssm import Ssm
 from . import utils
 
@@ -10,14 +11,51 @@ class FsmFakes:
     _APPS_2_TRAVEL_CHANNEL = Ssm.AnalogChannel.THREE
     _STEERING_ANGLE_CHANNEL = Ssm.AnalogChannel.TWO
 
-    def __init__(self):
-        """Create an interface to the FSM (Front-Sensor Module), through an SSM."""
+    # Quantities that can be played back with a ``TracePlayer``.
+    # Maps from quantity name to the channels it drives,
+    # and the conversion from the quantity to volts.
+    TRACE_CHANNELS = {
+        "steering_angle": (
+            (_STEERING_ANGLE_CHANNEL,),
+            utils.steering_angle_to_potential_volts,
+        ),
+        "brake_pressure": (
+            (_BRAKE_PRESSURE_CHANNEL,),
+            utils.brake_pressure_to_potential_volts,
+        ),
+        "apps_1_percentage": (
+            (_APPS_1_TRAVEL_CHANNEL,),
+            utils.apps_percentage_to_potential_volts,
+        ),
+        "apps_2_percentage": (
+            (_APPS_2_TRAVEL_CHANNEL,),
+            utils.apps_percentage_to_potential_volts,
+        ),
+        "apps_percentage": (
+            (_APPS_1_TRAVEL_CHANNEL, _APPS_2_TRAVEL_CHANNEL),
+            utils.apps_percentage_to_potential_volts,
+        ),
+    }
+
+    def __init__(self, ssm_backend: Optional[Any] = None):
+        """Create an interface to the FSM (Front-Sensor Module), through an SSM.
 
-        self._ssm_handler = Ssm()
+        Args:
+            ssm_backend: Chimera SSM handle to drive, defaults to real hardware.
+
+        """
+
+        self._ssm_handler = Ssm(ssm_backend)
 
         # Set the FSM indicator LED on.
         self._ssm_handler.set_indicator(self.INDICATOR)
 
+    @property
+    def ssm(self) -> Ssm:
+        """SSM the FSM is faked through."""
+
+        return self._ssm_handler
+
     def set_steering_angle(self, angle_degrees: float):
         """Set steering angle.
 
@@ -0,0 +1,182 @@
+from __future__ import annotations
+from typing import Any, Collection, Dict, Optional, Sequence, Tuple
+import math
+import threading
+import numpy as np
+
+
+class SignalHistory:
+    def __init__(
+        self,
+        signal_names: Sequence[str],
+        capacity: int,
+        choice_signal_names: Collection[str] = (),
+    ):
+        """Fixed-capacity ring buffer of timestamped signal values.
+
+        Values are stored in preallocated float arrays, one column per signal,
+        so memory stays bounded no matter how long the bus runs.
+        Once full, the oldest samples are overwritten.
+        Signals missing from a sample, ie. in an inactive multiplexer branch,
+        are stored as NaN.
+
+        Args:
+            signal_names: Names of the signals to record.
+            capacity: Maximum number of samples kept.
+            choice_signal_names: Signals with value tables, which decode to named
+                values, of which the raw number is stored.
+
+        """
+
+        assert capacity > 0
+
+        self.signal_names = tuple(signal_names)
+        self.capacity = capacity
+
+        self._columns = {name: column for column, name in enumerate(self.signal_names)}
+        self._is_choice = tuple(
+            name in choice_signal_names for name in self.signal_names
+        )
+        self._timestamps = np.zeros(capacity, dtype=np.float64)
+        self._values = np.zeros((capacity, len(self.signal_names)), dtype=np.float64)
+
+        # Total number of samples ever appended.
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        """Number of samples currently held."""
+
+        return min(self._count, self.capacity)
+
+    def append(self, timestamp: float, signals: Dict[str, Any]):
+        """Record a sample.
+
+        Args:
+            timestamp: Time of the sample in seconds.
+            signals: Map from signal name to value, missing signals are stored as NaN.
+
+        """
+
+        with self._lock:
+            row = self._count % self.capacity
+            self._timestamps[row] = timestamp
+            values = self._values[row]
+            for column, (name, is_choice) in enumerate(
+                zip(self.signal_names, self._is_choice)
+            ):
+                value = signals.get(name)
+                if value is None:
+                    value = math.nan
+                elif is_choice:
+                    # Values outside the table decode to plain numbers.
+                    value = getattr(value, "value", value)
+                values[column] = value
+            self._count += 1
+
+    def clear(self):
+        """Drop all samples."""
+
+        with self._lock:
+            self._count = 0
+
+    def window(
+        self,
+        signal_name: str,
+        duration_secs: Optional[float] = None,
+        start: Optional[float] = None,
+        end: Optional[float] = None,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Get the samples of a signal within a time window, oldest first.
+
+        Args:
+            signal_name: Signal to query.
+            duration_secs: If set, only the trailing window of this length,
+                measured back from the newest sample.
+            start: If set, only samples at or after this timestamp.
+            end: If set, only samples at or before this timestamp.
+
+        Returns:
+            A tuple of arrays, the timestamps and the values of the signal.
+
+        """
+
+        column = self._columns[signal_name]
+        with self._lock:
+            held = len(self)
+            if held < self.capacity:
+                timestamps = self._timestamps[:held].copy()
+                values = self._values[:held, column].copy()
+            else:
+                # Unroll the ring so the oldest sample comes first.
+                oldest = self._count % self.capacity
+                timestamps = np.roll(self._timestamps, -oldest)
+                values = np.roll(self._values[:, column], -oldest)
+
+        if duration_secs is not None and held > 0:
+            trailing_start = timestamps[-1] - duration_secs
+            start = trailing_start if start is None else max(start, trailing_start)
+
+        first = 0 if start is None else np.searchsorted(timestamps, start, "left")
+        last = held if end is None else np.searchsorted(timestamps, end, "right")
+        return timestamps[first:last], values[first:last]
+
+    def stats(
+        self, signal_name: str, duration_secs: Optional[float] = None
+    ) -> Dict[str, float]:
+        """Summarize a signal over a trailing window.
+
+        Args:
+            signal_name: Signal to query.
+            duration_secs: Length of the trailing window, None for every held sample.
+
+        Returns:
+            Number of samples, and the min, max, and mean value. NaN if there are no samples.
+
+        """
+
+        _, values = self.window(signal_name, duration_secs)
+        if len(values) == 0:
+            return {"count": 0, "min": np.nan, "max": np.nan, "mean": np.nan}
+
+        return {
+            "count": len(values),
+            "min": float(values.min()),
+            "max": float(values.max()),
+            "mean": float(values.mean()),
+        }
+
+    def first_crossing(
+        self,
+        signal_name: str,
+        threshold: float,
+        rising: bool = True,
+        duration_secs: Optional[float] = None,
+        start: Optional[float] = None,
+    ) -> Optional[float]:
+        """Find when a signal first crossed a threshold.
+
+        Args:
+            signal_name: Signal to query.
+            threshold: Value to cross.
+            rising: True to find the first crossing from below to at-or-above,
+                False for the first crossing from above to at-or-below.
+            duration_secs: If set, only search the trailing window of this length.
+            start: If set, only search samples at or after this timestamp.
+
+        Returns:
+            Timestamp of the first sample past the threshold, or None if it never crossed.
+
+        """
+
+        timestamps, values = self.window(signal_name, duration_secs, start)
+        if rising:
+            crossed = (values[:-1] < threshold) & (values[1:] >= threshold)
+        else:
+            crossed = (values[:-1] > threshold) & (values[1:] <= threshold)
+
+        indices = np.flatnonzero(crossed)
+        if len(indices) == 0:
+            return None
+
+        return float(timestamps[indices[0] + 1])
@@ -0,0 +1,593 @@
+from __future__ import annotations
+from typing import Any, Dict, Optional, Tuple
+import threading
+import time
+import numpy as np
+from .metrics import Histogram
+from . import utils
+
+# PEC15 generator polynomial and seed, from the LTC681x datasheets.
+_PEC15_POLYNOMIAL = 0x4599
+_PEC15_SEED = 16
+
+
+def _build_pec15_table() -> np.ndarray:
+    """Build the byte-wise PEC15 lookup table. For internal use only."""
+
+    table = np.zeros(256, dtype=np.uint16)
+    for index in range(256):
+        remainder = index << 7
+        for _ in range(8):
+            remainder <<= 1
+            if remainder & 0x8000:
+                remainder ^= _PEC15_POLYNOMIAL
+        table[index] = remainder & 0xFFFF
+
+    return table
+
+
+_PEC15_TABLE = _build_pec15_table()
+_PEC15_TABLE_LIST = _PEC15_TABLE.tolist()
+
+
+def pec15(data: bytes) -> int:
+    """Compute the PEC of a LTC681x command or register group.
+
+    Args:
+        data: Bytes covered by the PEC.
+
+    Returns:
+        The 16 bit PEC, as transmitted, most-significant byte first.
+
+    """
+
+    remainder = _PEC15_SEED
+    for byte in data:
+        remainder = (remainder << 8) ^ _PEC15_TABLE_LIST[
+            ((remainder >> 7) ^ byte) & 0xFF
+        ]
+
+    return (remainder << 1) & 0xFFFF
+
+
+def _pec15_rows(data: np.ndarray) -> np.ndarray:
+    """Compute the PEC of every row of a byte array, vectorized over rows.
+    For internal use only.
+
+    Args:
+        data: Array of bytes, one PEC per row.
+
+    Returns:
+        The PEC of each row.
+
+    """
+
+    remainder = np.full(len(data), _PEC15_SEED, dtype=np.uint32)
+    for column in data.T.astype(np.uint32):
+        remainder = (remainder << 8) ^ _PEC15_TABLE[((remainder >> 7) ^ column) & 0xFF]
+
+    return ((remainder << 1) & 0xFFFF).astype(np.uint16)
+
+
+# Register value after a clear, or before the first conversion.
+_CLEARED = 0xFFFF
+
+# Cell and aux register LSB, in volts.
+_REGISTER_LSB_VOLTS = 100e-6
+
+# Bytes of a register group, and its PEC.
+_GROUP_BYTES = 6
+_CHUNK_BYTES = _GROUP_BYTES + 2
+
+# Read commands of each register group.
+_READ_CELL_COMMANDS = {
+    0x004: 0,
+    0x006: 1,
+    0x008: 2,
+    0x00A: 3,
+    0x009: 4,
+    0x00B: 5,
+}
+_READ_AUX_COMMANDS = {0x00C: 0, 0x00E: 1, 0x00D: 2, 0x00F: 3}
+_READ_STATUS_COMMANDS = {0x010: 0, 0x012: 1}
+_READ_CONFIG_COMMANDS = {0x002: 0, 0x026: 1}
+_WRITE_CONFIG_COMMANDS = {0x001: 0, 0x024: 1}
+
+# Conversion commands, as (mask, value), the masked-out bits being mode and channel.
+_ADCVAX = (0x66F, 0x46F)
+_ADCV = (0x668, 0x260)
+_ADOW = (0x628, 0x228)
+_ADAX = (0x678, 0x460)
+_ADSTAT = (0x678, 0x468)
+
+# Clear commands.
+_CLRCELL = 0x711
+_CLRAUX = 0x712
+_CLRSTAT = 0x713
+
+# Aux register slots of each GPIO, and of the second reference, in register order.
+# Slots not listed stay cleared.
+_GPIO_AUX_SLOTS = (0, 1, 2, 3, 4, 6, 7, 8, 9)
+_REFERENCE_AUX_SLOT = 5
+_REFERENCE_VOLTS = 3.0
+
+# Fixed status readings: die temperature, analog and digital supplies.
+_DIE_TEMPERATURE_CELSIUS = 25.0
+_ANALOG_SUPPLY_VOLTS = 5.0
+_DIGITAL_SUPPLY_VOLTS = 3.3
+
+
+class IsoSpiChain:
+    def __init__(
+        self,
+        segments: int,
+        cells_per_segment: int = 18,
+        temperatures_per_segment: int = 8,
+    ):
+        """Emulate a daisy chain of LTC681x battery monitors, one per segment.
+
+        Answers the BMS's isoSPI commands: cell, aux, and temperature conversions,
+        register group reads, configuration writes, and clears.
+        Segment 0 is closest to the BMS, so is read first.
+        Temperatures feed GPIO1 onwards through a thermistor divider,
+        see ``utils.thermistor_temperature_to_potential_volts``.
+
+        Each register group's response, PEC included, is built once per
+        conversion that changes it, and only for the segments that changed,
+        so reads are a lookup.
+
+        Args:
+            segments: Number of monitors in the chain.
+            cells_per_segment: Number of cells per monitor, 12 for a LTC6811
+                or 18 for a LTC6813.
+            temperatures_per_segment: Number of thermistors per monitor,
+                at most 9.
+
+        """
+
+        assert 1 <= cells_per_segment <= 18
+        assert 0 <= temperatures_per_segment <= len(_GPIO_AUX_SLOTS)
+
+        self.segments = segments
+        self.cells_per_segment = cells_per_segment
+        self.temperatures_per_segment = temperatures_per_segment
+
+        self._cell_groups = -(-cells_per_segment // 3)
+        self._aux_groups = 4 if temperatures_per_segment > 5 else 2
+
+        # Analog inputs, as register codes, guarded by the lock.
+        self._lock = threading.Lock()
+        self._cell_inputs = np.zeros((segments, self._cell_groups * 3), dtype=np.uint16)
+        self._aux_inputs = np.full(
+            (segments, self._aux_groups * 3), _CLEARED, dtype=np.uint16
+        )
+        self._aux_inputs[:, _REFERENCE_AUX_SLOT] = self._volts_to_codes(
+            _REFERENCE_VOLTS
+        )
+
+        # Registers, as of the last conversion.
+        self._cell_registers = np.full_like(self._cell_inputs, _CLEARED)
+        self._aux_registers = np.full_like(self._aux_inputs, _CLEARED)
+        self._status_registers = np.full((segments, 6), _CLEARED, dtype=np.uint16)
+        self._config_registers = np.zeros((segments, 2, _GROUP_BYTES), dtype=np.uint8)
+
+        # Response chunks of each segment, data and PEC, per register group,
+        # and the whole chain's response, joined lazily after any chunk changes.
+        self._cell_chunks = self._chunks(self._cell_registers)
+        self._aux_chunks = self._chunks(self._aux_registers)
+        self._cell_responses: Dict[int, bytes] = {}
+        self._aux_responses: Dict[int, bytes] = {}
+
+        # Injected faults, per segment.
+        self._pec_errors = np.zeros(segments, dtype=bool)
+        self._open_wires: Dict[int, set] = {}
+        self._comm_loss_segment: Optional[int] = None
+
+        # Statistics.
+        self.commands = 0
+        self.command_pec_errors = 0
+        self.write_pec_errors = 0
+        self.unknown_commands = 0
+        self.chunks_rebuilt = 0
+        self.response_secs = Histogram()
+
+    @staticmethod
+    def _volts_to_codes(volts: Any) -> Any:
+        """Convert volts to register codes. For internal use only."""
+
+        return np.clip(np.rint(np.asarray(volts) / _REGISTER_LSB_VOLTS), 0, 0xFFFE)
+
+    @staticmethod
+    def _chunks(registers: np.ndarray) -> np.ndarray:
+        """Build every response chunk of a register file. For internal use only.
+
+        Args:
+            registers: Registers, one row per segment, 3 per group.
+
+        Returns:
+            Chunks, indexed by segment and group, each 6 bytes of data then the PEC.
+
+        """
+
+        segments, slots = registers.shape
+        chunks = np.zeros((segments, slots // 3, _CHUNK_BYTES), dtype=np.uint8)
+        chunks[:, :, :_GROUP_BYTES] = (
+            registers.astype("<u2").view(np.uint8).reshape(segments, -1, _GROUP_BYTES)
+        )
+        pecs = _pec15_rows(chunks[:, :, :_GROUP_BYTES].reshape(-1, _GROUP_BYTES))
+        chunks[:, :, _GROUP_BYTES:] = (
+            pecs.astype(">u2").view(np.uint8).reshape(segments, -1, 2)
+        )
+        return chunks
+
+    def set_cell_voltages(self, volts: np.ndarray):
+        """Set every cell's voltage, read by the next cell conversion.
+
+        Args:
+            volts: Voltages, one row per segment and one column per cell.
+
+        """
+
+        codes = self._volts_to_codes(volts).astype(np.uint16)
+        with self._lock:
+            self._cell_inputs[:, : self.cells_per_segment] = codes
+
+    def set_temperatures(self, celsius: np.ndarray):
+        """Set every thermistor's temperature, read by the next aux conversion.
+
+        Args:
+            celsius: Temperatures, one row per segment and one column per thermistor.
+
+        """
+
+        codes = self._volts_to_codes(
+            utils.thermistor_temperature_to_potential_volts(
+                np.asarray(celsius, dtype=np.float64)
+            )
+        ).astype(np.uint16)
+        slots = list(_GPIO_AUX_SLOTS[: self.temperatures_per_segment])
+        with self._lock:
+            self._aux_inputs[:, slots] = codes
+
+    def inject_pec_error(self, segment: int, enabled: bool = True):
+        """Corrupt the PEC of every register group a monitor responds with.
+
+        Args:
+            segment: Segment of the monitor.
+            enabled: False to remove the fault.
+
+        """
+
+        with self._lock:
+            self._pec_errors[segment] = enabled
+
+    def inject_open_wire(self, segment: int, wire: int, enabled: bool = True):
+        """Disconnect a cell sense wire, as seen by open wire conversions.
+
+        With wire ``n`` open, pull-up conversions read cell ``n + 1`` as zero,
+        so the BMS sees a pull-up minus pull-down delta below -400 mV.
+        An open C0 reads cell 1 as zero with pull-up,
+        and an open top wire reads the top cell as zero with pull-down.
+
+        Args:
+            segment: Segment of the monitor.
+            wire: Sense wire, 0 for C0 up to the number of cells.
+            enabled: False to remove the fault.
+
+        """
+
+        assert 0 <= wire <= self.cells_per_segment
+
+        with self._lock:
+            wires = self._open_wires.setdefault(segment, set())
+            if enabled:
+                wires.add(wire)
+            else:
+                wires.discard(wire)
+
+    def inject_comm_loss(self, segment: Optional[int]):
+        """Break the chain, so a monitor and every one past it stop responding.
+
+        Args:
+            segment: First segment that stops responding, None to restore the chain.
+
+        """
+
+        with self._lock:
+            self._comm_loss_segment = segment
+
+    def clear_faults(self):
+        """Remove every injected fault."""
+
+        with self._lock:
+            self._pec_errors[:] = False
+            self._open_wires.clear()
+            self._comm_loss_segment = None
+
+    def attach(self, ssm: Any, side: str = "low"):
+        """Answer transactions on an SSM's isoSPI port.
+
+        Args:
+            ssm: SSM, or fakes driving one, backed by a ``VirtualSsm``.
+            side: "low" or "high" side isoSPI port.
+
+        Raises:
+            TypeError: The SSM's SPI device cannot be answered in process,
+                ie. it is real hardware. Feed ``respond`` from the transport instead.
+
+        """
+
+        ssm = getattr(ssm, "ssm", ssm)
+        device = ssm.isospi_low_side if side == "low" else ssm.isospi_high_side
+        if not hasattr(device, "responder"):
+            raise TypeError(f"{device!r} cannot be answered in process.")
+
+        device.responder = self.respond
+
+    def respond(self, request: bytes) -> bytes:
+        """Answer one isoSPI command from the BMS.
+
+        Args:
+            request: Command and its PEC, followed by data for write commands.
+
+        Returns:
+            The chain's response, empty for commands without one.
+            Monitors that do not respond leave the line idle, reading as 0xFF.
+
+        """
+
+        start = time.perf_counter()
+        with self._lock:
+            response = self._respond(request)
+        self.response_secs.observe(time.perf_counter() - start)
+        return response
+
+    def stats(self) -> Dict[str, Any]:
+        """Get emulator statistics.
+
+        Returns:
+            Number of commands, commands and writes rejected for a bad PEC,
+            unknown commands, response chunks rebuilt after conversions,
+            and time to build each response, see ``Histogram.as_dict``.
+
+        """
+
+        return {
+            "commands": self.commands,
+            "command_pec_errors": self.command_pec_errors,
+            "write_pec_errors": self.write_pec_errors,
+            "unknown_commands": self.unknown_commands,
+            "chunks_rebuilt": self.chunks_rebuilt,
+            "response_secs": self.response_secs.as_dict(),
+        }
+
+    def _respond(self, request: bytes) -> bytes:
+        """Answer a command. For internal use only, call with the lock held."""
+
+        self.commands += 1
+        idle = b"\xff" * (self.segments * _CHUNK_BYTES)
+
+        if len(request) < 4 or pec15(request[:2]) != int.from_bytes(
+            request[2:4], "big"
+        ):
+            # Monitors ignore commands with a bad PEC.
+            self.command_pec_errors += 1
+            return idle
+
+        command = int.from_bytes(request[:2], "big") & 0x7FF
+
+        group = _READ_CELL_COMMANDS.get(command)
+        if group is not None:
+            if group >= self._cell_groups:
+                return idle
+            return self._read_response(self._cell_chunks, self._cell_responses, group)
+
+        group = _READ_AUX_COMMANDS.get(command)
+        if group is not None:
+            if group >= self._aux_groups:
+                return idle
+            return self._read_response(self._aux_chunks, self._aux_responses, group)
+
+        group = _READ_STATUS_COMMANDS.get(command)
+        if group is not None:
+            registers = self._status_registers[:, group * 3 : group * 3 + 3]
+            return self._faulted(self._chunks(registers)[:, 0].tobytes())
+
+        group = _READ_CONFIG_COMMANDS.get(command)
+        if group is not None:
+            data = self._config_registers[:, group]
+            chunks = np.zeros((self.segments, _CHUNK_BYTES), dtype=np.uint8)
+            chunks[:, :_GROUP_BYTES] = data
+            chunks[:, _GROUP_BYTES:] = (
+                _pec15_rows(data).astype(">u2").view(np.uint8).reshape(-1, 2)
+            )
+            return self._faulted(chunks.tobytes())
+
+        group = _WRITE_CONFIG_COMMANDS.get(command)
+        if group is not None:
+            self._write_config(group, request[4:])
+            return b""
+
+        if command & _ADCVAX[0] == _ADCVAX[1]:
+            self._convert_cells(np.arange(self._cell_inputs.shape[1]))
+            self._convert_aux(0)
+        elif command & _ADCV[0] == _ADCV[1]:
+            self._convert_cells(self._cell_slots(command & 0x7))
+        elif command & _ADOW[0] == _ADOW[1]:
+            self._convert_open_wire(bool(command & 0x40), command & 0x7)
+        elif command & _ADSTAT[0] == _ADSTAT[1]:
+            self._convert_status()
+        elif command & _ADAX[0] == _ADAX[1]:
+            self._convert_aux(command & 0x7)
+        elif command == _CLRCELL:
+            self._latch_cells(np.full_like(self._cell_registers, _CLEARED))
+        elif command == _CLRAUX:
+            self._latch_aux(np.full_like(self._aux_registers, _CLEARED))
+        elif command == _CLRSTAT:
+            self._status_registers[:] = _CLEARED
+        else:
+            self.unknown_commands += 1
+
+        # Conversion and clear commands have no response.
+        return b""
+
+    def _read_response(
+        self, chunks: np.ndarray, responses: Dict[int, bytes], group: int
+    ) -> bytes:
+        """Get the chain's response to a register group read. For internal use only."""
+
+        response = responses.get(group)
+        if response is None:
+            response = responses[group] = chunks[:, group].tobytes()
+
+        return self._faulted(response)
+
+    def _faulted(self, response: bytes) -> bytes:
+        """Apply injected faults to a response. For internal use only."""
+
+        if not self._pec_errors.any() and self._comm_loss_segment is None:
+            return response
+
+        faulted = bytearray(response)
+        for segment in np.flatnonzero(self._pec_errors).tolist():
+            faulted[segment * _CHUNK_BYTES + _GROUP_BYTES] ^= 0x80
+
+        if self._comm_loss_segment is not None:
+            start = self._comm_loss_segment * _CHUNK_BYTES
+            faulted[start:] = b"\xff" * (len(faulted) - start)
+
+        return bytes(faulted)
+
+    def _write_config(self, group: int, data: bytes):
+        """Write configuration registers, farthest monitor first.
+        For internal use only.
+
+        """
+
+        for index in range(min(self.segments, len(data) // _CHUNK_BYTES)):
+            chunk = data[index * _CHUNK_BYTES : (index + 1) * _CHUNK_BYTES]
+            if pec15(chunk[:_GROUP_BYTES]) != int.from_bytes(
+                chunk[_GROUP_BYTES:], "big"
+            ):
+                self.write_pec_errors += 1
+                continue
+
+            segment = self.segments - 1 - index
+            self._config_registers[segment, group] = np.frombuffer(
+                chunk[:_GROUP_BYTES], dtype=np.uint8
+            )
+
+    def _cell_slots(self, channel: int) -> np.ndarray:
+        """Get the cell register slots a conversion's channel selection covers.
+        For internal use only.
+
+        """
+
+        slots = np.arange(self._cell_inputs.shape[1])
+        if channel == 0 or channel > 6:
+            return slots
+
+        return slots[slots % 6 == channel - 1]
+
+    def _convert_cells(self, slots: np.ndarray):
+        """Latch cell inputs into the registers. For internal use only."""
+
+        registers = self._cell_registers.copy()
+        registers[:, slots] = self._cell_inputs[:, slots]
+        self._latch_cells(registers)
+
+    def _convert_open_wire(self, pull_up: bool, channel: int):
+        """Latch cell inputs with open sense wires applied. For internal use only."""
+
+        inputs = self._cell_inputs.copy()
+        top = self.cells_per_segment
+        for segment, wires in self._open_wires.items():
+            for wire in wires:
+                if pull_up and wire < top:
+                    # Cell n + 1 sits above wire n, cells are 1 based.
+                    inputs[segment, wire] = 0
+                elif not pull_up and wire == top:
+                    inputs[segment, top - 1] = 0
+
+        slots = self._cell_slots(channel)
+        registers = self._cell_registers.copy()
+        registers[:, slots] = inputs[:, slots]
+        self._latch_cells(registers)
+
+    def _convert_aux(self, channel: int):
+        """Latch aux inputs into the registers. For internal use only."""
+
+        registers = self._aux_registers.copy()
+        if channel == 0 or channel > 6:
+            registers[:] = self._aux_inputs
+        elif channel == 6:
+            registers[:, _REFERENCE_AUX_SLOT] = self._aux_inputs[:, _REFERENCE_AUX_SLOT]
+        else:
+            # GPIO n and n + 5, 1 based.
+            for gpio in (channel - 1, channel + 4):
+                if gpio < len(_GPIO_AUX_SLOTS):
+                    slot = _GPIO_AUX_SLOTS[gpio]
+                    if slot < registers.shape[1]:
+                        registers[:, slot] = self._aux_inputs[:, slot]
+
+        self._latch_aux(registers)
+
+    def _convert_status(self):
+        """Latch the sum of cells, die temperature, and supplies. For internal use only."""
+
+        cells = self._cell_inputs[:, : self.cells_per_segment].astype(np.float64)
+        self._status_registers[:, 0] = np.clip(
+            np.rint(cells.sum(axis=1) / 20), 0, 0xFFFE
+        )
+        self._status_registers[:, 1] = round((_DIE_TEMPERATURE_CELSIUS + 276) * 76)
+        self._status_registers[:, 2] = self._volts_to_codes(_ANALOG_SUPPLY_VOLTS)
+        self._status_registers[:, 3] = self._volts_to_codes(_DIGITAL_SUPPLY_VOLTS)
+        self._status_registers[:, 4:] = 0
+
+    def _latch_cells(self, registers: np.ndarray):
+        """Update cell registers, rebuilding changed chunks. For internal use only."""
+
+        self._rebuild(
+            self._cell_registers, registers, self._cell_chunks, self._cell_responses
+        )
+
+    def _latch_aux(self, registers: np.ndarray):
+        """Update aux registers, rebuilding changed chunks. For internal use only."""
+
+        self._rebuild(
+            self._aux_registers, registers, self._aux_chunks, self._aux_responses
+        )
+
+    def _rebuild(
+        self,
+        registers: np.ndarray,
+        new_registers: np.ndarray,
+        chunks: np.ndarray,
+        responses: Dict[int, bytes],
+    ):
+        """Write new register values, and rebuild only the chunks that changed.
+        For internal use only.
+
+        """
+
+        changed = (registers != new_registers).reshape(self.segments, -1, 3).any(axis=2)
+        if not changed.any():
+            return
+
+        registers[:] = new_registers
+        segments, groups = np.nonzero(changed)
+        dirty: Tuple[np.ndarray, np.ndarray] = (segments, groups)
+
+        data = (
+            new_registers.astype("<u2")
+            .view(np.uint8)
+            .reshape(self.segments, -1, _GROUP_BYTES)[dirty]
+        )
+        chunks[dirty + (slice(None, _GROUP_BYTES),)] = data
+        chunks[dirty + (slice(_GROUP_BYTES, None),)] = (
+            _pec15_rows(data).astype(">u2").view(np.uint8).reshape(-1, 2)
+        )
+
+        for group in set(groups.tolist()):
+            responses.pop(group, None)
+        self.chunks_rebuilt += len(segments)
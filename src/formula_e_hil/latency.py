@@ -0,0 +1,239 @@
+from __future__ import annotations
+from typing import Any, Callable, Dict, Optional, Sequence, Tuple, Union
+import json
+import time
+import numpy as np
+from .can import Can
+from .fsm_fakes import FsmFakes
+from .rsm_fakes import RsmFakes
+from .ssm import Ssm
+
+
+class LatencyResults:
+    def __init__(
+        self,
+        latencies_secs: Sequence[float],
+        timeouts: int,
+        round_trip_secs: float,
+        label: Optional[str] = None,
+    ):
+        """Stimulus-to-response latencies, see ``measure_latency``.
+
+        Args:
+            latencies_secs: Latency of each response, corrected for transport delay.
+            timeouts: Number of stimuli with no response within the timeout.
+            round_trip_secs: Median chimera round trip time used for the correction.
+            label: Free-form label, ie. the firmware build under test.
+
+        """
+
+        self.latencies_secs = np.asarray(latencies_secs, dtype=np.float64)
+        self.timeouts = timeouts
+        self.round_trip_secs = round_trip_secs
+        self.label = label
+
+    def percentiles(
+        self, percents: Sequence[float] = (50, 90, 99)
+    ) -> Dict[float, float]:
+        """Get latency percentiles.
+
+        Args:
+            percents: Percentiles to compute, in [0, 100].
+
+        Returns:
+            Map from percentile to latency in seconds.
+
+        """
+
+        if len(self.latencies_secs) == 0:
+            return {percent: float("nan") for percent in percents}
+
+        values = np.percentile(self.latencies_secs, percents)
+        return dict(zip(percents, values.tolist()))
+
+    def histogram(self, bins: int = 20) -> Tuple[np.ndarray, np.ndarray]:
+        """Get a histogram of the latencies.
+
+        Args:
+            bins: Number of equal-width bins.
+
+        Returns:
+            The count in each bin, and the bin edges in seconds.
+
+        """
+
+        return np.histogram(self.latencies_secs, bins)
+
+    def summary(self) -> Dict[str, Any]:
+        """Get summary statistics.
+
+        Returns:
+            A dictionary of the sample and timeout counts, the round trip time,
+            and the minimum, mean, median, 90th, 99th percentile,
+            and maximum latencies in seconds.
+
+        """
+
+        summary = {
+            "label": self.label,
+            "count": len(self.latencies_secs),
+            "timeouts": self.timeouts,
+            "round_trip_secs": self.round_trip_secs,
+        }
+        if len(self.latencies_secs) == 0:
+            return summary
+
+        p50, p90, p99 = self.percentiles((50, 90, 99)).values()
+        summary.update(
+            {
+                "min_secs": float(self.latencies_secs.min()),
+                "mean_secs": float(self.latencies_secs.mean()),
+                "p50_secs": p50,
+                "p90_secs": p90,
+                "p99_secs": p99,
+                "max_secs": float(self.latencies_secs.max()),
+            }
+        )
+        return summary
+
+    def save(self, path: str):
+        """Save the results as JSON, to compare against later builds.
+
+        Args:
+            path: Path of the file to write.
+
+        """
+
+        with open(path, "w") as results_file:
+            json.dump(
+                {
+                    "label": self.label,
+                    "timeouts": self.timeouts,
+                    "round_trip_secs": self.round_trip_secs,
+                    "latencies_secs": self.latencies_secs.tolist(),
+                },
+                results_file,
+            )
+
+    @classmethod
+    def load(cls, path: str) -> LatencyResults:
+        """Load results saved with ``save``.
+
+        Args:
+            path: Path of the file to read.
+
+        Returns:
+            The loaded results.
+
+        """
+
+        with open(path) as results_file:
+            saved = json.load(results_file)
+
+        return cls(
+            saved["latencies_secs"],
+            saved["timeouts"],
+            saved["round_trip_secs"],
+            saved["label"],
+        )
+
+
+def measure_latency(
+    stimulus: Callable[[], None],
+    stimulus_ssm: Union[Ssm, FsmFakes, RsmFakes],
+    bus: Can,
+    message_name: str,
+    signal_name: str,
+    predicate: Callable[[Any], bool],
+    repeats: int = 100,
+    reset: Optional[Callable[[], None]] = None,
+    settle_secs: float = 0.1,
+    timeout: float = 1.0,
+    round_trip_samples: int = 20,
+    label: Optional[str] = None,
+) -> LatencyResults:
+    """Measure how long the system under test takes to respond to a stimulus.
+
+    Each repeat resets, waits for the system to settle, applies the stimulus,
+    and waits for the first frame after it takes effect that satisfies
+    the response condition, so latencies are never negative.
+
+    The stimulus takes effect when its last chimera transaction reaches the SSM.
+    That is estimated as when the transaction returned, less half the median
+    round trip time, measured up front. Only transactions the stimulus sends
+    from the calling thread are timed, see ``Ssm.track_transactions``,
+    so background writes, ie. PWM edges, never count as the stimulus.
+    Frame timestamps must share the ``time.time`` clock, as with socketcan
+    and virtual busses.
+
+    Eg. ``measure_latency(lambda: hil.fsm_fakes.set_apps_percentage(50),
+    hil.fsm_fakes, hil.inverter_bus, "INV_Command", "INV_TorqueRequest",
+    lambda torque: torque > 0, reset=lambda: hil.fsm_fakes.set_apps_percentage(0))``
+
+    Args:
+        stimulus: Applies the stimulus through the SSM, from the calling thread.
+        stimulus_ssm: SSM the stimulus is applied through, or the fakes driving it.
+        bus: Bus the response is received on.
+        message_name: Name of the response message.
+        signal_name: Name of the response signal.
+        predicate: Called with each received value of the signal,
+            true once the system has responded.
+        repeats: Number of times to apply the stimulus.
+        reset: Returns the system to its state before the stimulus.
+        settle_secs: Time to wait after each reset.
+        timeout: Maximum time to wait for each response in seconds.
+        round_trip_samples: Number of transactions timed to measure the round trip.
+        label: Free-form label for the results, ie. the firmware build under test.
+
+    Returns:
+        The measured latencies.
+
+    Raises:
+        ValueError: The stimulus sent no chimera transactions,
+            ie. it set the output it was already at, so a ``reset`` is needed.
+
+    """
+
+    ssm = getattr(stimulus_ssm, "ssm", stimulus_ssm)
+    round_trip_secs = float(np.median(ssm.measure_round_trip(round_trip_samples)))
+    one_way_secs = round_trip_secs / 2
+
+    latencies_secs = []
+    timeouts = 0
+
+    for _ in range(repeats):
+        if reset is not None:
+            reset()
+        time.sleep(settle_secs)
+
+        # Register before the stimulus, so a fast response cannot be missed.
+        expectation = bus.expect(message_name, signal_name, predicate)
+        try:
+            with ssm.track_transactions() as tracker:
+                stimulus()
+
+            if tracker.transactions == 0:
+                raise ValueError("The stimulus sent no chimera transactions.")
+            stimulus_time = tracker.last_transaction_time - one_way_secs
+
+            deadline = time.monotonic() + timeout
+            while True:
+                try:
+                    response_time = expectation.wait(
+                        max(0.0, deadline - time.monotonic())
+                    )
+                except TimeoutError:
+                    timeouts += 1
+                    break
+
+                if response_time >= stimulus_time:
+                    latencies_secs.append(response_time - stimulus_time)
+                    break
+
+                # Matched a frame from before the stimulus took effect,
+                # wait for the next one.
+                expectation.rearm()
+        finally:
+            expectation.cancel()
+
+    return LatencyResults(latencies_secs, timeouts, round_trip_secs, label)
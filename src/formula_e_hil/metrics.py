@@ -0,0 +1,391 @@
+from __future__ import annotations
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+import bisect
+import http.server
+import threading
+import time
+
+# Histogram bucket upper bounds for durations, from 1 us to 1 s.
+DURATION_BUCKETS_SECS = (
+    1e-6,
+    2e-6,
+    5e-6,
+    1e-5,
+    2e-5,
+    5e-5,
+    1e-4,
+    2e-4,
+    5e-4,
+    1e-3,
+    2e-3,
+    5e-3,
+    1e-2,
+    2e-2,
+    5e-2,
+    1e-1,
+    2e-1,
+    5e-1,
+    1.0,
+)
+
+# Prefix of every exported metric name.
+_PROMETHEUS_PREFIX = "formula_e_hil"
+
+
+class Histogram:
+    def __init__(self, bounds: Sequence[float] = DURATION_BUCKETS_SECS):
+        """A fixed-bucket histogram, cheap enough to update on every frame.
+
+        Args:
+            bounds: Sorted upper bounds of the buckets,
+                values above the last bound are counted in an overflow bucket.
+
+        """
+
+        self.bounds = tuple(bounds)
+        self.count = 0
+        self.sum = 0.0
+
+        self._bucket_counts = [0] * (len(self.bounds) + 1)
+
+    def observe(self, value: float):
+        """Record a value.
+
+        Args:
+            value: Value to record.
+
+        """
+
+        self._bucket_counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def as_dict(self) -> Dict[str, Any]:
+        """Snapshot the histogram.
+
+        Returns:
+            Number of values, their sum, and a list of (upper bound, cumulative count)
+            buckets, the last bound being infinity.
+
+        """
+
+        buckets = []
+        cumulative = 0
+        for bound, bucket_count in zip(
+            self.bounds + (float("inf"),), list(self._bucket_counts)
+        ):
+            cumulative += bucket_count
+            buckets.append((bound, cumulative))
+
+        return {"count": self.count, "sum": self.sum, "buckets": buckets}
+
+
+class BusMetrics:
+    def __init__(self):
+        """Counters for one CAN bus, updated by ``Can``'s RX and TX paths.
+
+        Counters are plain ints, only written by the thread that owns the path.
+        """
+
+        self.rx_frames = 0
+        self.rx_error_frames = 0
+        self.rx_overruns = 0
+        self.rx_failures = 0
+        self.tx_frames = 0
+        self.tx_errors = 0
+        self.decode_secs = Histogram()
+
+        # Counts at the previous snapshot, to compute rates between snapshots.
+        self._last_snapshot = (time.monotonic(), 0, 0)
+
+    def rates(self, rx_frames: Optional[int] = None) -> Dict[str, float]:
+        """Get RX and TX frames/sec since the previous call.
+
+        Args:
+            rx_frames: Frames received so far, if counted elsewhere,
+                ie. by a decode process, defaults to ``rx_frames``.
+
+        Returns:
+            A dictionary of RX and TX rates.
+
+        """
+
+        now = time.monotonic()
+        last_time, last_rx_frames, last_tx_frames = self._last_snapshot
+        if rx_frames is None:
+            rx_frames = self.rx_frames
+        tx_frames = self.tx_frames
+        self._last_snapshot = (now, rx_frames, tx_frames)
+
+        elapsed_secs = now - last_time
+        if elapsed_secs <= 0:
+            return {"rx_frames_per_sec": 0.0, "tx_frames_per_sec": 0.0}
+
+        return {
+            "rx_frames_per_sec": (rx_frames - last_rx_frames) / elapsed_secs,
+            "tx_frames_per_sec": (tx_frames - last_tx_frames) / elapsed_secs,
+        }
+
+
+class SsmMetrics:
+    def __init__(self):
+        """Timing of chimera transactions, updated by ``Ssm``."""
+
+        self.transaction_secs = Histogram()
+
+
+class _PrometheusWriter:
+    def __init__(self):
+        """Builds Prometheus text exposition format. For internal use only."""
+
+        # Samples grouped by metric name, in insertion order.
+        self._metrics: Dict[str, Tuple[str, str, List[str]]] = {}
+
+    def add(
+        self,
+        name: str,
+        metric_type: str,
+        help_text: str,
+        value: float,
+        labels: Dict[str, str],
+    ):
+        """Add a counter or gauge sample."""
+
+        samples = self._family(name, metric_type, help_text)
+        samples.append(f"{self._name(name)}{self._labels(labels)} {float(value)!r}")
+
+    def add_histogram(
+        self,
+        name: str,
+        help_text: str,
+        histogram: Dict[str, Any],
+        labels: Dict[str, str],
+    ):
+        """Add the samples of a histogram, see ``Histogram.as_dict``."""
+
+        samples = self._family(name, "histogram", help_text)
+        full_name = self._name(name)
+        for bound, cumulative in histogram["buckets"]:
+            bucket_labels = dict(
+                labels, le="+Inf" if bound == float("inf") else repr(bound)
+            )
+            samples.append(
+                f"{full_name}_bucket{self._labels(bucket_labels)} {cumulative}"
+            )
+        samples.append(f"{full_name}_sum{self._labels(labels)} {histogram['sum']!r}")
+        samples.append(f"{full_name}_count{self._labels(labels)} {histogram['count']}")
+
+    def text(self) -> str:
+        """Get the exposition text."""
+
+        lines = []
+        for name, (metric_type, help_text, samples) in self._metrics.items():
+            lines.append(f"# HELP {self._name(name)} {help_text}")
+            lines.append(f"# TYPE {self._name(name)} {metric_type}")
+            lines.extend(samples)
+
+        return "\n".join(lines) + "\n"
+
+    def _family(self, name: str, metric_type: str, help_text: str) -> List[str]:
+        """Get the sample list of a metric, creating it if needed."""
+
+        return self._metrics.setdefault(name, (metric_type, help_text, []))[2]
+
+    @staticmethod
+    def _name(name: str) -> str:
+        """Prefix a metric name."""
+
+        return f"{_PROMETHEUS_PREFIX}_{name}"
+
+    @staticmethod
+    def _labels(labels: Dict[str, str]) -> str:
+        """Format labels."""
+
+        if not labels:
+            return ""
+
+        escaped = []
+        for key, value in labels.items():
+            value = str(value).replace("\\", "\\\\").replace('"', '\\"')
+            escaped.append(f'{key}="{value}"')
+        return "{" + ",".join(escaped) + "}"
+
+
+def prometheus_text(snapshot: Dict[str, Any]) -> str:
+    """Format a ``Hil.metrics_snapshot`` in Prometheus text exposition format.
+
+    Args:
+        snapshot: Snapshot to format.
+
+    Returns:
+        The exposition text.
+
+    """
+
+    writer = _PrometheusWriter()
+
+    for bus_name, bus in snapshot["busses"].items():
+        labels = {"bus": bus_name}
+        for key, help_text in (
+            ("rx_frames", "Frames received."),
+            ("rx_error_frames", "Error frames received."),
+            ("rx_overruns", "Receive queue overruns reported by the interface."),
+            ("unknown_frames", "Frames received with ids not in the dbc."),
+            ("rx_failures", "Frames that failed to decode or dispatch."),
+            ("tx_frames", "Frames transmitted, excluding periodic frames."),
+            ("tx_errors", "Failed transmissions, excluding periodic frames."),
+        ):
+            if key in bus:
+                writer.add(f"can_{key}_total", "counter", help_text, bus[key], labels)
+        if "decode_secs" in bus:
+            writer.add_histogram(
+                "can_decode_seconds",
+                "Time to decode a received frame.",
+                bus["decode_secs"],
+                labels,
+            )
+
+        for frame_id, jitter in bus["periodic_jitter"].items():
+            frame_labels = dict(labels, frame_id=frame_id)
+            writer.add(
+                "can_periodic_sends_total",
+                "counter",
+                "Periodic frames sent.",
+                jitter["count"],
+                frame_labels,
+            )
+            writer.add(
+                "can_periodic_missed_total",
+                "counter",
+                "Periodic deadlines skipped.",
+                jitter["missed"],
+                frame_labels,
+            )
+            writer.add(
+                "can_periodic_send_errors_total",
+                "counter",
+                "Failed periodic sends.",
+                jitter["send_errors"],
+                frame_labels,
+            )
+            writer.add(
+                "can_periodic_jitter_max_seconds",
+                "gauge",
+                "Maximum lateness of a periodic send.",
+                jitter["max_secs"],
+                frame_labels,
+            )
+            writer.add(
+                "can_periodic_jitter_stddev_seconds",
+                "gauge",
+                "Standard deviation of the lateness of periodic sends.",
+                jitter["stddev_secs"],
+                frame_labels,
+            )
+
+    for ssm_name, ssm in snapshot["ssms"].items():
+        labels = {"ssm": ssm_name}
+        for key in (
+            "spi_transactions",
+            "spi_transactions_elided",
+            "gpio_writes",
+            "gpio_writes_elided",
+        ):
+            writer.add(
+                f"ssm_{key}_total",
+                "counter",
+                f"Chimera {key.replace('_', ' ')}.",
+                ssm[key],
+                labels,
+            )
+        if "transaction_secs" in ssm:
+            writer.add_histogram(
+                "ssm_transaction_seconds",
+                "Round trip time of a chimera transaction.",
+                ssm["transaction_secs"],
+                labels,
+            )
+
+    for channel, pwm in snapshot["pwm"].items():
+        labels = {"channel": channel}
+        writer.add(
+            "pwm_achieved_frequency_hertz",
+            "gauge",
+            "Achieved PWM frequency.",
+            pwm["achieved_frequency_hz"],
+            labels,
+        )
+        writer.add(
+            "pwm_edge_jitter_max_seconds",
+            "gauge",
+            "Maximum lateness of a PWM edge.",
+            pwm["edge_jitter"]["max_secs"],
+            labels,
+        )
+        writer.add(
+            "pwm_edge_jitter_stddev_seconds",
+            "gauge",
+            "Standard deviation of the lateness of PWM edges.",
+            pwm["edge_jitter"]["stddev_secs"],
+            labels,
+        )
+
+    return writer.text()
+
+
+class MetricsServer:
+    def __init__(
+        self,
+        collect: Callable[[], str],
+        port: int = 9464,
+        host: str = "127.0.0.1",
+    ):
+        """Serve metrics over HTTP in Prometheus text format, from a background thread.
+
+        Args:
+            collect: Returns the exposition text, called on each scrape.
+            port: Port to listen on, 0 picks a free port.
+            host: Address to listen on, defaults to localhost only.
+
+        """
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                """Serve a scrape."""
+
+                if self.path not in ("/", "/metrics"):
+                    self.send_error(404)
+                    return
+
+                body = collect().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format: str, *args: Any):
+                """Silence per-request logging."""
+
+        self._server = http.server.ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+
+    @property
+    def port(self) -> int:
+        """Port the server is listening on."""
+
+        return self._server.server_address[1]
+
+    def stop(self):
+        """Stop serving."""
+
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
+
+    def __exit__(self):
+        """Destruct the server."""
+
+        self.stop()
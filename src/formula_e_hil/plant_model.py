@@ -0,0 +1,523 @@
+from __future__ import annotations
+from typing import Any, Callable, Dict, NamedTuple, Optional, Sequence, Tuple
+import math
+import threading
+import time
+import can
+import numpy as np
+from .metrics import Histogram
+from .scheduler import JitterStats
+
+# Gravitational acceleration, in m/s^2.
+_GRAVITY = 9.81
+
+# Conversion from rad/s to RPM.
+_RAD_PER_SEC_TO_RPM = 60 / (2 * math.pi)
+
+# Allowed range of the runner's fixed step.
+_MIN_STEP_SECS = 0.001
+_MAX_STEP_SECS = 0.01
+
+
+class PowertrainModel:
+    def __init__(
+        self,
+        driven_wheels: Sequence[int] = (2, 3),
+        mass_kg: float = 300.0,
+        wheel_radius_m: float = 0.23,
+        gear_ratio: float = 13.0,
+        wheel_inertia_kg_m2: float = 0.3,
+        motor_inertia_kg_m2: float = 0.003,
+        slip_stiffness_n: float = 30000.0,
+        friction_coefficient: float = 1.5,
+        drag_area_m2: float = 1.2,
+        rolling_resistance: float = 0.015,
+        brake_torque_nm_per_psi: Sequence[float] = (0.6, 0.6, 0.4, 0.4),
+    ):
+        """Longitudinal vehicle and powertrain model, for closed-loop testing.
+
+        Wheels are ordered front left, front right, rear left, rear right.
+        Each motor drives one wheel through a fixed gear. Every wheel carries a
+        quarter of the weight, and a tire force proportional to its slip,
+        saturating at the friction limit.
+
+        The state update is vectorized over wheels, with the stiff tire term
+        integrated semi-implicitly so steps of up to 10 ms stay stable.
+
+        Args:
+            driven_wheels: Index of the wheel driven by each motor.
+            mass_kg: Vehicle mass, including the driver.
+            wheel_radius_m: Loaded tire radius.
+            gear_ratio: Motor to wheel speed ratio.
+            wheel_inertia_kg_m2: Rotational inertia of each wheel.
+            motor_inertia_kg_m2: Rotational inertia of each motor's rotor.
+            slip_stiffness_n: Tire force per unit of slip ratio.
+            friction_coefficient: Peak tire-road friction coefficient.
+            drag_area_m2: Drag coefficient times frontal area.
+            rolling_resistance: Rolling resistance coefficient.
+            brake_torque_nm_per_psi: Brake torque at each wheel per PSI of pressure.
+
+        """
+
+        self.driven_wheels = np.asarray(driven_wheels, dtype=np.intp)
+        self.mass_kg = mass_kg
+        self.wheel_radius_m = wheel_radius_m
+        self.gear_ratio = gear_ratio
+        self.slip_stiffness_n = slip_stiffness_n
+        self.drag_area_m2 = drag_area_m2
+        self.rolling_resistance = rolling_resistance
+        self.brake_torque_nm_per_psi = np.asarray(
+            brake_torque_nm_per_psi, dtype=np.float64
+        )
+
+        # Map from motor torques to wheel torques, one row per wheel.
+        self._drive_matrix = np.zeros((4, len(self.driven_wheels)))
+        self._drive_matrix[self.driven_wheels, np.arange(len(self.driven_wheels))] = (
+            gear_ratio
+        )
+
+        # Driven wheels also spin their motor, reflected through the gear.
+        self._inertia_kg_m2 = np.full(4, wheel_inertia_kg_m2)
+        self._inertia_kg_m2[self.driven_wheels] += motor_inertia_kg_m2 * gear_ratio**2
+
+        self._max_tire_force_n = friction_coefficient * mass_kg * _GRAVITY / 4
+
+        self.reset()
+
+    def reset(self, speed_mps: float = 0.0):
+        """Put the vehicle in a steady state.
+
+        Args:
+            speed_mps: Vehicle speed, with every wheel rolling without slip.
+
+        """
+
+        self.time_secs = 0.0
+        self.speed_mps = speed_mps
+        self.wheel_speeds = np.full(4, speed_mps / self.wheel_radius_m)
+        self.tire_forces_n = np.zeros(4)
+
+    def step(self, motor_torques_nm: np.ndarray, brake_pressure_psi: float, dt: float):
+        """Advance the model by one step.
+
+        Args:
+            motor_torques_nm: Torque of each motor.
+            brake_pressure_psi: Brake line pressure.
+            dt: Step in seconds.
+
+        """
+
+        radius = self.wheel_radius_m
+        inertia = self._inertia_kg_m2
+        wheel_speeds = self.wheel_speeds
+        speed = self.speed_mps
+
+        # Brakes oppose rotation, and cannot spin a stopped wheel backwards.
+        brake_torques = self.brake_torque_nm_per_psi * max(0.0, brake_pressure_psi)
+        drive_torques = self._drive_matrix @ motor_torques_nm
+        net_torques = drive_torques - np.where(
+            wheel_speeds > 0, brake_torques, np.minimum(brake_torques, drive_torques)
+        )
+
+        # Tire force per m/s of slip velocity, softened at low speed.
+        stiffness = self.slip_stiffness_n / max(speed, 1.0)
+
+        # Semi-implicit in the wheel speed, for the stiff slip term.
+        gain = dt / inertia
+        wheel_speeds = (
+            wheel_speeds + gain * (net_torques + radius * stiffness * speed)
+        ) / (1 + gain * radius**2 * stiffness)
+
+        # Saturate at the friction limit, redoing those wheels explicitly.
+        tire_forces = stiffness * (wheel_speeds * radius - speed)
+        saturated = np.abs(tire_forces) > self._max_tire_force_n
+        if saturated.any():
+            tire_forces = np.clip(
+                tire_forces, -self._max_tire_force_n, self._max_tire_force_n
+            )
+            wheel_speeds = np.where(
+                saturated,
+                self.wheel_speeds + gain * (net_torques - radius * tire_forces),
+                wheel_speeds,
+            )
+
+        resistance = 0.5 * 1.2 * self.drag_area_m2 * speed**2
+        if speed > 0:
+            resistance += self.rolling_resistance * self.mass_kg * _GRAVITY
+
+        self.wheel_speeds = np.maximum(wheel_speeds, 0.0)
+        self.tire_forces_n = tire_forces
+        self.speed_mps = max(
+            0.0, speed + dt * float(tire_forces.sum() - resistance) / self.mass_kg
+        )
+        self.time_secs += dt
+
+    def outputs(self) -> Dict[str, Any]:
+        """Get the model's outputs.
+
+        Returns:
+            Simulated time in seconds, vehicle speed in m/s, wheel speeds in RPM,
+            motor speeds in RPM, and the slip ratio of each wheel.
+
+        """
+
+        wheel_speeds = self.wheel_speeds
+        speed = self.speed_mps
+        return {
+            "time_secs": self.time_secs,
+            "speed_mps": speed,
+            "wheel_speeds_rpm": (wheel_speeds * _RAD_PER_SEC_TO_RPM).tolist(),
+            "motor_speeds_rpm": (
+                wheel_speeds[self.driven_wheels] * self.gear_ratio * _RAD_PER_SEC_TO_RPM
+            ).tolist(),
+            "slip_ratios": (
+                (wheel_speeds * self.wheel_radius_m - speed) / max(speed, 1.0)
+            ).tolist(),
+        }
+
+
+class FeedbackMessage(NamedTuple):
+    """A message transmitted by a ``PlantRunner`` from the model's outputs."""
+
+    # Bus to transmit on, "bms", "inverter", or "sensor".
+    bus: str
+
+    # Name of the message.
+    message_name: str
+
+    # Called with the model's outputs, see ``PowertrainModel.outputs``,
+    # returns every signal of the message.
+    signals: Callable[[Dict[str, Any]], Dict[str, Any]]
+
+    # Transmit every this many steps.
+    period_steps: int = 1
+
+
+# Driver model, called with the simulated time and the model's outputs,
+# returns the apps percentage and brake pressure in PSI.
+Driver = Callable[[float, Dict[str, Any]], Tuple[float, float]]
+
+
+class PlantRunner:
+    def __init__(
+        self,
+        hil: Any,
+        model: PowertrainModel,
+        torque_signals: Sequence[Tuple[str, str]],
+        feedback_messages: Sequence[FeedbackMessage] = (),
+        driver: Optional[Driver] = None,
+        step_secs: float = 0.001,
+        driver_period_steps: int = 10,
+        time_scale: Optional[float] = 1.0,
+    ):
+        """Run a plant model in closed loop with the HIL, at a fixed step.
+
+        Each step reads the latest torque requests from the inverter bus,
+        advances the model, and transmits due feedback messages.
+        Every ``driver_period_steps``, the driver's pedal and brake inputs are
+        written through the FSM and RSM fakes, and fed to the model.
+
+        Steps run at absolute deadlines, so lateness never accumulates.
+        A step that finishes past the next deadline is an overrun. Deadlines
+        missed entirely are caught up by stepping the model without any I/O,
+        so simulated time keeps pace with wall time. See ``stats``.
+
+        Args:
+            hil: HIL to run against.
+            model: Model to run.
+            torque_signals: (message, signal) of each motor's torque request,
+                in Nm, on the inverter bus. Missing requests count as zero.
+            feedback_messages: Messages transmitted from the model's outputs.
+            driver: Driver model, defaults to no pedal and no brake.
+            step_secs: Fixed step, from 1 to 10 ms.
+            driver_period_steps: Write the driver's inputs every this many steps,
+                as each write is a chimera transaction.
+            time_scale: Simulated seconds per wall-clock second, None to run
+                as fast as possible. Anything but 1.0 needs every bus to be virtual.
+
+        Raises:
+            ValueError: Faster than real time was requested with a physical bus.
+
+        """
+
+        assert _MIN_STEP_SECS <= step_secs <= _MAX_STEP_SECS, (
+            f"Step must be from {_MIN_STEP_SECS} to {_MAX_STEP_SECS} s."
+        )
+        assert len(torque_signals) == len(model.driven_wheels), (
+            "Need one torque signal per motor."
+        )
+
+        busses = {
+            "bms": hil.bms_bus,
+            "inverter": hil.inverter_bus,
+            "sensor": hil.sensor_bus,
+        }
+        if time_scale != 1.0:
+            for name, bus in busses.items():
+                if not isinstance(bus._can_bus, can.interfaces.virtual.VirtualBus):
+                    raise ValueError(
+                        f"The {name} bus is not virtual, so must run in real time."
+                    )
+
+        self.model = model
+        self.step_secs = step_secs
+        self.time_scale = time_scale
+
+        self._hil = hil
+        self._inverter_bus = hil.inverter_bus
+        self._torque_signals = list(torque_signals)
+        self._feedback = [
+            (busses[feedback.bus], feedback) for feedback in feedback_messages
+        ]
+        self._driver = driver
+        self._driver_period_steps = driver_period_steps
+
+        # Driver inputs fed to the model, and last written through the fakes.
+        self._brake_pressure_psi = 0.0
+        self._written_inputs: Optional[Tuple[float, float]] = None
+
+        # Outputs after the latest step, guarded by the lock.
+        self._lock = threading.Lock()
+        self._outputs = model.outputs()
+
+        self._exit_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        # Error that ended the latest run, re-raised by ``wait``.
+        self._error: Optional[BaseException] = None
+
+        # Statistics, written by the runner thread only.
+        self._steps = 0
+        self._overruns = 0
+        self._lateness = JitterStats()
+        self._step_secs = Histogram()
+        self._wall_secs = 0.0
+
+    def start(self, duration_secs: Optional[float] = None):
+        """Start running the model in the background.
+
+        Args:
+            duration_secs: Simulated time to run for, None to run until stopped.
+
+        """
+
+        assert self._thread is None, "Already running."
+
+        self._exit_event.clear()
+        self._thread = threading.Thread(
+            target=self._run, args=(duration_secs,), daemon=True
+        )
+        self._thread.start()
+
+    def run(self, duration_secs: float):
+        """Run the model for a while, blocking until done.
+
+        Args:
+            duration_secs: Simulated time to run for.
+
+        """
+
+        self.start(duration_secs)
+        self.wait()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Block until the run finishes.
+
+        Args:
+            timeout: Maximum time to wait in seconds, None to wait forever.
+
+        Returns:
+            True if the run has finished.
+
+        Raises:
+            Exception: The error that ended the run early, ie. a ``ValueError``
+                from a driver input out of range, or a ``can.CanError``
+                from a feedback message. Raised once.
+
+        """
+
+        if self._thread is not None:
+            self._thread.join(timeout)
+            if self._thread.is_alive():
+                return False
+            self._thread = None
+
+        error, self._error = self._error, None
+        if error is not None:
+            raise error
+
+        return True
+
+    def stop(self):
+        """Stop running, leaving the model at its current state.
+
+        Raises:
+            Exception: The error that ended the run early, see ``wait``.
+
+        """
+
+        self._exit_event.set()
+        self.wait()
+
+    def __exit__(self):
+        """Destruct the runner."""
+
+        self.stop()
+
+    def outputs(self) -> Dict[str, Any]:
+        """Get the model's outputs after the latest step.
+
+        Returns:
+            See ``PowertrainModel.outputs``.
+
+        """
+
+        with self._lock:
+            return self._outputs
+
+    def stats(self) -> Dict[str, Any]:
+        """Get runner statistics.
+
+        Returns:
+            Number of steps with I/O, number of overruns, number of steps caught up
+            without I/O, lateness of each step past its deadline
+            (real time and scaled runs only), see ``JitterStats.as_dict``, time spent in each step,
+            see ``Histogram.as_dict``, and the achieved time scale.
+
+        """
+
+        lateness = self._lateness.as_dict()
+        return {
+            "steps": self._steps,
+            "overruns": self._overruns,
+            "missed_steps": lateness.pop("missed"),
+            "lateness": lateness,
+            "step_secs": self._step_secs.as_dict(),
+            "achieved_time_scale": self.model.time_secs / self._wall_secs
+            if self._wall_secs > 0
+            else 0.0,
+        }
+
+    def _read_torques(self) -> np.ndarray:
+        """Read the latest torque requests. For internal use only."""
+
+        receive = self._inverter_bus.receive
+        return np.array(
+            [
+                receive(message_name, signal_name) or 0.0
+                for message_name, signal_name in self._torque_signals
+            ],
+            dtype=np.float64,
+        )
+
+    def _write_driver_inputs(self, outputs: Dict[str, Any]):
+        """Write the driver's inputs through the fakes. For internal use only."""
+
+        if self._driver is None:
+            apps_percentage, brake_pressure_psi = 0.0, 0.0
+        else:
+            apps_percentage, brake_pressure_psi = self._driver(
+                outputs["time_secs"], outputs
+            )
+
+        self._brake_pressure_psi = brake_pressure_psi
+        if self._written_inputs == (apps_percentage, brake_pressure_psi):
+            return
+
+        fsm_fakes, rsm_fakes = self._hil.fsm_fakes, self._hil.rsm_fakes
+        if self._written_inputs is None or self._written_inputs[0] != apps_percentage:
+            fsm_fakes.set_apps_percentage(apps_percentage)
+        if (
+            self._written_inputs is None
+            or self._written_inputs[1] != brake_pressure_psi
+        ):
+            fsm_fakes.set_brake_pressure(brake_pressure_psi)
+            rsm_fakes.set_brake_pressure(brake_pressure_psi)
+        self._written_inputs = (apps_percentage, brake_pressure_psi)
+
+    def _step(self, step: int):
+        """Run one step, with I/O. For internal use only."""
+
+        if step % self._driver_period_steps == 0:
+            self._write_driver_inputs(self._outputs)
+
+        self.model.step(self._read_torques(), self._brake_pressure_psi, self.step_secs)
+        outputs = self.model.outputs()
+        with self._lock:
+            self._outputs = outputs
+
+        for bus, feedback in self._feedback:
+            if step % feedback.period_steps == 0:
+                bus.transmit_message(feedback.message_name, feedback.signals(outputs))
+
+    def _run(self, duration_secs: Optional[float]):
+        """Step loop. For internal use only."""
+
+        # Wall-clock time per step, zero to run as fast as possible.
+        period_secs = (
+            0.0 if self.time_scale is None else self.step_secs / self.time_scale
+        )
+        end_step = (
+            None
+            if duration_secs is None
+            else int(round(duration_secs / self.step_secs))
+        )
+
+        start = time.perf_counter()
+        try:
+            self._run_steps(start, period_secs, end_step)
+        except BaseException as error:
+            self._error = error
+        finally:
+            self._wall_secs += time.perf_counter() - start
+
+            outputs = self.model.outputs()
+            with self._lock:
+                self._outputs = outputs
+
+    def _run_steps(self, start: float, period_secs: float, end_step: Optional[int]):
+        """Step until done or stopped. For internal use only.
+
+        Args:
+            start: ``time.perf_counter`` at the start of the run.
+            period_secs: Wall-clock time per step, zero to run as fast as possible.
+            end_step: Number of steps to run, None to run until stopped.
+
+        """
+
+        step = 0
+        while not self._exit_event.is_set() and (end_step is None or step < end_step):
+            # Deadlines are absolute, relative to the start, never to the last step.
+            deadline = start + step * period_secs
+            now = time.perf_counter()
+            if deadline > now:
+                self._exit_event.wait(deadline - now)
+                continue
+
+            if period_secs > 0.0:
+                self._lateness.record(now - deadline)
+            self._step(step)
+            step += 1
+            self._steps += 1
+
+            finished = time.perf_counter()
+            self._step_secs.observe(finished - now)
+            if period_secs == 0.0:
+                continue
+
+            # Overran into the next step, catch up on any deadlines missed entirely
+            # with the same inputs and no I/O, so simulated time keeps up.
+            next_deadline = start + step * period_secs
+            if finished > next_deadline:
+                self._overruns += 1
+                missed = int((finished - next_deadline) // period_secs)
+                if end_step is not None:
+                    missed = min(missed, end_step - step)
+                if missed > 0:
+                    torques = self._read_torques()
+                    for _ in range(missed):
+                        self.model.step(
+                            torques, self._brake_pressure_psi, self.step_secs
+                        )
+                    self._lateness.missed += missed
+                    step += missed
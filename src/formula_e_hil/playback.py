@@ -0,0 +1,281 @@
+from __future__ import annotations
+from typing import Any, Dict, List, Optional, Sequence, Union
+import threading
+import time
+import numpy as np
+from .fsm_fakes import FsmFakes
+from .rsm_fakes import RsmFakes
+from .ssm import Ssm
+
+
+class _SsmTrace:
+    def __init__(self, ssm: Ssm):
+        """Every trace played back on one SSM. For internal use only.
+
+        Args:
+            ssm: SSM the traces are played on.
+
+        """
+
+        self.ssm = ssm
+        self.channels: List[Ssm.AnalogChannel] = []
+        self.columns: List[np.ndarray] = []
+
+        # DAC codes, one row per sample and one column per channel.
+        # Built when playback starts.
+        self.codes: Optional[np.ndarray] = None
+
+
+class TracePlayer:
+    def __init__(self, sample_rate_hz: float):
+        """Play back recorded sensor traces through the FSM and RSM fakes.
+
+        Traces are converted to DAC codes once, up front.
+        Samples are written at absolute deadlines, with every channel on an SSM
+        updated together.
+
+        Args:
+            sample_rate_hz: Rate the traces were sampled at.
+
+        """
+
+        assert sample_rate_hz > 0
+
+        self.sample_rate_hz = sample_rate_hz
+
+        self._ssm_traces: Dict[int, _SsmTrace] = {}
+        self._length: Optional[int] = None
+
+        # Playback state, guarded by the condition.
+        self._condition = threading.Condition()
+        self._position = 0
+        self._paused = False
+        self._loop = False
+        self._exit_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        # Statistics.
+        self._samples_played = 0
+        self._missed_deadlines = 0
+
+        # Intervals between consecutive writes, excluding pauses and seeks.
+        self._last_write_time: Optional[float] = None
+        self._write_intervals = 0
+        self._write_interval_secs = 0.0
+
+    def add_trace(
+        self,
+        fakes: Union[FsmFakes, RsmFakes],
+        quantity: str,
+        values: Sequence[float],
+    ):
+        """Add a trace to play back.
+
+        Args:
+            fakes: Fakes to play the trace through.
+            quantity: Name of the quantity, see ``FsmFakes.TRACE_CHANNELS``
+                and ``RsmFakes.TRACE_CHANNELS``.
+            values: Samples of the quantity, in the units of its setter.
+
+        """
+
+        assert self._thread is None, "Cannot add traces during playback."
+
+        values = np.asarray(values, dtype=np.float64)
+        if self._length is not None and len(values) != self._length:
+            raise ValueError(
+                f"Trace has {len(values)} samples, expected {self._length}."
+            )
+        self._length = len(values)
+
+        channels, to_volts = fakes.TRACE_CHANNELS[quantity]
+        ssm_trace = self._ssm_traces.setdefault(id(fakes.ssm), _SsmTrace(fakes.ssm))
+        for channel in channels:
+            if channel in ssm_trace.channels:
+                raise ValueError(f"{channel} is already driven by another trace.")
+
+            ssm_trace.channels.append(channel)
+            ssm_trace.columns.append(to_volts(values))
+
+    def start(self, loop: bool = False, position: int = 0):
+        """Start playback.
+
+        Args:
+            loop: If true, restart from the first sample after the last one.
+            position: Index of the sample to start from.
+
+        """
+
+        assert self._thread is None, "Already playing."
+        assert self._length, "No traces to play."
+
+        # Convert every sample to a DAC code up front.
+        for ssm_trace in self._ssm_traces.values():
+            ssm_trace.codes = Ssm.volts_to_dac_code(np.column_stack(ssm_trace.columns))
+
+        self._loop = loop
+        self._position = position
+        self._paused = False
+        self._exit_event.clear()
+
+        self._thread = threading.Thread(target=self._play, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop playback, leaving outputs at their last written values."""
+
+        self._exit_event.set()
+        with self._condition:
+            self._condition.notify()
+
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def __exit__(self):
+        """Destruct the player."""
+
+        self.stop()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Block until playback finishes.
+
+        Args:
+            timeout: Maximum time to wait in seconds, None to wait forever.
+
+        Returns:
+            True if playback has finished.
+
+        """
+
+        if self._thread is not None:
+            self._thread.join(timeout)
+            if self._thread.is_alive():
+                return False
+            self._thread = None
+
+        return True
+
+    def pause(self):
+        """Pause playback, holding outputs at the current sample."""
+
+        with self._condition:
+            self._paused = True
+            self._condition.notify()
+
+    def resume(self):
+        """Resume paused playback from the current sample."""
+
+        with self._condition:
+            self._paused = False
+            self._condition.notify()
+
+    def seek(self, position: int):
+        """Jump to a sample.
+
+        Args:
+            position: Index of the sample to play next.
+
+        """
+
+        assert 0 <= position < self._length
+
+        with self._condition:
+            self._position = position
+            self._condition.notify()
+
+    def seek_secs(self, offset_secs: float):
+        """Jump to a point in time.
+
+        Args:
+            offset_secs: Time since the first sample.
+
+        """
+
+        self.seek(int(round(offset_secs * self.sample_rate_hz)))
+
+    def stats(self) -> Dict[str, Any]:
+        """Get playback statistics.
+
+        Returns:
+            Index of the next sample, number of samples written,
+            number of samples skipped to catch up on missed deadlines,
+            and the achieved sample rate in Hz.
+
+        """
+
+        with self._condition:
+            return {
+                "position": self._position,
+                "samples_played": self._samples_played,
+                "missed_deadlines": self._missed_deadlines,
+                "achieved_rate_hz": self._write_intervals / self._write_interval_secs
+                if self._write_interval_secs > 0
+                else 0.0,
+            }
+
+    def _write_sample(self, position: int):
+        """Write one sample to every SSM. For internal use only."""
+
+        for ssm_trace in self._ssm_traces.values():
+            ssm_trace.ssm.set_analog_codes(
+                dict(zip(ssm_trace.channels, ssm_trace.codes[position].tolist()))
+            )
+
+    def _play(self):
+        """Playback loop. For internal use only."""
+
+        period_secs = 1 / self.sample_rate_hz
+
+        with self._condition:
+            # Deadlines are absolute, anchored to when the sample at ``anchor_position``
+            # was due. Re-anchored whenever playback is paused or seeked.
+            anchor_time = time.perf_counter()
+            anchor_position = self._position
+
+            while not self._exit_event.is_set():
+                if self._paused:
+                    self._condition.wait()
+                    anchor_time = time.perf_counter()
+                    anchor_position = self._position
+                    self._last_write_time = None
+                    continue
+
+                if self._position >= self._length:
+                    if not self._loop:
+                        break
+                    self._position = 0
+                    anchor_time += (self._length - anchor_position) * period_secs
+                    anchor_position = 0
+
+                position = self._position
+                deadline = anchor_time + (position - anchor_position) * period_secs
+                now = time.perf_counter()
+                if deadline > now:
+                    self._condition.wait(deadline - now)
+
+                    # Woken early by a pause, seek, or stop.
+                    if self._position != position:
+                        anchor_time = time.perf_counter()
+                        anchor_position = self._position
+                        self._last_write_time = None
+                    continue
+
+                # More than a whole sample late, skip ahead to the sample due now.
+                # The last sample is always played, so only count samples skipped.
+                late_samples = int((now - deadline) / period_secs)
+                skipped = min(late_samples, self._length - 1 - position)
+                if skipped > 0:
+                    self._missed_deadlines += skipped
+                    position += skipped
+
+                self._write_sample(position)
+
+                written = time.perf_counter()
+                if self._last_write_time is not None:
+                    self._write_intervals += 1
+                    self._write_interval_secs += written - self._last_write_time
+                self._last_write_time = written
+
+                self._samples_played += 1
+                self._position = position + 1
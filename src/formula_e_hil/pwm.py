@@ -0,0 +1,265 @@
+from __future__ import annotations
+from typing import Any, Dict, List, Optional, Tuple
+import heapq
+import itertools
+import threading
+import time
+from .scheduler import JitterStats
+from .ssm import Ssm
+
+
+class _PwmChannel:
+    def __init__(self, channel: Ssm.DigitalChannel):
+        """State of one PWM output. For internal use only.
+
+        Args:
+            channel: Digital channel driven by this output.
+
+        """
+
+        self.channel = channel
+        self.frequency_hz = 0.0
+        self.duty_cycle = 0.5
+
+        # Current output level, None until first written.
+        self.level: Optional[bool] = None
+
+        # Start of the current period, and deadline of the next edge.
+        self.period_start = 0.0
+        self.next_edge = 0.0
+
+        # Bumped on every reconfiguration, so stale heap entries are ignored.
+        self.generation = 0
+
+        self.edge_jitter = JitterStats()
+        self.rising_edges = 0
+        self.first_rising_edge = 0.0
+        self.last_rising_edge = 0.0
+
+
+class PwmGenerator:
+    def __init__(self, ssm: Ssm):
+        """Generate pulse trains on any number of SSM digital outputs, from one thread.
+
+        The output is only written on edges, and the thread sleeps until the
+        next edge's deadline instead of spinning.
+        If a write fails, ie. the SSM is unplugged, the thread stops, and
+        ``set_channel``, ``stats`` and ``stop`` raise the error.
+
+        Args:
+            ssm: SSM whose digital outputs to drive.
+
+        """
+
+        self._ssm_handler = ssm
+        self._channels: Dict[Ssm.DigitalChannel, _PwmChannel] = {}
+
+        # Min-heap of (edge deadline, tie breaker, channel state, generation).
+        self._heap: List[Tuple[float, int, _PwmChannel, int]] = []
+        self._counter = itertools.count()
+        self._condition = threading.Condition()
+
+        # Serializes writes, which are slow USB transactions, so they happen
+        # outside the condition and never block configuring or querying channels.
+        self._write_lock = threading.Lock()
+
+        # Error that stopped the thread, if any.
+        self._error: Optional[Exception] = None
+
+        self._exit_event = threading.Event()
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop generating pulse trains, outputs are left at their current level.
+
+        Raises:
+            RuntimeError: A write failed, and stopped the generator before this.
+
+        """
+
+        self._exit_event.set()
+        with self._condition:
+            self._condition.notify()
+        self._thread.join()
+
+        self._check_error()
+
+    def __exit__(self):
+        """Destruct the PWM generator."""
+
+        self.stop()
+
+    def _check_error(self):
+        """Raise the error that stopped the thread, if any. For internal use only."""
+
+        if self._error is not None:
+            raise RuntimeError("PWM generator failed.") from self._error
+
+    def set_channel(
+        self,
+        channel: Ssm.DigitalChannel,
+        frequency_hz: float,
+        duty_cycle: float = 0.5,
+    ):
+        """Set the pulse train on a digital channel.
+
+        Args:
+            channel: Channel to target.
+            frequency_hz: Frequency of the pulse train, 0 holds the output low.
+            duty_cycle: Fraction of each period the output is high, in range [0, 1].
+
+        Raises:
+            ValueError: The frequency is negative, or the duty cycle out of range.
+            RuntimeError: A write failed, and stopped the generator.
+
+        """
+
+        if not frequency_hz >= 0:
+            raise ValueError(f"Frequency must be non-negative, got {frequency_hz} Hz.")
+        if not 0 <= duty_cycle <= 1:
+            raise ValueError(f"Duty cycle {duty_cycle} is outside of [0, 1].")
+
+        constant = frequency_hz == 0 or duty_cycle in (0, 1)
+        with self._condition:
+            self._check_error()
+
+            state = self._channels.setdefault(channel, _PwmChannel(channel))
+            state.frequency_hz = frequency_hz
+            state.duty_cycle = duty_cycle
+            state.generation += 1
+            generation = state.generation
+
+            # Restart statistics, they are per configuration.
+            state.edge_jitter = JitterStats()
+            state.rising_edges = 0
+
+            if not constant:
+                # Start a new period with a rising edge right away.
+                state.next_edge = time.perf_counter()
+                state.period_start = state.next_edge
+                self._push(state)
+
+            self._condition.notify()
+
+        if constant:
+            # No edges to schedule, just write the level, unless reconfigured since.
+            with self._write_lock:
+                if state.generation == generation:
+                    self._write(state, frequency_hz != 0 and duty_cycle == 1)
+
+    def channels(self) -> List[Ssm.DigitalChannel]:
+        """Get every channel that has been configured."""
+
+        with self._condition:
+            return list(self._channels)
+
+    def stats(self, channel: Ssm.DigitalChannel) -> Dict[str, Any]:
+        """Get the achieved output of a channel, since it was last configured.
+
+        Args:
+            channel: Channel to query.
+
+        Returns:
+            Requested and achieved frequency in Hz, and edge jitter statistics,
+            see ``JitterStats.as_dict``.
+
+        Raises:
+            RuntimeError: A write failed, and stopped the generator.
+
+        """
+
+        with self._condition:
+            self._check_error()
+            state = self._channels[channel]
+            elapsed_secs = state.last_rising_edge - state.first_rising_edge
+            return {
+                "frequency_hz": state.frequency_hz,
+                "duty_cycle": state.duty_cycle,
+                "achieved_frequency_hz": (state.rising_edges - 1) / elapsed_secs
+                if state.rising_edges > 1 and elapsed_secs > 0
+                else 0.0,
+                "edge_jitter": state.edge_jitter.as_dict(),
+            }
+
+    def _push(self, state: _PwmChannel):
+        """Schedule the next edge of a channel. For internal use only."""
+
+        heapq.heappush(
+            self._heap,
+            (state.next_edge, next(self._counter), state, state.generation),
+        )
+
+    def _write(self, state: _PwmChannel, level: bool):
+        """Write a level to a channel, skipping the write if nothing changes.
+        For internal use only, call with the write lock held.
+
+        """
+
+        if state.level != level:
+            self._ssm_handler.set_digital(state.channel, level)
+            state.level = level
+
+    def _loop(self):
+        """Background PWM loop. For internal use only."""
+
+        try:
+            while not self._exit_event.is_set():
+                with self._condition:
+                    # Drop edges of channels that have since been reconfigured.
+                    while (
+                        self._heap and self._heap[0][3] != self._heap[0][2].generation
+                    ):
+                        heapq.heappop(self._heap)
+
+                    if not self._heap:
+                        self._condition.wait()
+                        continue
+
+                    now = time.perf_counter()
+                    deadline = self._heap[0][0]
+                    if deadline > now:
+                        self._condition.wait(deadline - now)
+                        continue
+
+                    _, _, state, generation = heapq.heappop(self._heap)
+
+                # Write outside the condition, so callers never wait on the USB.
+                with self._write_lock:
+                    if state.generation != generation:
+                        continue
+                    rising = not state.level
+                    self._write(state, rising)
+                written = time.perf_counter()
+
+                with self._condition:
+                    if state.generation != generation:
+                        continue
+
+                    period_secs = 1 / state.frequency_hz
+                    state.edge_jitter.record(written - state.next_edge)
+
+                    if rising:
+                        state.period_start = state.next_edge
+                        if state.rising_edges == 0:
+                            state.first_rising_edge = written
+                        state.last_rising_edge = written
+                        state.rising_edges += 1
+                        state.next_edge = (
+                            state.period_start + period_secs * state.duty_cycle
+                        )
+                    else:
+                        state.next_edge = state.period_start + period_secs
+
+                        # Fell behind by whole periods, skip them rather than bursting.
+                        if state.next_edge <= written:
+                            missed = int((written - state.next_edge) // period_secs) + 1
+                            state.edge_jitter.missed += missed
+                            state.next_edge += missed * period_secs
+
+                    self._push(state)
+        except Exception as error:
+            # ie. the SSM was unplugged, reported by ``set_channel``, ``stats``
+            # and ``stop``.
+            with self._condition:
+                self._error = error
@@ -0,0 +1,397 @@
+from __future__ import annotations
+from typing import Iterator, List, Optional, Sequence
+import math
+import queue
+import struct
+import threading
+import time
+import can
+import numpy as np
+from .can import Can
+
+# Recording file format:
+# A 16 byte header, followed by fixed-size little-endian frame records.
+# Header: [ magic (8) | version (4) | record size (4) ]
+_MAGIC = b"FEHILCAN"
+_VERSION = 1
+_HEADER = struct.Struct("<8sII")
+
+# One record per frame, 24 bytes, classic CAN payloads only.
+FRAME_DTYPE = np.dtype(
+    [
+        ("timestamp", "<f8"),
+        ("arbitration_id", "<u4"),
+        ("dlc", "u1"),
+        ("flags", "u1"),
+        ("channel", "u1"),
+        ("reserved", "u1"),
+        ("data", "u1", (8,)),
+    ]
+)
+
+# Bits of the ``flags`` field.
+FLAG_EXTENDED_ID = 1 << 0
+FLAG_REMOTE_FRAME = 1 << 1
+FLAG_ERROR_FRAME = 1 << 2
+FLAG_TRUNCATED = 1 << 3
+
+# Number of records replayed per chunk of the memory map.
+_REPLAY_CHUNK_FRAMES = 65536
+
+
+def read_recording(path: str) -> np.ndarray:
+    """Memory-map a recording, without reading it into RAM.
+
+    Args:
+        path: Path of the recording.
+
+    Returns:
+        A read-only structured array of frame records, see ``FRAME_DTYPE``.
+
+    """
+
+    with open(path, "rb") as recording_file:
+        magic, version, record_size = _HEADER.unpack(recording_file.read(_HEADER.size))
+
+    if magic != _MAGIC or version != _VERSION or record_size != FRAME_DTYPE.itemsize:
+        raise ValueError(f"{path} is not a version {_VERSION} CAN recording.")
+
+    return np.memmap(path, dtype=FRAME_DTYPE, mode="r", offset=_HEADER.size)
+
+
+def iter_messages(records: np.ndarray) -> Iterator[can.Message]:
+    """Convert frame records back into python-can messages.
+
+    Args:
+        records: Frame records, ie. from ``read_recording``.
+
+    Yields:
+        A python-can message per record.
+
+    """
+
+    for start in range(0, len(records), _REPLAY_CHUNK_FRAMES):
+        # Copy one chunk out of the memory map at a time.
+        chunk = np.array(records[start : start + _REPLAY_CHUNK_FRAMES])
+        for timestamp, arbitration_id, dlc, flags, channel, data in zip(
+            chunk["timestamp"].tolist(),
+            chunk["arbitration_id"].tolist(),
+            chunk["dlc"].tolist(),
+            chunk["flags"].tolist(),
+            chunk["channel"].tolist(),
+            chunk["data"],
+        ):
+            yield can.Message(
+                timestamp=timestamp,
+                arbitration_id=arbitration_id,
+                is_extended_id=bool(flags & FLAG_EXTENDED_ID),
+                is_remote_frame=bool(flags & FLAG_REMOTE_FRAME),
+                is_error_frame=bool(flags & FLAG_ERROR_FRAME),
+                dlc=dlc,
+                data=data[: min(dlc, 8)].tobytes(),
+                channel=channel,
+            )
+
+
+def export_blf(path: str, blf_path: str):
+    """Export a recording to a Vector BLF log.
+
+    Args:
+        path: Path of the recording.
+        blf_path: Path of the BLF file to write.
+
+    """
+
+    with can.BLFWriter(blf_path) as writer:
+        for message in iter_messages(read_recording(path)):
+            writer.on_message_received(message)
+
+
+def export_asc(path: str, asc_path: str):
+    """Export a recording to a Vector ASC log.
+
+    Args:
+        path: Path of the recording.
+        asc_path: Path of the ASC file to write.
+
+    """
+
+    with can.ASCWriter(asc_path) as writer:
+        for message in iter_messages(read_recording(path)):
+            writer.on_message_received(message)
+
+
+class CanRecorder:
+    def __init__(self, path: str, busses: Sequence[Can], batch_frames: int = 4096):
+        """Record raw traffic from one or more busses to disk.
+
+        Frames are packed into preallocated record batches on the RX threads,
+        and full batches are written out in bulk by a separate writer thread,
+        so disk I/O never stalls reception.
+        If a write fails, ie. the disk is full, ``stop`` raises the error.
+
+        Args:
+            path: Path of the recording to create.
+            busses: Busses to record, each frame's channel is its index in this list.
+            batch_frames: Number of frames per bulk write.
+
+        """
+
+        assert len(busses) < 256
+
+        self.frames_recorded = 0
+
+        self._busses = list(busses)
+        self._batch_frames = batch_frames
+
+        self._file = open(path, "wb")
+        self._file.write(_HEADER.pack(_MAGIC, _VERSION, FRAME_DTYPE.itemsize))
+
+        # Batch being filled by the RX threads, guarded by the lock.
+        self._lock = threading.Lock()
+        self._batch = np.zeros(batch_frames, dtype=FRAME_DTYPE)
+        self._batch_fill = 0
+
+        # Full batches waiting to be written, and written batches ready for reuse.
+        # Neither is bounded, so frames are never dropped when the disk falls behind.
+        self._full_batches: queue.Queue = queue.Queue()
+        self._spare_batches: List[np.ndarray] = []
+
+        # Error that stopped the writer thread, if any, re-raised by ``stop``.
+        self._writer_error: Optional[BaseException] = None
+
+        self._writer_thread = threading.Thread(target=self._write_loop, daemon=True)
+        self._writer_thread.start()
+
+        self._listeners = []
+        for channel, bus in enumerate(self._busses):
+            listener = self._make_listener(channel)
+            bus.add_rx_listener(listener)
+            self._listeners.append(listener)
+
+    def _make_listener(self, channel: int):
+        """Create the RX listener for one bus. For internal use only."""
+
+        def listener(message: can.Message):
+            """Pack a frame into the current batch."""
+
+            flags = (
+                (FLAG_EXTENDED_ID if message.is_extended_id else 0)
+                | (FLAG_REMOTE_FRAME if message.is_remote_frame else 0)
+                | (FLAG_ERROR_FRAME if message.is_error_frame else 0)
+                | (FLAG_TRUNCATED if len(message.data) > 8 else 0)
+            )
+            data = bytes(message.data[:8]).ljust(8, b"\x00")
+
+            with self._lock:
+                self._batch[self._batch_fill] = (
+                    message.timestamp,
+                    message.arbitration_id,
+                    message.dlc,
+                    flags,
+                    channel,
+                    0,
+                    np.frombuffer(data, dtype=np.uint8),
+                )
+                self._batch_fill += 1
+                self.frames_recorded += 1
+
+                if self._batch_fill == self._batch_frames:
+                    self._swap_batch()
+
+        return listener
+
+    def _swap_batch(self):
+        """Hand the current batch to the writer, and start a new one.
+        For internal use only, call with the lock held.
+
+        """
+
+        self._full_batches.put((self._batch, self._batch_fill))
+        self._batch = (
+            self._spare_batches.pop()
+            if self._spare_batches
+            else np.zeros(self._batch_frames, dtype=FRAME_DTYPE)
+        )
+        self._batch_fill = 0
+
+    def _write_loop(self):
+        """Background writer loop. For internal use only."""
+
+        try:
+            while True:
+                item = self._full_batches.get()
+                if item is None:
+                    break
+
+                batch, fill = item
+                self._file.write(memoryview(batch[:fill]).cast("B"))
+
+                with self._lock:
+                    self._spare_batches.append(batch)
+        except BaseException as error:
+            # ie. the disk is full, ``stop`` re-raises it.
+            self._writer_error = error
+
+    def stop(self):
+        """Stop recording, flushing every frame to disk.
+
+        Raises:
+            RuntimeError: The writer thread failed, the recording holds every
+                batch written before it did.
+
+        """
+
+        for bus, listener in zip(self._busses, self._listeners):
+            bus.remove_rx_listener(listener)
+
+        with self._lock:
+            if self._batch_fill > 0:
+                self._swap_batch()
+
+        self._full_batches.put(None)
+        self._writer_thread.join()
+        self._file.close()
+
+        if self._writer_error is not None:
+            raise RuntimeError("Recording writer failed.") from self._writer_error
+
+    def __exit__(self):
+        """Destruct the recorder."""
+
+        self.stop()
+
+
+class CanReplayer:
+    def __init__(
+        self,
+        bus: Can,
+        path: str,
+        speed: float = 1.0,
+        message_names: Optional[Sequence[str]] = None,
+        channel: Optional[int] = None,
+    ):
+        """Replay a recording onto a bus, with its original inter-frame timing.
+
+        The recording is streamed through a memory map, chunk by chunk,
+        so logs larger than RAM can be replayed.
+        Frames are sent through the bus, so they are counted in its metrics.
+        Frames the bus fails to send are skipped, and counted in ``send_errors``.
+
+        Args:
+            bus: Bus to replay onto.
+            path: Path of the recording.
+            speed: Playback speed multiplier, ``math.inf`` sends as fast as possible.
+            message_names: If set, only replay these messages from the bus's dbc.
+            channel: If set, only replay frames recorded from this channel.
+
+        """
+
+        assert speed > 0
+
+        self.frames_sent = 0
+        self.send_errors = 0
+
+        # Error that stopped the replay thread, if any, re-raised by ``stop``.
+        self._error: Optional[BaseException] = None
+
+        self._bus = bus
+        self._records = read_recording(path)
+        self._speed = speed
+        self._channel = channel
+        self._frame_ids = (
+            None
+            if message_names is None
+            else np.array(
+                [bus._db.get_message_by_name(name).frame_id for name in message_names],
+                dtype=np.uint32,
+            )
+        )
+
+        self._exit_event = threading.Event()
+        self._thread = threading.Thread(target=self._replay, daemon=True)
+
+    def start(self):
+        """Start replaying."""
+
+        self._thread.start()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Block until the replay finishes.
+
+        Args:
+            timeout: Maximum time to wait in seconds, None to wait forever.
+
+        Returns:
+            True if the replay has finished.
+
+        """
+
+        self._thread.join(timeout)
+        return not self._thread.is_alive()
+
+    def stop(self):
+        """Stop replaying.
+
+        Raises:
+            RuntimeError: The replay thread failed before this.
+
+        """
+
+        self._exit_event.set()
+        if self._thread.is_alive():
+            self._thread.join()
+
+        if self._error is not None:
+            raise RuntimeError("Replay failed.") from self._error
+
+    def __exit__(self):
+        """Destruct the replayer."""
+
+        self.stop()
+
+    def _replay(self):
+        """Replay loop, keeping any error for ``stop``. For internal use only."""
+
+        try:
+            self._replay_frames()
+        except BaseException as error:
+            self._error = error
+
+    def _replay_frames(self):
+        """Send every frame of the recording on time. For internal use only."""
+
+        if len(self._records) == 0:
+            return
+
+        first_timestamp = float(self._records[0]["timestamp"])
+        start_time = time.perf_counter()
+
+        for start in range(0, len(self._records), _REPLAY_CHUNK_FRAMES):
+            chunk = self._records[start : start + _REPLAY_CHUNK_FRAMES]
+
+            # Filter the whole chunk at once.
+            keep = chunk["flags"] & FLAG_ERROR_FRAME == 0
+            if self._frame_ids is not None:
+                keep &= np.isin(chunk["arbitration_id"], self._frame_ids)
+            if self._channel is not None:
+                keep &= chunk["channel"] == self._channel
+
+            for message in iter_messages(chunk[keep]):
+                if not math.isinf(self._speed):
+                    deadline = (
+                        start_time + (message.timestamp - first_timestamp) / self._speed
+                    )
+                    delay = deadline - time.perf_counter()
+                    if delay > 0 and self._exit_event.wait(delay):
+                        return
+
+                if self._exit_event.is_set():
+                    return
+
+                try:
+                    self._bus._send(message)
+                except can.CanError:
+                    self.send_errors += 1
+                    continue
+                self.frames_sent += 1
@@ -0,0 +1,461 @@
+from __future__ import annotations
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    List,
+    NamedTuple,
+    Optional,
+    Sequence,
+)
+import collections
+import concurrent.futures
+import itertools
+import logging
+import logging.handlers
+import multiprocessing
+import pickle
+import queue
+import threading
+import time
+import traceback
+import can
+
+logger = logging.getLogger(__name__)
+
+# A scenario, called with the rig's ``Hil``, returning any picklable value.
+# Must be importable from a module, since rigs run in spawned processes.
+Scenario = Callable[[Any], Any]
+
+# Names of the busses of a rig, as accepted by ``Hil``.
+_BUS_NAMES = ("bms", "inverter", "sensor")
+
+# Interval at which the collector checks for dead rig processes.
+_MONITOR_INTERVAL_SECS = 0.5
+
+# Time given to a terminated rig process to exit.
+_TERMINATE_TIMEOUT_SECS = 5.0
+
+
+class RigConfig(NamedTuple):
+    """Description of one HIL rig, physical or virtual."""
+
+    # Unique name of the rig, tagged onto its results and logs.
+    name: str
+
+    # Keyword arguments for ``can.Bus``, keyed by "bms", "inverter", and "sensor".
+    bus_kwargs: Dict[str, Dict[str, Any]]
+
+    # Create the chimera handle of each SSM, None for the default hardware.
+    # Must be picklable, ie. ``VirtualSsm`` or a ``functools.partial``.
+    fsm_backend: Optional[Callable[[], Any]] = None
+    rsm_backend: Optional[Callable[[], Any]] = None
+
+    # Source of the dbc file, None for the latest release.
+    dbc_url: Optional[str] = None
+
+    @classmethod
+    def virtual(cls, name: str, dbc_url: Optional[str] = None) -> RigConfig:
+        """Describe a virtual bench, with virtual SSMs and python-can virtual busses.
+
+        Args:
+            name: Unique name of the rig, also prefixes its virtual bus channels.
+            dbc_url: Source of the dbc file, None for the latest release.
+
+        Returns:
+            The rig description.
+
+        """
+
+        from .virtual_ssm import VirtualSsm
+
+        return cls(
+            name=name,
+            bus_kwargs={
+                bus_name: {"interface": "virtual", "channel": f"{name}_{bus_name}"}
+                for bus_name in _BUS_NAMES
+            },
+            fsm_backend=VirtualSsm,
+            rsm_backend=VirtualSsm,
+            dbc_url=dbc_url,
+        )
+
+
+class ScenarioResult(NamedTuple):
+    """Outcome of one scenario run by a ``RigPool``."""
+
+    # Name of the scenario.
+    name: str
+
+    # Name of the rig it ran on, None if it never started.
+    rig: Optional[str]
+
+    # True if the scenario returned without raising.
+    passed: bool
+
+    # Value returned by the scenario.
+    value: Any
+
+    # Formatted traceback if the scenario raised, or why it could not run.
+    error: Optional[str]
+
+    # Wall-clock start time, from ``time.time``, and duration of the scenario.
+    start_time: float
+    duration_secs: float
+
+
+class _RigLogFilter(logging.Filter):
+    def __init__(self, rig: str):
+        """Tag log records with the rig they came from. For internal use only."""
+
+        super().__init__()
+        self._rig = rig
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.rig = self._rig
+        return True
+
+
+class _ForwardHandler(logging.Handler):
+    def handle(self, record: logging.LogRecord) -> bool:
+        """Re-emit a record from a rig process through this process's loggers.
+        For internal use only.
+
+        """
+
+        logging.getLogger(record.name).handle(record)
+        return True
+
+
+def _run_rig(
+    config: RigConfig,
+    tasks: multiprocessing.Queue,
+    events: multiprocessing.Queue,
+    log_queue: multiprocessing.Queue,
+    log_level: int,
+):
+    """Rig process: build the rig's ``Hil`` once, then run the scenarios it is sent.
+    For internal use only.
+
+    Args:
+        config: Rig to bring up.
+        tasks: Queue of (task id, name, scenario) for this rig only, None to stop.
+            The pool sends one at a time, once the rig reports it is ready or done,
+            so it always knows which scenario a rig is running if the process dies.
+        events: Queue of (event, rig name, payload) back to the pool.
+        log_queue: Queue every log record is forwarded through.
+        log_level: Level of the root logger in this process.
+
+    """
+
+    # Forward every log record to the pool, tagged with the rig.
+    handler = logging.handlers.QueueHandler(log_queue)
+    handler.addFilter(_RigLogFilter(config.name))
+    root = logging.getLogger()
+    root.handlers = [handler]
+    root.setLevel(log_level)
+
+    from . import Hil
+
+    try:
+        hil = Hil(
+            **{
+                f"{bus_name}_bus": can.Bus(**config.bus_kwargs[bus_name])
+                for bus_name in _BUS_NAMES
+            },
+            fsm_backend=None if config.fsm_backend is None else config.fsm_backend(),
+            rsm_backend=None if config.rsm_backend is None else config.rsm_backend(),
+            dbc_url=config.dbc_url,
+        )
+    except Exception:
+        events.put(("failed", config.name, traceback.format_exc()))
+        return
+
+    events.put(("ready", config.name, None))
+
+    try:
+        while True:
+            task = tasks.get()
+            if task is None:
+                break
+
+            task_id, name, scenario = task
+            start_time = time.time()
+
+            start = time.perf_counter()
+            try:
+                value, error = scenario(hil), None
+            except Exception:
+                value, error = None, traceback.format_exc()
+                logging.getLogger(__name__).error("Scenario %s failed.", name)
+            duration_secs = time.perf_counter() - start
+
+            result = ScenarioResult(
+                name,
+                config.name,
+                error is None,
+                value,
+                error,
+                start_time,
+                duration_secs,
+            )
+            try:
+                pickle.dumps(value)
+            except Exception:
+                result = result._replace(
+                    passed=False, value=None, error=traceback.format_exc()
+                )
+            events.put(("done", config.name, (task_id, result)))
+    finally:
+        hil.__exit__()
+        for bus in (hil.bms_bus, hil.inverter_bus, hil.sensor_bus):
+            bus._can_bus.shutdown()
+
+
+class RigPool:
+    def __init__(self, rigs: Sequence[RigConfig], log_level: int = logging.INFO):
+        """Run scenarios in parallel across several HIL rigs.
+
+        Each rig runs in its own process, which brings up the rig's ``Hil`` once.
+        Scenarios are queued here, and each is handed to the next idle rig,
+        so the queue is balanced across rigs, and a rig that dies only ever
+        takes the one scenario it was given with it. Results come back to
+        this process, and log records from every rig are re-emitted through
+        this process's loggers, with the rig name in the record's ``rig`` attribute.
+
+        Args:
+            rigs: Rigs to run scenarios on.
+            log_level: Level of the root logger in each rig process.
+
+        """
+
+        assert len({rig.name for rig in rigs}) == len(rigs), "Rig names must be unique."
+
+        self.results: List[ScenarioResult] = []
+
+        # Spawn rather than fork, forking a process with running threads is unsafe.
+        context = multiprocessing.get_context("spawn")
+        self._events = context.Queue()
+        self._log_queue = context.Queue()
+
+        self._log_listener = logging.handlers.QueueListener(
+            self._log_queue, _ForwardHandler()
+        )
+        self._log_listener.start()
+
+        # Pending futures and their names, guarded by the lock.
+        self._lock = threading.Lock()
+        self._futures: Dict[int, concurrent.futures.Future] = {}
+        self._names: Dict[int, str] = {}
+        self._task_ids = itertools.count()
+
+        # Scenarios not yet handed to a rig, as (task id, name, scenario),
+        # rigs ready for their next scenario, and the task each rig is running.
+        self._queued: collections.deque = collections.deque()
+        self._idle_rigs: collections.deque = collections.deque()
+        self._running: Dict[str, int] = {}
+        self._closed = False
+
+        self._tasks: Dict[str, multiprocessing.Queue] = {}
+        self._processes: Dict[str, multiprocessing.Process] = {}
+        for rig in rigs:
+            tasks = context.Queue()
+            process = context.Process(
+                target=_run_rig,
+                args=(
+                    rig,
+                    tasks,
+                    self._events,
+                    self._log_queue,
+                    log_level,
+                ),
+                daemon=True,
+            )
+            process.start()
+            self._processes[rig.name] = process
+            self._tasks[rig.name] = tasks
+
+        self._exit_event = threading.Event()
+        self._collector = threading.Thread(target=self._collect, daemon=True)
+        self._collector.start()
+
+    def submit(
+        self, scenario: Scenario, name: Optional[str] = None
+    ) -> concurrent.futures.Future:
+        """Queue a scenario to run on the next free rig.
+
+        Args:
+            scenario: Called with the rig's ``Hil``.
+                Must be a module-level function, or otherwise picklable.
+            name: Name of the scenario, defaults to its qualified name.
+
+        Returns:
+            A future resolving to the ``ScenarioResult``.
+
+        """
+
+        if name is None:
+            name = getattr(scenario, "__qualname__", repr(scenario))
+
+        # Fail here rather than in the queue's feeder thread.
+        pickle.dumps(scenario)
+
+        future: concurrent.futures.Future = concurrent.futures.Future()
+        with self._lock:
+            task_id = next(self._task_ids)
+            self._futures[task_id] = future
+            self._names[task_id] = name
+            self._queued.append((task_id, name, scenario))
+            self._dispatch()
+
+        return future
+
+    def run(
+        self, scenarios: Sequence[Scenario], timeout: Optional[float] = None
+    ) -> List[ScenarioResult]:
+        """Run scenarios across the rigs, and wait for all of them.
+
+        Args:
+            scenarios: Scenarios to run, see ``submit``.
+            timeout: Maximum time to wait in seconds, None to wait forever.
+
+        Returns:
+            The result of each scenario, in order.
+
+        Raises:
+            TimeoutError: Not every scenario finished within the timeout.
+
+        """
+
+        futures = [self.submit(scenario) for scenario in scenarios]
+        done, not_done = concurrent.futures.wait(futures, timeout)
+        if not_done:
+            raise TimeoutError(f"{len(not_done)} scenarios did not finish.")
+
+        return [future.result() for future in futures]
+
+    def close(self, timeout: float = 30.0):
+        """Stop every rig after its current scenario, and tear down their HILs.
+
+        Args:
+            timeout: Maximum time to wait for the rigs to finish, in seconds.
+                Rigs still running after it, ie. stuck in a scenario,
+                are terminated, and their scenarios fail.
+                Closing again does nothing.
+
+        """
+
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            for rig, process in self._processes.items():
+                if process.is_alive():
+                    self._tasks[rig].put(None)
+
+        deadline = time.monotonic() + timeout
+        for rig, process in self._processes.items():
+            process.join(max(0.0, deadline - time.monotonic()))
+            if process.is_alive():
+                logger.warning("Rig %s did not stop in time, terminating it.", rig)
+                process.terminate()
+                process.join(_TERMINATE_TIMEOUT_SECS)
+
+        self._exit_event.set()
+        self._collector.join()
+        self._log_listener.stop()
+
+        # Anything still queued will never run.
+        with self._lock:
+            for task_id in list(self._futures):
+                self._fail(task_id, None, "The pool was closed.")
+
+    def __exit__(self):
+        """Destruct the pool."""
+
+        self.close()
+
+    def _collect(self):
+        """Collect events from the rigs, and notice rigs that die. For internal use only."""
+
+        while not self._exit_event.is_set():
+            try:
+                event, rig, payload = self._events.get(timeout=_MONITOR_INTERVAL_SECS)
+            except queue.Empty:
+                self._check_rigs()
+                continue
+
+            with self._lock:
+                if event == "ready":
+                    logger.info("Rig %s is ready.", rig)
+                    self._idle_rigs.append(rig)
+                elif event == "failed":
+                    logger.error("Rig %s failed to start:\n%s", rig, payload)
+                elif event == "done":
+                    self._running.pop(rig, None)
+                    self._finish(*payload)
+                    self._idle_rigs.append(rig)
+                self._dispatch()
+
+            self._check_rigs()
+
+    def _dispatch(self):
+        """Hand queued scenarios to idle rigs. For internal use only,
+        call with the lock held.
+
+        """
+
+        while self._queued and self._idle_rigs and not self._closed:
+            rig = self._idle_rigs.popleft()
+            if not self._processes[rig].is_alive():
+                continue
+
+            task = self._queued.popleft()
+            self._running[rig] = task[0]
+            self._tasks[rig].put(task)
+
+    def _check_rigs(self):
+        """Fail the scenario of any rig whose process died, and everything queued
+        once no rig is left. For internal use only.
+
+        """
+
+        with self._lock:
+            for rig, process in self._processes.items():
+                if not process.is_alive() and rig in self._running:
+                    self._fail(
+                        self._running.pop(rig),
+                        rig,
+                        f"Rig process exited ({process.exitcode}).",
+                    )
+
+            if self._futures and not any(
+                process.is_alive() for process in self._processes.values()
+            ):
+                self._queued.clear()
+                for task_id in list(self._futures):
+                    self._fail(task_id, None, "No rigs are running.")
+
+    def _finish(self, task_id: int, result: ScenarioResult):
+        """Resolve a scenario's future. For internal use only, call with the lock held."""
+
+        # Already failed, ie. the rig died after sending its result.
+        if task_id not in self._futures:
+            return
+
+        self._names.pop(task_id)
+        self.results.append(result)
+        self._futures.pop(task_id).set_result(result)
+
+    def _fail(self, task_id: int, rig: Optional[str], error: str):
+        """Resolve a scenario that could not run. For internal use only,
+        call with the lock held.
+
+        """
+
+        self._finish(
+            task_id,
+            ScenarioResult(
+                self._names.get(task_id, ""), rig, False, None, error, time.time(), 0.0
+            ),
+        )
@@ -1,6 +1,5 @@
-import threading
-import signal
-import time
+from typing import Any, Dict, Optional
+from .pwm import PwmGenerator
 from .ssm import Ssm
 from . import utils
 
@@ -14,56 +13,59 @@ class RsmFakes:
     _SUSPENSION_TRAVEL_LEFT_CHANNEL = Ssm.AnalogChannel.SIX
     _BRAKE_PRESSURE_CHANNEL = Ssm.AnalogChannel.FIVE
 
-    def __init__(self):
-        """Create an interface to the RSM (Rear-Sensor Module), through an SSM."""
+    # Quantities that can be played back with a ``TracePlayer``.
+    # Maps from quantity name to the channels it drives,
+    # and the conversion from the quantity to volts.
+    TRACE_CHANNELS = {
+        "suspension_travel_left": (
+            (_SUSPENSION_TRAVEL_LEFT_CHANNEL,),
+            utils.suspension_travel_to_potential_volts,
+        ),
+        "suspension_travel_right": (
+            (_SUSPENSION_TRAVEL_RIGHT_CHANNEL,),
+            utils.suspension_travel_to_potential_volts,
+        ),
+        "suspension_travel": (
+            (_SUSPENSION_TRAVEL_RIGHT_CHANNEL, _SUSPENSION_TRAVEL_LEFT_CHANNEL),
+            utils.suspension_travel_to_potential_volts,
+        ),
+        "brake_pressure": (
+            (_BRAKE_PRESSURE_CHANNEL,),
+            utils.brake_pressure_to_potential_volts,
+        ),
+    }
+
+    def __init__(self, ssm_backend: Optional[Any] = None):
+        """Create an interface to the RSM (Rear-Sensor Module), through an SSM.
 
-        self._ssm_handler = Ssm()
+        Args:
+            ssm_backend: Chimera SSM handle to drive, defaults to real hardware.
+
+        """
+
+        self._ssm_handler = Ssm(ssm_backend)
 
         # Set the RSM indicator LED on.
         self._ssm_handler.set_indicator(self.INDICATOR)
 
+        # Pulse train generator for the flow rate sensor,
+        # and any other pulse train sensor on this SSM's digital outputs.
+        self.pwm = PwmGenerator(self._ssm_handler)
+
         # Start flow rate pwm at 0 Hz.
-        self._flow_rate_pwm_freq_hz = 0
+        self.pwm.set_channel(self._FLOW_RATE_PWM, 0)
 
-        # Setup the exit event for the PWM thread.
-        self._pwm_exit_event = threading.Event()
-        signal.signal(
-            signal.SIGINT, lambda _signalnum, _handler: self._pwm_exit_event.set()
-        )
+    @property
+    def ssm(self) -> Ssm:
+        """SSM the RSM is faked through."""
 
-        # Setup PWM background loop.
-        def pwm_loop():
-            """Background PWM loop. Used for flow rate."""
-
-            flow_rate_last_cycle_secs = time.time()
-            while not self._pwm_exit_event.is_set():
-                # Don't update flow rate if requested frequency is 0.
-                if self._flow_rate_pwm_freq_hz != 0:
-                    # Calculate requested period.
-                    flow_rate_period_secs = 1 / self._flow_rate_pwm_freq_hz
-
-                    # Set 50% duty cycle on flow rate PWM.
-                    time_since_last_cycle_secs = time.time() - flow_rate_last_cycle_secs
-                    if time_since_last_cycle_secs <= flow_rate_period_secs / 2:
-                        self._ssm_handler.set_digital(self._FLOW_RATE_PWM, True)
-                    elif (
-                        flow_rate_period_secs / 2
-                        < time_since_last_cycle_secs
-                        <= flow_rate_period_secs
-                    ):
-                        self._ssm_handler.set_digital(self._FLOW_RATE_PWM, False)
-                    else:
-                        flow_rate_last_cycle_secs = time.time()
-
-        # Spin up thread.
-        self._pwm_thread = threading.Thread(target=pwm_loop)
+        return self._ssm_handler
 
     def __exit__(self):
         """Destruct RsmFakes."""
 
         # Make sure PWM thread closes when the class destructs.
-        self._pwm_exit_event.set()
-        self._pwm_thread.join()
+        self.pwm.__exit__()
 
     def set_suspension_travel_left(self, travel_m: float):
         """Set supension travel on left wheel.
@@ -115,10 +117,20 @@ class RsmFakes:
 
         """
 
-        self._flow_rate_pwm_freq_hz = utils.flow_rate_to_frequency_hz(
-            rate_litres_per_min
+        self.pwm.set_channel(
+            self._FLOW_RATE_PWM, utils.flow_rate_to_frequency_hz(rate_litres_per_min)
         )
 
+    def flow_rate_stats(self) -> Dict[str, Any]:
+        """Get the achieved flow rate pulse train.
+
+        Returns:
+            Requested and achieved frequency in Hz, and edge jitter statistics.
+
+        """
+
+        return self.pwm.stats(self._FLOW_RATE_PWM)
+
     def set_brake_pressure(self, pressure_psi: float):
         """Set brake pressure.
 
@@ -0,0 +1,311 @@
+from __future__ import annotations
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import heapq
+import itertools
+import math
+import threading
+import time
+import can
+
+
+class JitterStats:
+    def __init__(self):
+        """Running statistics of how late each periodic send was past its deadline."""
+
+        self.count = 0
+        self.missed = 0
+        self.send_errors = 0
+        self.max_secs = 0.0
+
+        # Welford's running mean and sum of squared differences.
+        self._mean_secs = 0.0
+        self._m2 = 0.0
+
+    def record(self, lateness_secs: float):
+        """Record one send.
+
+        Args:
+            lateness_secs: Time between the deadline and the actual send.
+
+        """
+
+        self.count += 1
+        delta = lateness_secs - self._mean_secs
+        self._mean_secs += delta / self.count
+        self._m2 += delta * (lateness_secs - self._mean_secs)
+        self.max_secs = max(self.max_secs, abs(lateness_secs))
+
+    def as_dict(self) -> Dict[str, Any]:
+        """Snapshot the statistics.
+
+        Returns:
+            Number of sends, number of missed (skipped) deadlines, number of failed
+            ticks or sends, and the mean, standard deviation, and max of the jitter in seconds.
+
+        """
+
+        return {
+            "count": self.count,
+            "missed": self.missed,
+            "send_errors": self.send_errors,
+            "mean_secs": self._mean_secs,
+            "stddev_secs": math.sqrt(self._m2 / self.count) if self.count > 1 else 0.0,
+            "max_secs": self.max_secs,
+        }
+
+
+class _ScheduledFrame:
+    def __init__(self, message: can.Message, period_secs: float):
+        """A frame sent periodically by a ``PeriodicScheduler``. For internal use only.
+
+        Args:
+            message: Pre-encoded frame to send.
+            period_secs: Period between successive sends.
+
+        """
+
+        self.message = message
+        self.period_secs = period_secs
+        self.deadline = 0.0
+        self.active = True
+        self.stats = JitterStats()
+
+        # Called with the frame just before each send, to patch it in place.
+        self.tick: Optional[Callable[[can.Message], None]] = None
+
+        # Set if the bus is sending this frame natively.
+        self.native_task: Optional[can.broadcastmanager.CyclicSendTaskABC] = None
+
+
+class PeriodicScheduler:
+    def __init__(
+        self,
+        bus_handle: can.BusABC,
+        use_native_periodic: bool = True,
+        record_jitter: bool = True,
+    ):
+        """Send many periodic frames over one bus from a single thread.
+
+        Deadlines are absolute and kept in a min-heap, so time spent sending
+        never accumulates into drift. Frames are encoded ahead of time.
+
+        Args:
+            bus_handle: python-can handle.
+            use_native_periodic: If true, offload to the interface's ``send_periodic``
+                when the backend implements it natively.
+            record_jitter: If true, time each send against its deadline,
+                see ``jitter_stats``. Can also be toggled later
+                through ``record_jitter``. Missed deadlines and failed sends
+                are always counted.
+
+        """
+
+        self.record_jitter = record_jitter
+
+        self._can_bus = bus_handle
+        self._use_native_periodic = use_native_periodic and self._has_native_periodic(
+            bus_handle
+        )
+
+        # Min-heap of (deadline, tie breaker, frame).
+        self._heap: List[Tuple[float, int, _ScheduledFrame]] = []
+        self._counter = itertools.count()
+        self._condition = threading.Condition()
+
+        # Every scheduled frame, including those offloaded to the interface,
+        # for statistics and so ``stop`` can stop them all.
+        self._frames: List[_ScheduledFrame] = []
+
+        self._exit_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        # Most recent error from a tick or send, counted in each frame's
+        # ``send_errors``. The scheduler thread carries on past them.
+        self.last_error: Optional[Exception] = None
+
+    @staticmethod
+    def _has_native_periodic(bus_handle: can.BusABC) -> bool:
+        """Check if a bus implements periodic sends natively. For internal use only.
+
+        Backends that don't fall back to python-can's thread-per-task implementation.
+
+        Args:
+            bus_handle: python-can handle.
+
+        Returns:
+            True if the backend overrides ``_send_periodic_internal``.
+
+        """
+
+        return (
+            type(bus_handle)._send_periodic_internal
+            is not can.BusABC._send_periodic_internal
+        )
+
+    def add(
+        self,
+        message: can.Message,
+        period_secs: float,
+        tick: Optional[Callable[[can.Message], None]] = None,
+    ) -> _ScheduledFrame:
+        """Start sending a frame periodically.
+
+        Args:
+            message: Pre-encoded frame to send.
+            period_secs: Period between successive sends.
+            tick: Called with the frame just before each send, to patch it in place,
+                ie. to roll an alive counter. Frames with a tick are never offloaded
+                to the interface, which could only resend the same payload.
+
+        Returns:
+            Handle for the scheduled frame.
+
+        Raises:
+            ValueError: The period is not positive.
+
+        """
+
+        if not period_secs > 0:
+            raise ValueError(f"Period must be positive, got {period_secs} s.")
+
+        frame = _ScheduledFrame(message, period_secs)
+        frame.tick = tick
+
+        if self._use_native_periodic and tick is None:
+            frame.native_task = self._can_bus.send_periodic(message, period_secs)
+            with self._condition:
+                self._frames.append(frame)
+            return frame
+
+        with self._condition:
+            self._frames.append(frame)
+
+            # First send is immediate, matching the old thread-per-transmitter behaviour.
+            frame.deadline = time.perf_counter()
+            heapq.heappush(self._heap, (frame.deadline, next(self._counter), frame))
+            self._condition.notify()
+
+            # Started under the lock, so concurrent adds never start two threads.
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, daemon=True)
+                self._thread.start()
+
+        return frame
+
+    def update(self, frame: _ScheduledFrame, message: can.Message):
+        """Swap the pre-encoded frame of a scheduled frame, without touching its timing.
+
+        Args:
+            frame: Handle returned by ``add``.
+            message: New pre-encoded frame.
+
+        """
+
+        frame.message = message
+        if frame.native_task is not None:
+            frame.native_task.modify_data(message)
+
+    def remove(self, frame: _ScheduledFrame):
+        """Stop sending a frame.
+
+        Args:
+            frame: Handle returned by ``add``.
+
+        """
+
+        with self._condition:
+            if not frame.active:
+                return
+
+            # Lazily dropped from the heap when it next comes due.
+            frame.active = False
+            self._frames.remove(frame)
+
+        if frame.native_task is not None:
+            frame.native_task.stop()
+
+    def jitter_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Get the jitter statistics of every frame sent by the scheduler thread.
+
+        Returns:
+            Map from hex arbitration id to statistics, see ``JitterStats.as_dict``.
+            Frames offloaded to the interface are not included.
+
+        """
+
+        with self._condition:
+            return {
+                f"0x{frame.message.arbitration_id:X}": frame.stats.as_dict()
+                for frame in self._frames
+                if frame.native_task is None
+            }
+
+    def stop(self):
+        """Stop the scheduler thread, and every scheduled frame,
+        including those offloaded to the interface.
+
+        """
+
+        self._exit_event.set()
+        with self._condition:
+            for frame in list(self._frames):
+                self.remove(frame)
+            self._condition.notify()
+
+        if self._thread is not None:
+            self._thread.join()
+
+    def _loop(self):
+        """Scheduler loop. For internal use only."""
+
+        while not self._exit_event.is_set():
+            due: List[_ScheduledFrame] = []
+
+            with self._condition:
+                # Drop removed frames from the top of the heap.
+                while self._heap and not self._heap[0][2].active:
+                    heapq.heappop(self._heap)
+
+                if not self._heap:
+                    self._condition.wait()
+                    continue
+
+                now = time.perf_counter()
+                deadline = self._heap[0][0]
+                if deadline > now:
+                    self._condition.wait(deadline - now)
+                    continue
+
+                while self._heap and self._heap[0][0] <= now:
+                    due.append(heapq.heappop(self._heap)[2])
+
+            # Send outside the lock, so adding frames never waits on the bus.
+            for frame in due:
+                if not frame.active:
+                    continue
+
+                if self.record_jitter:
+                    frame.stats.record(time.perf_counter() - frame.deadline)
+                message = frame.message
+                try:
+                    if frame.tick is not None:
+                        frame.tick(message)
+                    self._can_bus.send(message)
+                except Exception as error:
+                    # ie. a raising checksum, count it rather than stop every frame.
+                    frame.stats.send_errors += 1
+                    self.last_error = error
+                sent = time.perf_counter()
+
+                # Next deadline is relative to the previous deadline, not the send,
+                # so lateness never accumulates. Skip deadlines we've already missed.
+                frame.deadline += frame.period_secs
+                if frame.deadline <= sent:
+                    missed = int((sent - frame.deadline) // frame.period_secs) + 1
+                    frame.stats.missed += missed
+                    frame.deadline += missed * frame.period_secs
+
+                with self._condition:
+                    heapq.heappush(
+                        self._heap, (frame.deadline, next(self._counter), frame)
+                    )
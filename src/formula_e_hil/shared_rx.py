@@ -0,0 +1,326 @@
+from __future__ import annotations
+from typing import Any, Dict, Iterator, List, Mapping, Optional, Tuple
+import math
+import multiprocessing
+import multiprocessing.connection
+import multiprocessing.shared_memory
+import traceback
+import cantools
+import can
+import numpy as np
+
+# Shared memory layout, all little-endian 8 byte words:
+# [ header | sequence per message | timestamp per message | value per signal ]
+# Header: [ frames decoded | frames with unknown ids | frames that failed to decode ]
+_HEADER_WORDS = 3
+
+# Maximum time to wait for a decode process to open its bus.
+_STARTUP_TIMEOUT_SECS = 30.0
+
+# Layout of each message, as (name, frame id, signal names).
+_Layout = List[Tuple[str, int, Tuple[str, ...]]]
+
+
+class _SharedArrays:
+    def __init__(self, buffer: memoryview, num_messages: int, num_signals: int):
+        """Numpy views over the shared memory of a table. For internal use only.
+
+        Args:
+            buffer: Shared memory buffer.
+            num_messages: Number of messages in the table.
+            num_signals: Total number of signals across all messages.
+
+        """
+
+        self.header = np.ndarray((_HEADER_WORDS,), dtype="<u8", buffer=buffer)
+        self.sequences = np.ndarray(
+            (num_messages,), dtype="<u8", buffer=buffer, offset=_HEADER_WORDS * 8
+        )
+        self.timestamps = np.ndarray(
+            (num_messages,),
+            dtype="<f8",
+            buffer=buffer,
+            offset=(_HEADER_WORDS + num_messages) * 8,
+        )
+        self.values = np.ndarray(
+            (num_signals,),
+            dtype="<f8",
+            buffer=buffer,
+            offset=(_HEADER_WORDS + 2 * num_messages) * 8,
+        )
+
+    @staticmethod
+    def size(num_messages: int, num_signals: int) -> int:
+        """Size of the shared memory in bytes."""
+
+        return (_HEADER_WORDS + 2 * num_messages + num_signals) * 8
+
+
+def _decode_loop(
+    shared_memory_name: str,
+    layout: _Layout,
+    db: cantools.database.can.Database,
+    bus_kwargs: Dict[str, Any],
+    ready: multiprocessing.connection.Connection,
+    exit_event: multiprocessing.Event,
+):
+    """Receive and decode frames into a shared table, in a decode process.
+    For internal use only.
+
+    Each message slot is written under a seqlock: its sequence number is odd while
+    the slot is being written, and even once the write is complete.
+
+    Args:
+        shared_memory_name: Name of the table's shared memory.
+        layout: Layout of the table.
+        db: Parsed dbc file, pickled over from the parent process.
+        bus_kwargs: Keyword arguments for ``can.Bus``.
+        ready: Sent None once the bus is open,
+            or the formatted traceback if setting up failed.
+        exit_event: Set by the parent to stop the process.
+
+    """
+
+    try:
+        num_signals = sum(len(signal_names) for _, _, signal_names in layout)
+
+        shared_memory = multiprocessing.shared_memory.SharedMemory(shared_memory_name)
+        arrays = _SharedArrays(shared_memory.buf, len(layout), num_signals)
+        header, sequences, timestamps, values = (
+            arrays.header,
+            arrays.sequences,
+            arrays.timestamps,
+            arrays.values,
+        )
+
+        # Map each arbitration id to its slot, decoder, and signal range.
+        dispatch = {}
+        offset = 0
+        for index, (name, frame_id, signal_names) in enumerate(layout):
+            decode = db.get_message_by_name(name).decode
+            dispatch[frame_id] = (index, decode, offset, offset + len(signal_names))
+            offset += len(signal_names)
+
+        # Signal names per slot, in table order.
+        slot_signals = [signal_names for _, _, signal_names in layout]
+
+        bus = can.Bus(**bus_kwargs)
+    except Exception:
+        ready.send(traceback.format_exc())
+        return
+
+    ready.send(None)
+
+    try:
+        while not exit_event.is_set():
+            raw_message = bus.recv(0.1)
+            if raw_message is None:
+                continue
+
+            slot = dispatch.get(raw_message.arbitration_id)
+            if slot is None:
+                header[1] += 1
+                continue
+
+            index, decode, start, end = slot
+            try:
+                message = decode(raw_message.data, decode_choices=False)
+            except Exception:
+                # ie. a truncated frame, count it and carry on.
+                header[2] += 1
+                continue
+            decoded = [message.get(name, math.nan) for name in slot_signals[index]]
+
+            sequences[index] += 1
+            values[start:end] = decoded
+            timestamps[index] = raw_message.timestamp
+            sequences[index] += 1
+            header[0] += 1
+    finally:
+        bus.shutdown()
+        del header, sequences, timestamps, values, arrays
+        shared_memory.close()
+
+
+class SharedRxTable(Mapping):
+    def __init__(
+        self,
+        db: cantools.database.can.Database,
+        bus_kwargs: Dict[str, Any],
+    ):
+        """RX table filled by a separate decode process, through shared memory.
+        See ``Can(decode_process_bus_kwargs=...)``.
+
+        The decode process opens its own handle to the bus, receives and decodes
+        every frame, and publishes the latest values and sequence number of each
+        message. Reads take no locks and unpickle nothing, they copy a message's
+        slot and retry if the decode process wrote it meanwhile.
+
+        Values are stored as floats, and converted back to ints for integer signals.
+        Choices are returned as raw numbers, not their names.
+
+        Args:
+            db: Parsed dbc file, pickled over to the decode process,
+                so it never reloads the dbc.
+            bus_kwargs: Keyword arguments for ``can.Bus`` in the decode process.
+
+        Raises:
+            RuntimeError: The decode process failed to start,
+                with its traceback, ie. the bus could not be opened.
+
+        """
+
+        self._layout: _Layout = [
+            (
+                message.name,
+                message.frame_id,
+                tuple(signal.name for signal in message.signals),
+            )
+            for message in db.messages
+        ]
+        self._slots: Dict[str, Tuple[int, int, int]] = {}
+        self._is_integer: Dict[str, Tuple[bool, ...]] = {}
+
+        offset = 0
+        for index, message in enumerate(db.messages):
+            self._slots[message.name] = (
+                index,
+                offset,
+                offset + len(message.signals),
+            )
+            self._is_integer[message.name] = tuple(
+                not signal.is_float
+                and float(signal.scale).is_integer()
+                and float(signal.offset).is_integer()
+                for signal in message.signals
+            )
+            offset += len(message.signals)
+
+        self._shared_memory = multiprocessing.shared_memory.SharedMemory(
+            create=True, size=_SharedArrays.size(len(self._layout), offset)
+        )
+        self._arrays = _SharedArrays(self._shared_memory.buf, len(self._layout), offset)
+        self._arrays.header[:] = 0
+        self._arrays.sequences[:] = 0
+        self._arrays.timestamps[:] = math.nan
+        self._arrays.values[:] = math.nan
+
+        # Spawn rather than fork, forking a process with running threads is unsafe.
+        context = multiprocessing.get_context("spawn")
+        self._exit_event = context.Event()
+        ready_receiver, ready_sender = context.Pipe(duplex=False)
+        self._process = context.Process(
+            target=_decode_loop,
+            args=(
+                self._shared_memory.name,
+                self._layout,
+                db,
+                bus_kwargs,
+                ready_sender,
+                self._exit_event,
+            ),
+            daemon=True,
+        )
+        self._process.start()
+        ready_sender.close()
+
+        # Wait for the bus to open. If the process dies first, the pipe hits EOF.
+        try:
+            if not ready_receiver.poll(_STARTUP_TIMEOUT_SECS):
+                error = (
+                    f"Timed out after {_STARTUP_TIMEOUT_SECS} s waiting for the bus."
+                )
+            else:
+                error = ready_receiver.recv()
+        except EOFError:
+            error = f"Exited with code {self._process.exitcode} before reporting."
+        finally:
+            ready_receiver.close()
+
+        if error is not None:
+            self.close()
+            raise RuntimeError(f"Decode process failed to start:\n{error}")
+
+    @property
+    def frames_decoded(self) -> int:
+        """Number of frames decoded by the decode process."""
+
+        return int(self._arrays.header[0])
+
+    @property
+    def unknown_frames(self) -> int:
+        """Number of frames with arbitration ids not in the dbc."""
+
+        return int(self._arrays.header[1])
+
+    @property
+    def decode_failures(self) -> int:
+        """Number of frames that failed to decode, ie. truncated frames."""
+
+        return int(self._arrays.header[2])
+
+    def sequence(self, name: str) -> int:
+        """Number of frames received for a message."""
+
+        return int(self._arrays.sequences[self._slots[name][0]]) // 2
+
+    def timestamp(self, name: str) -> Optional[float]:
+        """Timestamp of the latest frame of a message, None if none was received."""
+
+        return self._read(name)[1]
+
+    def _read(self, name: str) -> Tuple[Dict[str, Optional[Any]], Optional[float]]:
+        """Copy a consistent snapshot of a message's slot. For internal use only.
+
+        Returns:
+            The message's signals, and the timestamp of its latest frame.
+            Signals absent from the latest frame, ie. multiplexed, are None.
+
+        """
+
+        index, start, end = self._slots[name]
+        sequences = self._arrays.sequences
+
+        while True:
+            before = int(sequences[index])
+            if before & 1:
+                continue
+
+            values = self._arrays.values[start:end].tolist()
+            timestamp = float(self._arrays.timestamps[index])
+
+            if int(sequences[index]) == before:
+                break
+
+        signals = {
+            signal_name: None
+            if math.isnan(value)
+            else int(value)
+            if is_integer
+            else value
+            for signal_name, value, is_integer in zip(
+                self._layout[index][2], values, self._is_integer[name]
+            )
+        }
+        return signals, None if math.isnan(timestamp) else timestamp
+
+    def __getitem__(self, name: str) -> Dict[str, Optional[Any]]:
+        """Get the latest values of a message."""
+
+        return self._read(name)[0]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._slots)
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def close(self):
+        """Stop the decode process, and free the shared memory."""
+
+        self._exit_event.set()
+        self._process.join()
+
+        self._arrays = None
+        self._shared_memory.close()
+        self._shared_memory.unlink()
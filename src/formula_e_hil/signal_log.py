@@ -0,0 +1,398 @@
+from __future__ import annotations
+from typing import Dict, List, Optional, Sequence
+import math
+import os
+import queue
+import struct
+import threading
+import cantools
+import can
+import numpy as np
+from .can import Can
+
+# Raw frames, as packed by the RX thread for the writer thread to decode.
+_RAW_DTYPE = np.dtype(
+    [
+        ("timestamp", "<f8"),
+        ("arbitration_id", "<u4"),
+        ("length", "u1"),
+        ("data", "u1", (64,)),
+    ]
+)
+
+# .npy format, see ``numpy.lib.format``.
+_NPY_MAGIC = b"\x93NUMPY"
+_NPY_ALIGNMENT = 64
+
+# Shape written in the header while logging, wide enough for any final row count,
+# so the header can be rewritten in place on close.
+_NPY_PLACEHOLDER_ROWS = 10**18
+
+
+def signal_dtype(message_type: cantools.database.can.Message) -> np.dtype:
+    """Get the record type of a message's log, one typed column per signal.
+
+    Integer signals with integer scale and offset get the smallest integer type
+    holding their whole range, every other signal is a float.
+
+    Args:
+        message_type: Message from the dbc.
+
+    Returns:
+        A structured dtype, with a ``timestamp`` column followed by every signal.
+
+    """
+
+    fields = [("timestamp", "<f8")]
+    for signal in message_type.signals:
+        scale, offset = signal.scale, signal.offset
+        if signal.is_float:
+            column = (
+                "<f4" if signal.length == 32 and (scale, offset) == (1, 0) else "<f8"
+            )
+        elif float(scale).is_integer() and float(offset).is_integer():
+            if signal.is_signed:
+                raw_min, raw_max = (
+                    -(1 << (signal.length - 1)),
+                    (1 << (signal.length - 1)) - 1,
+                )
+            else:
+                raw_min, raw_max = 0, (1 << signal.length) - 1
+
+            ends = (raw_min * scale + offset, raw_max * scale + offset)
+            column = np.result_type(
+                np.min_scalar_type(int(min(ends))), np.min_scalar_type(int(max(ends)))
+            ).newbyteorder("<")
+            if column.kind not in "iu":
+                column = np.dtype("<f8")
+        else:
+            column = "<f8"
+
+        fields.append((signal.name, column))
+
+    return np.dtype(fields)
+
+
+def _npy_header(dtype: np.dtype, rows: int, size: Optional[int] = None) -> bytes:
+    """Build a .npy header for a 1D array. For internal use only.
+
+    Args:
+        dtype: Record type.
+        rows: Number of rows.
+        size: Total header size to pad to, defaults to the smallest aligned size.
+
+    Returns:
+        The header, including the magic string.
+
+    """
+
+    header = repr(
+        {
+            "descr": np.lib.format.dtype_to_descr(dtype),
+            "fortran_order": False,
+            "shape": (rows,),
+        }
+    ).encode("latin1")
+
+    # Version 1.0 has a 2 byte header length, version 2.0 a 4 byte one.
+    version, length_format = (1, "<H") if len(header) < 65000 else (2, "<I")
+    prefix_size = len(_NPY_MAGIC) + 2 + struct.calcsize(length_format)
+    if size is None:
+        size = -(-(prefix_size + len(header) + 1) // _NPY_ALIGNMENT) * _NPY_ALIGNMENT
+
+    header = header.ljust(size - prefix_size - 1) + b"\n"
+    return (
+        _NPY_MAGIC
+        + bytes((version, 0))
+        + struct.pack(length_format, len(header))
+        + header
+    )
+
+
+def read_signal_log(path: str) -> np.ndarray:
+    """Memory-map a message's log, without reading it into RAM.
+
+    Also works on a log still being written, up to the last complete batch.
+
+    Args:
+        path: Path of the .npy log.
+
+    Returns:
+        A read-only structured array, one row per frame, see ``signal_dtype``.
+
+    """
+
+    with open(path, "rb") as log_file:
+        version = np.lib.format.read_magic(log_file)
+        if version == (1, 0):
+            _, _, dtype = np.lib.format.read_array_header_1_0(log_file)
+        else:
+            _, _, dtype = np.lib.format.read_array_header_2_0(log_file)
+        offset = log_file.tell()
+
+    rows = (os.path.getsize(path) - offset) // dtype.itemsize
+    if rows == 0:
+        return np.zeros(0, dtype=dtype)
+
+    return np.memmap(path, dtype=dtype, mode="r", offset=offset, shape=(rows,))
+
+
+class _MessageLog:
+    def __init__(
+        self, path: str, message_type: cantools.database.can.Message, batch_rows: int
+    ):
+        """Log file of one message, written by the writer thread. For internal use only.
+
+        Args:
+            path: Path of the .npy log to create.
+            message_type: Message from the dbc.
+            batch_rows: Number of rows per write.
+
+        """
+
+        self.decode = message_type.decode
+        self.dtype = signal_dtype(message_type)
+        self.rows_written = 0
+
+        # Missing signals, ie. multiplexed out, are NaN for floats and 0 for ints.
+        self.missing = {
+            name: math.nan if self.dtype[name].kind == "f" else 0
+            for name in self.dtype.names[1:]
+        }
+
+        self._file = open(path, "wb")
+        self._header = _npy_header(self.dtype, _NPY_PLACEHOLDER_ROWS)
+        self._file.write(self._header)
+
+        self._batch = np.zeros(batch_rows, dtype=self.dtype)
+        self._fill = 0
+
+    def append(self, row: tuple):
+        """Add a row, writing out the batch once full."""
+
+        self._batch[self._fill] = row
+        self._fill += 1
+        if self._fill == len(self._batch):
+            self.flush()
+
+    def flush(self):
+        """Write out the rows added so far."""
+
+        if self._fill > 0:
+            self._file.write(memoryview(self._batch[: self._fill]).cast("B"))
+            self.rows_written += self._fill
+            self._fill = 0
+
+    def close(self):
+        """Flush, and rewrite the header with the final row count."""
+
+        self.flush()
+        self._file.seek(0)
+        self._file.write(_npy_header(self.dtype, self.rows_written, len(self._header)))
+        self._file.close()
+
+
+class SignalLogger:
+    def __init__(
+        self,
+        bus: Can,
+        directory: str,
+        message_names: Optional[Sequence[str]] = None,
+        batch_rows: int = 4096,
+        max_pending_batches: int = 16,
+    ):
+        """Stream decoded signals from a bus to disk, one columnar .npy log per message.
+
+        The RX thread only packs raw frames into a preallocated batch.
+        Full batches are decoded and written in fixed-size record batches
+        by a separate writer thread, so disk I/O never blocks reception.
+        At most ``max_pending_batches`` raw batches are held, if the writer falls
+        that far behind, frames are dropped and counted in ``frames_dropped``.
+
+        Read logs back zero-copy with ``read_signal_log``, or ``numpy.load``
+        with ``mmap_mode="r"`` once stopped. ``pandas.DataFrame`` accepts them as is.
+        Frames that fail to decode, ie. truncated frames, are skipped
+        and counted in ``frames_failed``.
+
+        Args:
+            bus: Bus to log.
+            directory: Directory to write ``<message name>.npy`` logs into.
+            message_names: Messages to log, defaults to every message in the dbc.
+            batch_rows: Number of frames per raw batch, and rows per write.
+            max_pending_batches: Maximum number of raw batches awaiting the writer.
+
+        """
+
+        self.frames_logged = 0
+        self.frames_dropped = 0
+        self.frames_failed = 0
+
+        # Error that stopped the writer thread, if any, re-raised by ``stop``.
+        self._writer_error: Optional[BaseException] = None
+
+        os.makedirs(directory, exist_ok=True)
+
+        if message_names is None:
+            message_names = [message.name for message in bus._db.messages]
+
+        # Map from arbitration id to log.
+        self._logs: Dict[int, _MessageLog] = {}
+        for name in message_names:
+            message_type = bus._db.get_message_by_name(name)
+            self._logs[message_type.frame_id] = _MessageLog(
+                os.path.join(directory, f"{name}.npy"), message_type, batch_rows
+            )
+
+        self._bus = bus
+        self._batch_rows = batch_rows
+
+        # Batch being filled by the RX thread, guarded by the lock.
+        self._lock = threading.Lock()
+        self._batch = np.zeros(batch_rows, dtype=_RAW_DTYPE)
+        self._batch_fill = 0
+
+        # Full batches waiting for the writer, and written batches ready for reuse.
+        self._full_batches: queue.Queue = queue.Queue(max_pending_batches)
+        self._spare_batches: List[np.ndarray] = []
+
+        self._writer_thread = threading.Thread(target=self._write_loop, daemon=True)
+        self._writer_thread.start()
+
+        bus.add_rx_listener(self._on_rx_frame)
+
+    def _on_rx_frame(self, message: can.Message):
+        """Pack a frame into the current batch. For internal use only."""
+
+        if message.arbitration_id not in self._logs or message.is_error_frame:
+            return
+
+        data = bytes(message.data)
+        with self._lock:
+            record = self._batch[self._batch_fill]
+            record["timestamp"] = message.timestamp
+            record["arbitration_id"] = message.arbitration_id
+            record["length"] = len(data)
+            record["data"][: len(data)] = np.frombuffer(data, dtype=np.uint8)
+            self._batch_fill += 1
+
+            if self._batch_fill == self._batch_rows:
+                self._swap_batch()
+
+    def _swap_batch(self):
+        """Hand the current batch to the writer, and start a new one.
+        For internal use only, call with the lock held.
+
+        """
+
+        try:
+            self._full_batches.put_nowait((self._batch, self._batch_fill))
+        except queue.Full:
+            # Writer is too far behind, drop the batch rather than grow.
+            self.frames_dropped += self._batch_fill
+            self._batch_fill = 0
+            return
+
+        self._batch = (
+            self._spare_batches.pop()
+            if self._spare_batches
+            else np.zeros(self._batch_rows, dtype=_RAW_DTYPE)
+        )
+        self._batch_fill = 0
+
+    def _write_loop(self):
+        """Background decode and write loop. For internal use only."""
+
+        try:
+            while True:
+                item = self._full_batches.get()
+                if item is None:
+                    break
+
+                self._write_batch(*item)
+        except BaseException as error:
+            # ie. the disk is full, ``stop`` re-raises it.
+            self._writer_error = error
+
+    def _write_batch(self, batch: np.ndarray, fill: int):
+        """Decode a raw batch into the logs. For internal use only.
+
+        Args:
+            batch: Raw batch, see ``_RAW_DTYPE``.
+            fill: Number of frames in the batch.
+
+        """
+
+        failed = 0
+        for timestamp, arbitration_id, length, data in zip(
+            batch["timestamp"][:fill].tolist(),
+            batch["arbitration_id"][:fill].tolist(),
+            batch["length"][:fill].tolist(),
+            batch["data"][:fill],
+        ):
+            log = self._logs[arbitration_id]
+            try:
+                signals = log.decode(data[:length].tobytes(), decode_choices=False)
+            except Exception:
+                failed += 1
+                continue
+
+            log.append(
+                (timestamp,)
+                + tuple(
+                    signals.get(name, missing) for name, missing in log.missing.items()
+                )
+            )
+
+        self.frames_logged += fill - failed
+        self.frames_failed += failed
+        with self._lock:
+            self._spare_batches.append(batch)
+
+    def _put_for_writer(self, item: Optional[tuple]):
+        """Queue an item for the writer, blocking while it catches up,
+        but never once it has stopped. For internal use only.
+
+        Args:
+            item: A raw batch and its fill, or None to stop the writer.
+
+        """
+
+        while self._writer_thread.is_alive():
+            try:
+                self._full_batches.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def stop(self):
+        """Stop logging, flushing every frame to disk and finalizing the logs.
+
+        Raises:
+            RuntimeError: The writer thread failed, the logs hold every row
+                written before it did.
+
+        """
+
+        self._bus.remove_rx_listener(self._on_rx_frame)
+
+        with self._lock:
+            last_batch = (self._batch, self._batch_fill)
+            self._batch_fill = 0
+
+        # Block rather than drop, the RX thread no longer feeds us.
+        # Outside the lock, which the writer takes to return spare batches.
+        if last_batch[1] > 0:
+            self._put_for_writer(last_batch)
+        self._put_for_writer(None)
+        self._writer_thread.join()
+
+        for log in self._logs.values():
+            log.close()
+
+        if self._writer_error is not None:
+            raise RuntimeError("Signal log writer failed.") from self._writer_error
+
+    def __exit__(self):
+        """Destruct the logger."""
+
+        self.stop()
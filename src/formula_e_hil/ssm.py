@@ -1,7 +1,21 @@
 from enum import Enum
-from typing import Dict
+import contextlib
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
 
-import chimera_v2
+import numpy as np
+from .metrics import SsmMetrics
+
+
+class TransactionTracker:
+    def __init__(self):
+        """Chimera transactions sent by one thread, see ``Ssm.track_transactions``."""
+
+        self.transactions = 0
+
+        # Wall-clock time the last tracked transaction returned, from ``time.time``.
+        self.last_transaction_time: Optional[float] = None
 
 
 class Ssm:
@@ -17,12 +31,23 @@ class Ssm:
     _DAC_NAME = "SPI_DAC"
     _DAC_N_CLEAR_NAME = "GPIO_DAC_N_CLEAR"
 
-    def __init__(self):
+    def __init__(self, backend: Optional[Any] = None):
         """Create an interface to an SSM (Simulated Sensor Module),
         with methods that more SSM-specific than the provided Chimera interface.
+
+        Args:
+            backend: Chimera SSM handle to drive, defaults to real hardware.
+                Pass a ``VirtualSsm`` to run without hardware.
+
         """
 
-        self._chimera_handler = chimera_v2.SSM()
+        if backend is None:
+            # Only needed for real hardware.
+            import chimera_v2
+
+            backend = chimera_v2.SSM()
+
+        self._chimera_handler = backend
 
         self.isospi_high_side = self._chimera_handler.spi_device(
             self._ISOSPI_HIGH_SIDE_NAME
@@ -33,8 +58,166 @@ class Ssm:
 
         self._dac_handler = self._chimera_handler.spi_device(self._DAC_NAME)
 
+        # Shadow copies of the last written GPIO states, and DAC input/output codes,
+        # so writes that would change nothing are skipped.
+        # Guarded, with the writes and counters, by the lock, as a PWM generator's
+        # thread writes alongside callers. Otherwise a racing write could leave
+        # the shadow out of step with the SSM, and wrongly skip a later write.
+        self._lock = threading.Lock()
+        self._gpio_states: Dict[str, bool] = {}
+        self._dac_input_codes: Dict[Ssm.AnalogChannel, int] = {}
+        self._dac_output_codes: Dict[Ssm.AnalogChannel, int] = {}
+
+        # Precomputed DAC command words, keyed by command and channel, indexed by code.
+        self._dac_words: Dict[
+            Tuple[Ssm._DacCommand, Ssm.AnalogChannel], List[bytes]
+        ] = {}
+
+        # Number of chimera transactions sent, and skipped thanks to the shadow copies.
+        self.spi_transactions = 0
+        self.spi_transactions_elided = 0
+        self.gpio_writes = 0
+        self.gpio_writes_elided = 0
+
+        # Wall-clock time the last chimera transaction returned, from ``time.time``,
+        # on any thread, ie. including a PWM generator's edges.
+        self.last_transaction_time: Optional[float] = None
+
+        # Active tracker of each thread, see ``track_transactions``.
+        self._thread_local = threading.local()
+
+        # Transaction timing, None when disabled so transactions skip it.
+        self.metrics: Optional[SsmMetrics] = SsmMetrics()
+
         # Make sure to hold this high in order to not clear DAC data.
-        self._chimera_handler.gpio_write(self._DAC_N_CLEAR_NAME, True)
+        self._gpio_write(self._DAC_N_CLEAR_NAME, True)
+
+    def _gpio_write(self, name: str, state: bool):
+        """Write a GPIO, unless it is already in that state. For internal use only.
+
+        Args:
+            name: Chimera ID of the GPIO.
+            state: State to write.
+
+        """
+
+        with self._lock:
+            if self._gpio_states.get(name) == state:
+                self.gpio_writes_elided += 1
+                return
+
+            start = time.perf_counter()
+            self._chimera_handler.gpio_write(name, state)
+            self._record_transaction(start)
+            self._gpio_states[name] = state
+            self.gpio_writes += 1
+
+    def _record_transaction(self, start: float):
+        """Record a chimera transaction that just returned. For internal use only.
+
+        Args:
+            start: ``time.perf_counter`` before the transaction was sent.
+
+        """
+
+        now = time.time()
+        self.last_transaction_time = now
+
+        tracker = getattr(self._thread_local, "tracker", None)
+        if tracker is not None:
+            tracker.transactions += 1
+            tracker.last_transaction_time = now
+
+        metrics = self.metrics
+        if metrics is not None:
+            metrics.transaction_secs.observe(time.perf_counter() - start)
+
+    def metrics_snapshot(self) -> Dict[str, Any]:
+        """Get runtime metrics of the SSM.
+
+        Returns:
+            Transaction counts, see ``transaction_stats``, and if metrics are enabled,
+            a histogram of transaction round trip times, see ``Histogram.as_dict``.
+
+        """
+
+        snapshot: Dict[str, Any] = self.transaction_stats()
+        metrics = self.metrics
+        if metrics is not None:
+            snapshot["transaction_secs"] = metrics.transaction_secs.as_dict()
+
+        return snapshot
+
+    def transaction_stats(self) -> Dict[str, int]:
+        """Get the number of chimera transactions sent, and skipped as redundant.
+
+        Returns:
+            A dictionary of SPI and GPIO transaction counts.
+
+        """
+
+        return {
+            "spi_transactions": self.spi_transactions,
+            "spi_transactions_elided": self.spi_transactions_elided,
+            "gpio_writes": self.gpio_writes,
+            "gpio_writes_elided": self.gpio_writes_elided,
+        }
+
+    def invalidate_shadow(self):
+        """Forget the shadow copies, so the next write to every output is sent.
+
+        Use this if the SSM may have been changed behind our back, ie. after a reset.
+        """
+
+        with self._lock:
+            self._gpio_states.clear()
+            self._dac_input_codes.clear()
+            self._dac_output_codes.clear()
+
+    @contextlib.contextmanager
+    def track_transactions(self) -> Iterator[TransactionTracker]:
+        """Track the chimera transactions the calling thread sends within a block.
+
+        Transactions sent by other threads, ie. a PWM generator, are not counted,
+        so the tracker times exactly what the block itself sent.
+
+        Eg. ``with ssm.track_transactions() as tracker: fakes.set_apps_percentage(50)``
+
+        Yields:
+            The tracker, updated as transactions return.
+
+        """
+
+        tracker = TransactionTracker()
+        previous = getattr(self._thread_local, "tracker", None)
+        self._thread_local.tracker = tracker
+        try:
+            yield tracker
+        finally:
+            self._thread_local.tracker = previous
+
+    def measure_round_trip(self, samples: int = 20) -> np.ndarray:
+        """Measure the round trip time of a chimera transaction, ie. over USB.
+
+        Rewrites the DAC clear pin high, which it is always held at,
+        so the outputs are left untouched.
+
+        Args:
+            samples: Number of transactions to time.
+
+        Returns:
+            Round trip time of each transaction in seconds.
+
+        """
+
+        round_trips = np.empty(samples)
+        for sample in range(samples):
+            with self._lock:
+                start = time.perf_counter()
+                self._chimera_handler.gpio_write(self._DAC_N_CLEAR_NAME, True)
+                round_trips[sample] = time.perf_counter() - start
+
+        return round_trips
 
     class Indicator(Enum):
         """Representation of an indicator LED."""
@@ -52,9 +235,7 @@ class Ssm:
         """
 
         for scanned_indicator in self.Indicator:
-            self._chimera_handler.gpio_write(
-                scanned_indicator.value, scanned_indicator == indicator
-            )
+            self._gpio_write(scanned_indicator.value, scanned_indicator == indicator)
 
     class Interlock(Enum):
         """Representation of an interlock peripheral."""
@@ -73,7 +254,7 @@ class Ssm:
 
         """
 
-        self._chimera_handler.gpio_write(interlock.value, closed)
+        self._gpio_write(interlock.value, closed)
 
     class DigitalChannel(Enum):
         """Representation of a GPIO digital output pin."""
@@ -92,7 +273,7 @@ class Ssm:
 
         """
 
-        self._chimera_handler.gpio_write(channel.value, state)
+        self._gpio_write(channel.value, state)
 
     _DEBUG_LED_NAME = "GPIO_DEBUG_LED"
 
@@ -104,7 +285,7 @@ class Ssm:
 
         """
 
-        self._chimera_handler.gpio_write(self._DEBUG_LED_NAME, state)
+        self._gpio_write(self._DEBUG_LED_NAME, state)
 
     _BOOT_LED_NAME = "GPIO_BOOT_LED"
 
@@ -116,7 +297,7 @@ class Ssm:
 
         """
 
-        self._chimera_handler.gpio_write(self._BOOT_LED_NAME, status)
+        self._gpio_write(self._BOOT_LED_NAME, status)
 
     class AnalogChannel(Enum):
         """Representation of an output analog channel. Maps from ADC through hole to DAC channel id."""
@@ -141,86 +322,200 @@ class Ssm:
         POWER_DOWN_CHANNEL = 0b0100
         NO_OPERATION = 0b1111
 
-    def _execute_dac_command(
-        self, command: _DacCommand, channel: AnalogChannel, output_volts: float
-    ):
-        """Execute a SPI command on the DAC. For internal use only.
+    # Data bits if we are outputing ref_volts.
+    _DAC_MAX_CODE = 0xFFF
 
-        Args:
-            command: DAC command to execute.
-            channel: Target channel.
-            output_volts: Voltage value to use to compute the data field.
+    # Every DAC output channel, excluding ``AnalogChannel.ALL``.
+    _DAC_CHANNELS = tuple(channel for channel in AnalogChannel if channel.value != 0x0F)
 
-        """
+    @classmethod
+    def volts_to_dac_code(
+        cls, output_volts: Union[float, np.ndarray]
+    ) -> Union[int, np.ndarray]:
+        """Convert voltages to DAC setpoints.
 
-        # DAC driver for LTC2620, from the datasheet:
-        # https://datasheet.ciiva.com/pdfs/VipMasterIC/IC/LITC/LITCS09782/LITCS09782-1.pdf?src-supplier=IHS+Markit
+        Args:
+            output_volts: Voltage to output, or an array of voltages to convert in one pass.
 
-        # Extract channel and command.
-        command_bits = command.value
-        channel_bits = channel.value
+        Returns:
+            The 12-bit DAC code, or an array of codes.
 
-        # Ratio from output volts to ref.
-        output_ratio = output_volts / self.DAC_REF_VOLTS
-        assert 0 <= output_ratio <= 1
+        Raises:
+            ValueError: A voltage is outside of [0, ``DAC_REF_VOLTS``].
 
-        # Data bits if we are outputing ref_volts.
-        ref_volts_data_bits = 0xFFF
+        """
 
         # From V_OUT = (k / 2^N) V_REF in the datasheet.
         # ie. k = (V_OUT / V_REF) * 2^N.
         # where k is the setpoint, N is the resolution, and V_REF is the reference voltage.
-        data_bits = int(output_ratio * ref_volts_data_bits)
+        if isinstance(output_volts, (int, float)):
+            # Ratio from output volts to ref.
+            output_ratio = output_volts / cls.DAC_REF_VOLTS
+            if not 0 <= output_ratio <= 1:
+                raise ValueError(
+                    f"{output_volts} V is outside of [0, {cls.DAC_REF_VOLTS}] V."
+                )
+            return int(output_ratio * cls._DAC_MAX_CODE)
+
+        # Range check the whole array at once, NaNs count as out of range.
+        output_ratio = np.asarray(output_volts, dtype=np.float64) / cls.DAC_REF_VOLTS
+        out_of_range = ~((output_ratio >= 0) & (output_ratio <= 1))
+        if out_of_range.any():
+            first = int(np.argmax(out_of_range.ravel()))
+            raise ValueError(
+                f"{np.count_nonzero(out_of_range)} voltages are outside of "
+                f"[0, {cls.DAC_REF_VOLTS}] V, the first at flat index {first}."
+            )
 
-        # Build word and convert to bytes.
-        # Input word format:
-        # 24-----------20------------16-------------4-------------0
-        # [ command (4) | channel (4) | data   (12) | UNUSED  (4) ]
-        # 3 bytes long, most-significant bit to the left.
-        input_word_length = 3
-        input_word = (command_bits << 20) + (channel_bits << 16) + (data_bits << 4)
-        input_word_bytes = input_word.to_bytes(input_word_length, "big")
+        return (output_ratio * cls._DAC_MAX_CODE).astype(np.int64)
+
+    def _dac_word(
+        self, command: _DacCommand, channel: AnalogChannel, code: int
+    ) -> bytes:
+        """Get the SPI word for a DAC command. For internal use only.
+
+        Words for every code are built the first time a command/channel pair is used.
+
+        Args:
+            command: DAC command to execute.
+            channel: Target channel.
+            code: 12-bit DAC code for the data field.
+
+        Returns:
+            The 3 byte input word.
+
+        """
+
+        words = self._dac_words.get((command, channel))
+        if words is None:
+            # Build word and convert to bytes.
+            # Input word format:
+            # 24-----------20------------16-------------4-------------0
+            # [ command (4) | channel (4) | data   (12) | UNUSED  (4) ]
+            # 3 bytes long, most-significant bit to the left.
+            input_word_length = 3
+            prefix = (command.value << 20) + (channel.value << 16)
+            words = [
+                (prefix + (data_bits << 4)).to_bytes(input_word_length, "big")
+                for data_bits in range(self._DAC_MAX_CODE + 1)
+            ]
+            self._dac_words[(command, channel)] = words
+
+        return words[code]
+
+    def _execute_dac_command(
+        self, command: _DacCommand, channel: AnalogChannel, code: int
+    ):
+        """Execute a SPI command on the DAC, and track its effect in the shadow copies.
+        For internal use only, call with the lock held.
+
+        Args:
+            command: DAC command to execute.
+            channel: Target channel.
+            code: 12-bit DAC code for the data field.
+
+        """
+
+        # DAC driver for LTC2620, from the datasheet:
+        # https://datasheet.ciiva.com/pdfs/VipMasterIC/IC/LITC/LITCS09782/LITCS09782-1.pdf?src-supplier=IHS+Markit
 
         # Transmit.
-        self._dac_handler.transmit(input_word_bytes)
+        start = time.perf_counter()
+        self._dac_handler.transmit(self._dac_word(command, channel, code))
+        self._record_transaction(start)
+        self.spi_transactions += 1
+
+        # Mirror the DAC's input and output registers.
+        channels = (
+            self._DAC_CHANNELS if channel == self.AnalogChannel.ALL else (channel,)
+        )
+        for target in channels:
+            self._dac_input_codes[target] = code
+        if command == self._DacCommand.LOAD_AND_UPDATE_CHANNEL:
+            for target in channels:
+                self._dac_output_codes[target] = code
+        elif command == self._DacCommand.LOAD_ONE_AND_UPDATE_ALL_CHANNELS:
+            self._dac_output_codes.update(self._dac_input_codes)
+
+    def _is_dac_code_set(self, channel: AnalogChannel, code: int) -> bool:
+        """Check if a channel is already outputting a code. For internal use only."""
+
+        channels = (
+            self._DAC_CHANNELS if channel == self.AnalogChannel.ALL else (channel,)
+        )
+        return all(
+            self._dac_output_codes.get(target) == code
+            and self._dac_input_codes.get(target) == code
+            for target in channels
+        )
 
     def set_analog(self, channel: AnalogChannel, output_volts: float):
         """Transmit a voltage over an analog output channel.
 
+        Skipped if the channel is already outputting that voltage.
+
         Args:
             channel: Channel to target.
             output_volts: Voltage to output, capped at the reference voltage.
 
         """
 
-        self._execute_dac_command(
-            self._DacCommand.LOAD_AND_UPDATE_CHANNEL, channel, output_volts
-        )
+        self.set_analogs({channel: output_volts})
 
     def set_analogs(self, channel_to_output_volts: Dict[AnalogChannel, float]):
         """Transmit multiple voltages over multiple channels, updating the voltages all at once.
 
+        Channels already outputting their voltage are skipped.
+        The LTC2620 latches one command per SPI transaction,
+        so updating N channels costs N transactions.
+
         Args:
             channel_to_output_volts: A dictionary of channels to desired voltages.
 
         """
 
-        if len(channel_to_output_volts) > 0:
-            # Preload all channels with the desired voltage.
-            for channel in channel_to_output_volts:
+        self.set_analog_codes(
+            {
+                channel: self.volts_to_dac_code(output_volts)
+                for channel, output_volts in channel_to_output_volts.items()
+            }
+        )
+
+    def set_analog_codes(self, channel_to_code: Dict[AnalogChannel, int]):
+        """Like ``set_analogs``, but with raw 12-bit DAC codes instead of voltages.
+
+        Useful when codes have been computed ahead of time.
+
+        Args:
+            channel_to_code: A dictionary of channels to desired DAC codes.
+
+        """
+
+        with self._lock:
+            changed = [
+                (channel, code)
+                for channel, code in channel_to_code.items()
+                if not self._is_dac_code_set(channel, code)
+            ]
+
+            # Without shadow copies, we would send a load per channel plus a final update.
+            baseline_transactions = len(channel_to_code) + (len(channel_to_code) > 1)
+            self.spi_transactions_elided += baseline_transactions - len(changed)
+
+            if len(changed) == 1:
+                channel, code = changed[0]
                 self._execute_dac_command(
-                    self._DacCommand.LOAD_CHANNEL,
-                    channel,
-                    channel_to_output_volts[channel],
+                    self._DacCommand.LOAD_AND_UPDATE_CHANNEL, channel, code
+                )
+            elif len(changed) > 1:
+                # Preload all but one channel with the desired voltage.
+                for channel, code in changed[:-1]:
+                    self._execute_dac_command(
+                        self._DacCommand.LOAD_CHANNEL, channel, code
+                    )
+
+                # Load the last channel and update all channels in one go.
+                channel, code = changed[-1]
+                self._execute_dac_command(
+                    self._DacCommand.LOAD_ONE_AND_UPDATE_ALL_CHANNELS, channel, code
                 )
-
-            # Update all channels in one go.
-            # NOTE: the LTC2620 DAC cannot update all channels,
-            # without updating the input register on at least one,
-            # so we select an arbritrary channel to write a value to again.
-            channel = next(iter(channel_to_output_volts))
-            self._execute_dac_command(
-                self._DacCommand.LOAD_ONE_AND_UPDATE_ALL_CHANNELS,
-                channel,
-                channel_to_output_volts[channel],
-            )
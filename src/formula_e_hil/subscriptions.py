@@ -0,0 +1,112 @@
+from __future__ import annotations
+from typing import Any, Callable, Dict, Optional, Sequence
+import logging
+import queue
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Called with the message name, its decoded signals, and the frame's timestamp.
+SubscriptionCallback = Callable[[str, Dict[str, Any], float], None]
+
+
+class Subscription:
+    def __init__(
+        self,
+        parent: Any,
+        message_name: str,
+        callback: Optional[SubscriptionCallback],
+        signal_names: Optional[Sequence[str]],
+    ):
+        """A declared interest in a message, with an optional callback.
+
+        This constructor should never be called by the user,
+        instead use ``Can.subscribe``.
+
+        Args:
+            parent: Parent CAN handler.
+            message_name: Name of the message.
+            callback: Called on the dispatcher thread with each received frame.
+            signal_names: If set, the callback only receives these signals.
+
+        """
+
+        self.message_name = message_name
+        self.callback = callback
+        self.signal_names = None if signal_names is None else tuple(signal_names)
+
+        self._parent = parent
+
+    def unsubscribe(self):
+        """Remove the subscription, and narrow the bus filters if possible."""
+
+        self._parent.unsubscribe(self)
+
+    def _signals(self, message: Dict[str, Any]) -> Dict[str, Any]:
+        """Select the subscribed signals out of a decoded message. For internal use only."""
+
+        if self.signal_names is None:
+            return message
+
+        return {name: message[name] for name in self.signal_names}
+
+
+class CallbackDispatcher:
+    def __init__(self, max_pending: int = 10000):
+        """Run subscription callbacks on a dedicated thread,
+        so slow callbacks never stall the RX thread.
+
+        Args:
+            max_pending: Maximum number of queued callbacks,
+                further callbacks are dropped and counted while the queue is full.
+
+        """
+
+        self.dropped = 0
+        self.errors = 0
+
+        self._queue: queue.Queue = queue.Queue(max_pending)
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+        self._thread.start()
+
+    def dispatch(
+        self, subscription: Subscription, message: Dict[str, Any], timestamp: float
+    ):
+        """Queue a callback, without blocking.
+
+        Args:
+            subscription: Subscription whose callback to run.
+            message: Decoded signals of the received message.
+            timestamp: Timestamp of the received frame.
+
+        """
+
+        try:
+            self._queue.put_nowait((subscription, message, timestamp))
+        except queue.Full:
+            self.dropped += 1
+
+    def stop(self):
+        """Stop the dispatcher thread, after running every queued callback."""
+
+        self._queue.put(None)
+        self._thread.join()
+
+    def _loop(self):
+        """Dispatcher loop. For internal use only."""
+
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+
+            subscription, message, timestamp = item
+            try:
+                subscription.callback(
+                    subscription.message_name, subscription._signals(message), timestamp
+                )
+            except Exception:
+                self.errors += 1
+                logger.exception(
+                    "Subscription callback for %s raised.", subscription.message_name
+                )
@@ -1,4 +1,57 @@
-def suspension_travel_to_potential_volts(travel_m: float) -> float:
+from typing import Sequence, Union
+import numpy as np
+
+# Every conversion accepts either a single value, or an array (or sequence) of values,
+# in which case the whole array is converted in one vectorized pass.
+FloatOrArray = Union[float, Sequence[float], np.ndarray]
+
+
+def _as_float_or_array(value: FloatOrArray) -> Union[float, np.ndarray]:
+    """Pass scalars through untouched, and convert anything else to a float array.
+
+    Args:
+        value: A scalar, sequence, or array.
+
+    Returns:
+        The scalar, or a float64 array.
+
+    """
+
+    if isinstance(value, (int, float, np.number)):
+        return value
+
+    return np.asarray(value, dtype=np.float64)
+
+
+def _check_range(value: Union[float, np.ndarray], low: float, high: float, unit: str):
+    """Check a scalar, or a whole array at once, is within [low, high].
+
+    Args:
+        value: A scalar, or a float array, see ``_as_float_or_array``.
+        low: Lowest allowed value.
+        high: Highest allowed value.
+        unit: Unit of the value, for the error message.
+
+    Raises:
+        ValueError: A value is outside of [low, high], NaNs count as out of range.
+
+    """
+
+    if isinstance(value, (int, float, np.number)):
+        if not low <= value <= high:
+            raise ValueError(f"{value} {unit} is outside of [{low}, {high}] {unit}.")
+        return
+
+    out_of_range = ~((value >= low) & (value <= high))
+    if out_of_range.any():
+        first = int(np.argmax(out_of_range.ravel()))
+        raise ValueError(
+            f"{np.count_nonzero(out_of_range)} values are outside of "
+            f"[{low}, {high}] {unit}, the first at flat index {first}."
+        )
+
+
+def suspension_travel_to_potential_volts(travel_m: FloatOrArray) -> FloatOrArray:
     """Convert from suspension travel to sensor voltage output.
 
     Args:
@@ -7,14 +60,20 @@ def suspension_travel_to_potential_volts(travel_m: float) -> float:
     Returns:
         Output voltage of suspension travel sensor in volts.
 
+    Raises:
+        ValueError: A travel is negative.
+
     """
 
+    travel_m = _as_float_or_array(travel_m)
+    _check_range(travel_m, 0, np.inf, "m")
+
     # From https://www.vpw.com.au/assets/brochures/HT-011211.pdf
     # (100 V/m) * travel = voltage
     return 100 * travel_m
 
 
-def flow_rate_to_frequency_hz(rate_litres_per_min: float) -> float:
+def flow_rate_to_frequency_hz(rate_litres_per_min: FloatOrArray) -> FloatOrArray:
     """Convert from flow rate to flow rate sensor frequency.
 
     Args:
@@ -23,13 +82,19 @@ def flow_rate_to_frequency_hz(rate_litres_per_min: float) -> float:
     Returns:
         Output frequency of flow rate sensor in Hz.
 
+    Raises:
+        ValueError: A flow rate is negative.
+
     """
 
+    rate_litres_per_min = _as_float_or_array(rate_litres_per_min)
+    _check_range(rate_litres_per_min, 0, np.inf, "L/min")
+
     # From https://www.adafruit.com/product/828.
     return 7.5 * rate_litres_per_min
 
 
-def steering_angle_to_potential_volts(angle_degrees: float) -> float:
+def steering_angle_to_potential_volts(angle_degrees: FloatOrArray) -> FloatOrArray:
     """Convert from steering angle to steering sensor voltage output.
 
     Args:
@@ -38,8 +103,13 @@ def steering_angle_to_potential_volts(angle_degrees: float) -> float:
     Returns:
         Output voltage of steering sensor in volts.
 
+    Raises:
+        ValueError: An angle is outside of the sensor's span.
+
     """
 
+    angle_degrees = _as_float_or_array(angle_degrees)
+
     # From Quadruna steering rack values, should be identical on Quintuna.
     steering_angle_potential_offset_volts = 2.21
     steering_potential_max_volts, steering_potential_min_volts = 0.2, 3.5
@@ -47,10 +117,20 @@ def steering_angle_to_potential_volts(angle_degrees: float) -> float:
         steering_potential_max_volts - steering_potential_min_volts
     )
     degrees_per_volts = 360 / (steering_potential_range_volts)
+
+    # Angles at either end of the sensor's output span.
+    _check_range(
+        angle_degrees,
+        (steering_potential_min_volts - steering_angle_potential_offset_volts)
+        * degrees_per_volts,
+        (steering_potential_max_volts - steering_angle_potential_offset_volts)
+        * degrees_per_volts,
+        "degrees",
+    )
     return angle_degrees / degrees_per_volts + steering_angle_potential_offset_volts
 
 
-def brake_pressure_to_potential_volts(brake_pressure_psi: float) -> float:
+def brake_pressure_to_potential_volts(brake_pressure_psi: FloatOrArray) -> FloatOrArray:
     """Convert from brake pressure to pressure sensor voltage output.
 
     Args:
@@ -59,8 +139,14 @@ def brake_pressure_to_potential_volts(brake_pressure_psi: float) -> float:
     Returns:
         Output voltage of pressure sensor in volts.
 
+    Raises:
+        ValueError: A pressure is outside of [0, 1000] PSI.
+
     """
 
+    brake_pressure_psi = _as_float_or_array(brake_pressure_psi)
+    _check_range(brake_pressure_psi, 0, 1000, "PSI")
+
     # From direct charecterization of sensors.
     pressure_span_psi = 1000
     voltage_offset = 0.5
@@ -70,7 +156,7 @@ def brake_pressure_to_potential_volts(brake_pressure_psi: float) -> float:
     return voltage_offset + volts_per_psi * brake_pressure_psi
 
 
-def apps_percentage_to_potential_volts(apps_percentage: float) -> float:
+def apps_percentage_to_potential_volts(apps_percentage: FloatOrArray) -> FloatOrArray:
     """Convert from apps percentage to apps sensor voltage output.
 
     Args:
@@ -79,9 +165,47 @@ def apps_percentage_to_potential_volts(apps_percentage: float) -> float:
     Returns:
         Output voltage of apps sensor in volts.
 
+    Raises:
+        ValueError: A percentage is outside of [0, 100].
+
     """
 
+    apps_percentage = _as_float_or_array(apps_percentage)
+    _check_range(apps_percentage, 0, 100, "%")
+
     # Note: HIL testing runs before we can validate the accelerator pedals.
     # Temporarilly, we run a linear transfer function that outputs 5V at 100%,
     # and 0V at 0%.
     return apps_percentage / 100 * 5
+
+
+def thermistor_temperature_to_potential_volts(
+    temperature_celsius: FloatOrArray,
+) -> FloatOrArray:
+    """Convert from cell temperature to segment thermistor divider voltage output.
+
+    Args:
+        temperature_celsius: Target temperature in celsius.
+
+    Returns:
+        Output voltage of the thermistor divider in volts.
+
+    Raises:
+        ValueError: A temperature is outside of the thermistor's [-40, 125] C range.
+
+    """
+
+    temperature_celsius = _as_float_or_array(temperature_celsius)
+    _check_range(temperature_celsius, -40, 125, "C")
+
+    # 10k NTC, B = 3435 K, below a 10k pull-up to the LTC68xx's 3 V reference.
+    nominal_ohms = 10e3
+    beta_kelvin = 3435
+    nominal_kelvin = 298.15
+    pull_up_ohms = 10e3
+    reference_volts = 3.0
+
+    thermistor_ohms = nominal_ohms * np.exp(
+        beta_kelvin * (1 / (temperature_celsius + 273.15) - 1 / nominal_kelvin)
+    )
+    return reference_volts * thermistor_ohms / (thermistor_ohms + pull_up_ohms)
@@ -0,0 +1,219 @@
+from __future__ import annotations
+from typing import Callable, Dict, NamedTuple, Optional, Union
+import collections
+import threading
+import time
+from .ssm import Ssm
+
+
+class SsmEvent(NamedTuple):
+    """A transaction recorded by a ``VirtualSsm``."""
+
+    # Time the transaction completed, from ``time.time``.
+    timestamp: float
+
+    # Chimera ID of the GPIO or SPI device.
+    name: str
+
+    # GPIO state written, or SPI bytes transmitted.
+    data: Union[bool, bytes]
+
+
+class VirtualSpiDevice:
+    def __init__(self, parent: VirtualSsm, name: str):
+        """A virtual SPI device, mirroring the chimera SPI device interface.
+
+        This constructor should never be called by the user,
+        instead use ``VirtualSsm.spi_device``.
+
+        Args:
+            parent: Virtual SSM the device belongs to.
+            name: Chimera ID of the device.
+
+        """
+
+        self.name = name
+
+        # Called with every transmitted request, returns the bytes to respond with.
+        # Without a responder, reads return zeros.
+        self.responder: Optional[Callable[[bytes], bytes]] = None
+
+        self._parent = parent
+
+    def transmit(self, data: bytes):
+        """Transmit bytes to the device.
+
+        Args:
+            data: Bytes to transmit.
+
+        """
+
+        self._parent._record(self.name, bytes(data))
+        if self.responder is not None:
+            self.responder(bytes(data))
+
+    def receive(self, length: int) -> bytes:
+        """Receive bytes from the device.
+
+        Args:
+            length: Number of bytes to receive.
+
+        Returns:
+            The received bytes.
+
+        """
+
+        return self.transaction(b"", length)
+
+    def transaction(self, request: bytes, response_length: int) -> bytes:
+        """Transmit a request, then receive a response.
+
+        Args:
+            request: Bytes to transmit.
+            response_length: Number of bytes to receive.
+
+        Returns:
+            The received bytes.
+
+        """
+
+        self._parent._record(self.name, bytes(request))
+        response = b"" if self.responder is None else self.responder(bytes(request))
+        return response[:response_length].ljust(response_length, b"\x00")
+
+
+class VirtualSsm:
+    def __init__(self, transaction_latency_secs: float = 0.0, max_events: int = 100000):
+        """An in-process stand-in for a chimera SSM handle, for running without hardware.
+
+        Pass it to ``Ssm``, ``FsmFakes``, ``RsmFakes``, or ``Hil`` as the backend.
+        Every GPIO write and SPI transaction is recorded with a timestamp,
+        and LTC2620 DAC commands are decoded back into per-channel voltages.
+
+        Args:
+            transaction_latency_secs: Modelled latency of each transaction,
+                ie. the USB round trip to a real SSM.
+            max_events: Number of most recent transactions kept in ``events``,
+                so long runs, ie. with PWM edges, stay bounded.
+
+        """
+
+        self.transaction_latency_secs = transaction_latency_secs
+
+        self.events: collections.deque = collections.deque(maxlen=max_events)
+        self.gpio_states: Dict[str, bool] = {}
+
+        self._spi_devices: Dict[str, VirtualSpiDevice] = {}
+        self._lock = threading.Lock()
+
+        # Mirror of the LTC2620 input and DAC registers, indexed by DAC channel id.
+        self._dac_input_codes = [0] * 8
+        self._dac_output_codes = [0] * 8
+
+    def spi_device(self, name: str) -> VirtualSpiDevice:
+        """Get a SPI device by its chimera ID.
+
+        Args:
+            name: Chimera ID of the device.
+
+        Returns:
+            The virtual SPI device.
+
+        """
+
+        return self._spi_devices.setdefault(name, VirtualSpiDevice(self, name))
+
+    def gpio_write(self, name: str, state: bool):
+        """Write a GPIO.
+
+        Args:
+            name: Chimera ID of the GPIO.
+            state: State to write.
+
+        """
+
+        self._record(name, state)
+        self.gpio_states[name] = state
+
+        # The DAC clears every register while its clear pin is held low.
+        if name == Ssm._DAC_N_CLEAR_NAME and not state:
+            with self._lock:
+                self._dac_input_codes = [0] * 8
+                self._dac_output_codes = [0] * 8
+
+    def dac_volts(self, channel: Ssm.AnalogChannel) -> float:
+        """Get the voltage a DAC channel is outputting.
+
+        Args:
+            channel: Channel to query.
+
+        Returns:
+            Output voltage of the channel in volts.
+
+        Raises:
+            ValueError: The channel is ``ALL``, which outputs no single voltage.
+
+        """
+
+        if channel is Ssm.AnalogChannel.ALL:
+            raise ValueError("Query a single DAC channel, not ALL.")
+
+        with self._lock:
+            code = self._dac_output_codes[channel.value]
+
+        return code / Ssm._DAC_MAX_CODE * Ssm.DAC_REF_VOLTS
+
+    def clear_events(self):
+        """Drop all recorded events."""
+
+        with self._lock:
+            self.events.clear()
+
+    def _record(self, name: str, data: Union[bool, bytes]):
+        """Model the transaction latency, and record a transaction. For internal use only.
+
+        Args:
+            name: Chimera ID of the GPIO or SPI device.
+            data: GPIO state written, or SPI bytes transmitted.
+
+        """
+
+        if self.transaction_latency_secs > 0:
+            time.sleep(self.transaction_latency_secs)
+
+        with self._lock:
+            self.events.append(SsmEvent(time.time(), name, data))
+            if name == Ssm._DAC_NAME:
+                self._execute_dac_word(data)
+
+    def _execute_dac_word(self, word_bytes: bytes):
+        """Decode a LTC2620 input word and apply it to the registers. For internal use only.
+
+        Args:
+            word_bytes: 3 byte input word, see ``Ssm._dac_word``.
+
+        """
+
+        word = int.from_bytes(word_bytes[-3:], "big")
+        command = (word >> 20) & 0xF
+        channel = (word >> 16) & 0xF
+        code = (word >> 4) & 0xFFF
+
+        channels = range(8) if channel == Ssm.AnalogChannel.ALL.value else (channel,)
+
+        if command in (
+            Ssm._DacCommand.LOAD_CHANNEL.value,
+            Ssm._DacCommand.LOAD_ONE_AND_UPDATE_ALL_CHANNELS.value,
+            Ssm._DacCommand.LOAD_AND_UPDATE_CHANNEL.value,
+        ):
+            for target in channels:
+                self._dac_input_codes[target] = code
+
+        if command in (
+            Ssm._DacCommand.UPDATE_CHANNEL.value,
+            Ssm._DacCommand.LOAD_AND_UPDATE_CHANNEL.value,
+        ):
+            for target in channels:
+                self._dac_output_codes[target] = self._dac_input_codes[target]
+        elif command == Ssm._DacCommand.LOAD_ONE_AND_UPDATE_ALL_CHANNELS.value:
+            self._dac_output_codes = list(self._dac_input_codes)
@@ -0,0 +1,90 @@
+from typing import Any, Callable, Dict, List
+import os
+import time
+import uuid
+import can
+import pytest
+from formula_e_hil import dbc
+from formula_e_hil.can import Can
+
+# Small dbc covering plain, choice, alive counter, and multiplexed signals.
+DBC_PATH = os.path.join(os.path.dirname(__file__), "data", "test.dbc")
+
+
+@pytest.fixture
+def channel() -> str:
+    """Virtual bus channel private to one test."""
+
+    return f"test_{uuid.uuid4().hex}"
+
+
+@pytest.fixture
+def registry() -> dbc.DbcRegistry:
+    """Registry without an on-disk cache, so tests never touch the home directory."""
+
+    return dbc.DbcRegistry(cache_dir=None)
+
+
+@pytest.fixture
+def db(registry: dbc.DbcRegistry):
+    """Parsed test dbc."""
+
+    return registry.get(DBC_PATH)
+
+
+@pytest.fixture
+def peer(channel: str):
+    """Raw handle on the test's channel, standing in for the DUT."""
+
+    handle = can.Bus(interface="virtual", channel=channel)
+    yield handle
+    handle.shutdown()
+
+
+@pytest.fixture
+def bus(channel: str, registry: dbc.DbcRegistry):
+    """``Can`` on the test's channel."""
+
+    handle = can.Bus(interface="virtual", channel=channel)
+    can_bus = Can(handle, DBC_PATH, registry)
+    yield can_bus
+    can_bus.__exit__()
+    handle.shutdown()
+
+
+@pytest.fixture
+def send(peer: can.BusABC, db) -> Callable[[str, Dict[str, Any]], None]:
+    """Send a message from the peer, encoded from its signals."""
+
+    def send(message_name: str, signals: Dict[str, Any]):
+        message_type = db.get_message_by_name(message_name)
+        peer.send(
+            can.Message(
+                arbitration_id=message_type.frame_id,
+                is_extended_id=False,
+                data=message_type.encode(signals),
+            )
+        )
+
+    return send
+
+
+def wait_until(predicate: Callable[[], bool], timeout_secs: float = 2.0):
+    """Poll a predicate until it holds, failing the test on timeout."""
+
+    deadline = time.monotonic() + timeout_secs
+    while not predicate():
+        if time.monotonic() > deadline:
+            pytest.fail("Timed out waiting for condition.")
+        time.sleep(0.005)
+
+
+def drain(handle: can.BusABC, timeout_secs: float = 0.0) -> List[can.Message]:
+    """Receive every frame already queued on a handle."""
+
+    frames = []
+    while True:
+        frame = handle.recv(timeout_secs)
+        if frame is None:
+            return frames
+        frames.append(frame)
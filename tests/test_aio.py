@@ -0,0 +1,120 @@
+import asyncio
+import pytest
+from formula_e_hil import utils
+from formula_e_hil.aio import AsyncCan, AsyncFakes
+from formula_e_hil.fsm_fakes import FsmFakes
+from formula_e_hil.metrics import BusMetrics
+from formula_e_hil.ssm import Ssm
+from formula_e_hil.virtual_ssm import VirtualSsm
+from .conftest import drain
+
+VC_STATUS = {"VC_State": 1, "VC_Counter": 0, "VC_Checksum": 0, "VC_Torque": 12.5}
+
+
+def test_async_for_yields_decoded_frames(bus, send):
+    async def scenario():
+        async_bus = AsyncCan(bus, message_names=["VC_Status"])
+        try:
+            send("BMS_Status", {"BMS_Voltage": 400.0, "BMS_Temp": 30})
+            send("VC_Status", VC_STATUS)
+            async for name, signals, timestamp in async_bus:
+                return name, signals, timestamp
+        finally:
+            async_bus.close()
+
+    name, signals, timestamp = asyncio.run(asyncio.wait_for(scenario(), 2.0))
+    assert name == "VC_Status"
+    assert signals["VC_Torque"] == 12.5
+    assert timestamp > 0
+
+
+def test_wait_for_resolves_on_matching_frame(bus, send):
+    async def scenario():
+        async_bus = AsyncCan(bus)
+        try:
+            waits = [
+                asyncio.ensure_future(
+                    async_bus.wait_for("VC_Status", "VC_Torque", lambda t: t > 10)
+                )
+                for _ in range(10)
+            ]
+            await asyncio.sleep(0)
+            send("VC_Status", {**VC_STATUS, "VC_Torque": 1.0})
+            send("VC_Status", VC_STATUS)
+            return await asyncio.wait_for(asyncio.gather(*waits), 2.0)
+        finally:
+            async_bus.close()
+
+    timestamps = asyncio.run(scenario())
+    assert len(set(timestamps)) == 1
+
+
+def test_wait_for_times_out(bus):
+    async def scenario():
+        async_bus = AsyncCan(bus)
+        try:
+            await async_bus.wait_for("VC_Status", "VC_Torque", bool, timeout=0.05)
+        finally:
+            async_bus.close()
+
+    with pytest.raises(TimeoutError):
+        asyncio.run(scenario())
+
+
+def test_wait_for_reraises_predicate_errors(bus, send):
+    def predicate(_value):
+        raise ValueError("Predicate failed.")
+
+    async def scenario():
+        async_bus = AsyncCan(bus)
+        try:
+            wait = asyncio.ensure_future(
+                async_bus.wait_for("VC_Status", "VC_Torque", predicate, timeout=2.0)
+            )
+            await asyncio.sleep(0)
+            send("VC_Status", VC_STATUS)
+            await wait
+        finally:
+            async_bus.close()
+
+    with pytest.raises(ValueError):
+        asyncio.run(scenario())
+
+
+def test_periodic_task_sends_through_the_bus(bus, peer):
+    bus.metrics = BusMetrics()
+
+    async def scenario():
+        async_bus = AsyncCan(bus)
+        task = async_bus.transmit_message_periodic(
+            0.01, "INV_Command", {"INV_TorqueRequest": 5.0, "INV_Enable": 1}
+        )
+        await asyncio.sleep(0.1)
+        task.cancel()
+        async_bus.close()
+
+    asyncio.run(scenario())
+
+    frames = drain(peer, 0.05)
+    assert len(frames) >= 5
+    assert all(frame.arbitration_id == 0x101 for frame in frames)
+    assert bus.metrics.tx_frames == len(frames)
+
+
+def test_async_fakes_keep_write_order():
+    backend = VirtualSsm()
+    fakes = AsyncFakes(FsmFakes(backend))
+
+    async def scenario():
+        await fakes.set_steering_angle(10.0)
+        await fakes.set_steering_angle(-10.0)
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        fakes.close()
+
+    # Writes run one at a time, so the last one wins.
+    assert backend.dac_volts(Ssm.AnalogChannel.TWO) == pytest.approx(
+        utils.steering_angle_to_potential_volts(-10.0), abs=0.01
+    )
@@ -0,0 +1,106 @@
+import can
+import pytest
+from formula_e_hil.bms_frames import BmsFrameGenerator, CellFault
+from formula_e_hil.metrics import BusMetrics
+from .conftest import drain, wait_until
+
+# One segment of three cells, two in the multiplexed message and one plain.
+CELL_SIGNALS = ("BMS_MuxA", "BMS_MuxB", "BMS_Voltage")
+
+
+@pytest.fixture
+def generator(bus):
+    generator = BmsFrameGenerator(
+        bus,
+        segments=1,
+        cells_per_segment=3,
+        voltage_signal=lambda _segment, cell: CELL_SIGNALS[cell],
+        temperatures_per_segment=1,
+        temperature_signal="BMS_Temp",
+        static_signals={"BMS_Mux": {"BMS_MuxCommon": 9}},
+    )
+    yield generator
+    generator.__exit__()
+
+
+def decode(db, messages):
+    """Decode packed frames, keyed by message name and multiplexer value."""
+
+    decoded = {}
+    for message in messages:
+        message_type = db.get_message_by_frame_id(message.arbitration_id)
+        signals = message_type.decode(bytes(message.data))
+        decoded[(message_type.name, signals.get("BMS_MuxSelector"))] = signals
+    return decoded
+
+
+def test_pack_matches_cantools(generator, db):
+    generator.voltages[0] = [300, 400, 3.7]
+    generator.temperatures[0] = [-20]
+
+    decoded = decode(db, generator.pack())
+
+    assert decoded[("BMS_Mux", 0)]["BMS_MuxA"] == 300
+    assert decoded[("BMS_Mux", 1)]["BMS_MuxB"] == 400
+    assert decoded[("BMS_Mux", 1)]["BMS_MuxCommon"] == 9
+    assert decoded[("BMS_Status", None)] == {"BMS_Voltage": 3.7, "BMS_Temp": -20}
+
+
+def test_pack_saturates_out_of_range_values(generator, db):
+    generator.voltages[0] = [-1, 70000, 1000]
+
+    decoded = decode(db, generator.pack())
+
+    assert decoded[("BMS_Mux", 0)]["BMS_MuxA"] == 0
+    assert decoded[("BMS_Mux", 1)]["BMS_MuxB"] == 65535
+    assert decoded[("BMS_Status", None)]["BMS_Voltage"] == 655.35
+
+
+def test_faults_apply_from_their_start(generator, db):
+    generator.voltages[0] = [300, 400, 3.7]
+    generator.add_fault(CellFault.overvoltage(0, 2, 4.5, start_secs=1.0))
+    generator.add_fault(CellFault.drifting(0, 0, -10.0))
+
+    before = decode(db, generator.pack(0.5))
+    assert before[("BMS_Status", None)]["BMS_Voltage"] == 3.7
+    assert before[("BMS_Mux", 0)]["BMS_MuxA"] == 295
+
+    after = decode(db, generator.pack(2.0))
+    assert after[("BMS_Status", None)]["BMS_Voltage"] == 4.5
+    assert after[("BMS_Mux", 0)]["BMS_MuxA"] == 280
+
+    generator.clear_faults()
+    cleared = decode(db, generator.pack(2.0))
+    assert cleared[("BMS_Status", None)]["BMS_Voltage"] == 3.7
+
+
+def test_unknown_signal_raises(bus):
+    with pytest.raises(ValueError):
+        BmsFrameGenerator(bus, 1, 1, "BMS_Seg{segment}_Cell{cell}_Voltage")
+
+
+def test_send_is_counted_in_bus_metrics(generator, bus, peer):
+    bus.metrics = BusMetrics()
+
+    assert generator.send() == 0
+    assert len(drain(peer, 0.1)) == 3
+    assert (bus.metrics.tx_frames, bus.metrics.tx_errors) == (3, 0)
+
+    def send(_message, timeout=None):
+        raise can.CanError("Transmit buffer full.")
+
+    bus._can_bus.send = send
+    assert generator.send() == 3
+    assert (bus.metrics.tx_frames, bus.metrics.tx_errors) == (3, 3)
+    assert (generator.frames_sent, generator.send_errors) == (3, 3)
+
+
+def test_background_bursts(generator, peer):
+    generator.start(0.01)
+    wait_until(lambda: generator.cycles >= 5)
+    generator.stop()
+
+    stats = generator.stats()
+    assert stats["frames_per_cycle"] == 3
+    assert stats["frames_sent"] == 3 * stats["cycles"]
+    assert len(drain(peer, 0.1)) == stats["frames_sent"]
@@ -0,0 +1,44 @@
+import can
+from .conftest import wait_until
+
+VC_STATUS = {"VC_State": 1, "VC_Counter": 0, "VC_Checksum": 0, "VC_Torque": 12.5}
+
+
+def test_rx_dispatch_decodes_into_rx_table(bus, send):
+    send("VC_Status", VC_STATUS)
+    send("BMS_Status", {"BMS_Voltage": 400.0, "BMS_Temp": -5})
+
+    wait_until(lambda: bus.receive("BMS_Status", "BMS_Temp") is not None)
+    assert bus.receive("VC_Status", "VC_Torque") == 12.5
+    assert bus.receive_message("BMS_Status") == {"BMS_Voltage": 400.0, "BMS_Temp": -5}
+    assert bus.receive("INV_Command", "INV_Enable") is None
+
+
+def test_unknown_frames_are_counted(bus, peer):
+    peer.send(can.Message(arbitration_id=0x7FF, is_extended_id=False, data=bytes(8)))
+
+    wait_until(lambda: bus.unknown_frame_counts.get(0x7FF) == 1)
+    assert bus.metrics_snapshot()["unknown_frames"] == 1
+
+
+def test_truncated_frame_does_not_stop_rx_thread(bus, peer, send):
+    peer.send(can.Message(arbitration_id=0x100, is_extended_id=False, data=bytes(1)))
+    wait_until(lambda: bus.rx_failure_counts.get(0x100) == 1)
+    assert bus.last_rx_error is not None
+
+    send("VC_Status", VC_STATUS)
+    wait_until(lambda: bus.receive("VC_Status", "VC_Torque") == 12.5)
+    assert bus._can_rx_thread.is_alive()
+    assert bus.metrics_snapshot()["rx_failures"] == 1
+
+
+def test_raising_listener_does_not_stop_dispatch(bus, send):
+    def listener(_message: can.Message):
+        raise RuntimeError("Listener failed.")
+
+    bus.add_rx_listener(listener)
+    send("VC_Status", VC_STATUS)
+
+    wait_until(lambda: bus.receive("VC_Status", "VC_Torque") == 12.5)
+    assert bus.rx_failure_counts == {0x100: 1}
+    assert isinstance(bus.last_rx_error, RuntimeError)
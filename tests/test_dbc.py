@@ -0,0 +1,29 @@
+import os
+from formula_e_hil import dbc
+from .conftest import DBC_PATH
+
+
+def test_registry_shares_parsed_database(registry):
+    assert registry.get(DBC_PATH) is registry.get(DBC_PATH)
+    assert registry.get(DBC_PATH).get_message_by_name("VC_Status").frame_id == 0x100
+
+
+def test_warm_start_reads_cache(tmp_path):
+    cold = dbc.DbcRegistry(str(tmp_path)).get(DBC_PATH)
+    assert os.listdir(tmp_path / "parsed")
+
+    warm = dbc.DbcRegistry(str(tmp_path)).get(DBC_PATH)
+    assert warm is not cold
+    assert [message.name for message in warm.messages] == [
+        message.name for message in cold.messages
+    ]
+
+
+def test_unwritable_cache_is_best_effort(tmp_path, caplog):
+    # A file where the cache directory should be, so creating it fails.
+    cache_dir = tmp_path / "cache"
+    cache_dir.write_bytes(b"")
+
+    database = dbc.DbcRegistry(str(cache_dir)).get(DBC_PATH)
+    assert database.get_message_by_name("BMS_Status").frame_id == 0x102
+    assert "Failed to write dbc cache file" in caplog.text
@@ -0,0 +1,99 @@
+import time
+import can
+import pytest
+from formula_e_hil.fault_injection import FaultInjectionBus, FaultRule
+from .conftest import DBC_PATH, drain
+
+
+@pytest.fixture
+def fault_bus(channel, registry):
+    """Fault injection wrapper around a handle on the test's channel."""
+
+    bus = FaultInjectionBus(
+        can.Bus(interface="virtual", channel=channel), DBC_PATH, registry, seed=0
+    )
+    yield bus
+    bus.shutdown()
+
+
+def _frame(arbitration_id: int) -> can.Message:
+    return can.Message(
+        arbitration_id=arbitration_id, is_extended_id=False, data=bytes(8)
+    )
+
+
+def test_drop_tx(fault_bus, peer):
+    fault_bus.add_rule(FaultRule("drop", "VC_Status", "tx"))
+    fault_bus.send(_frame(0x100))
+    fault_bus.send(_frame(0x101))
+
+    assert [frame.arbitration_id for frame in drain(peer, 0.05)] == [0x101]
+    assert fault_bus.injection_counts() == {("VC_Status", "drop"): 1}
+
+
+def test_drop_every_nth_rx(fault_bus, peer):
+    fault_bus.add_rule(FaultRule("drop", "VC_Status", "rx", every_nth=2))
+    for _ in range(4):
+        peer.send(_frame(0x100))
+
+    assert len(drain(fault_bus, 0.05)) == 2
+
+
+def test_corrupt_flips_masked_bits(fault_bus, peer):
+    fault_bus.add_rule(FaultRule("corrupt", "VC_Status", "rx", bit_mask=0x0101))
+    peer.send(_frame(0x100))
+
+    frame = fault_bus.recv(1.0)
+    assert bytes(frame.data) == bytes([1, 1, 0, 0, 0, 0, 0, 0])
+    assert fault_bus.injections()[0].action == "corrupt"
+
+
+def test_duplicate_rx(fault_bus, peer):
+    fault_bus.add_rule(FaultRule("duplicate", "BMS_Status", "rx", count=2))
+    peer.send(_frame(0x102))
+
+    assert [frame.arbitration_id for frame in drain(fault_bus, 0.05)] == [0x102] * 3
+
+
+def test_delayed_rx_frame_is_restamped(fault_bus, peer):
+    fault_bus.add_rule(FaultRule("delay", "VC_Status", "rx", delay_secs=0.05))
+    sent = time.time()
+    peer.send(_frame(0x100))
+
+    frame = fault_bus.recv(1.0)
+    assert frame.arbitration_id == 0x100
+    assert frame.timestamp - sent >= 0.05
+
+
+def test_delayed_tx_frame_is_sent_later(fault_bus, peer):
+    fault_bus.add_rule(FaultRule("delay", "VC_Status", "tx", delay_secs=0.05))
+    start = time.monotonic()
+    fault_bus.send(_frame(0x100))
+
+    assert peer.recv(1.0).arbitration_id == 0x100
+    assert time.monotonic() - start >= 0.05
+    assert fault_bus.released_send_errors == 0
+
+
+def test_reorder_rx_lets_later_frames_pass(fault_bus, peer):
+    fault_bus.add_rule(FaultRule("reorder", "VC_Status", "rx", delay_secs=1.0, count=1))
+    peer.send(_frame(0x100))
+    peer.send(_frame(0x101))
+
+    frames = drain(fault_bus, 0.05)
+    assert [frame.arbitration_id for frame in frames] == [0x101, 0x100]
+    assert frames[0].timestamp <= frames[1].timestamp
+
+
+def test_removed_rule_stops_injecting(fault_bus, peer):
+    rule = fault_bus.add_rule(FaultRule("drop", "VC_Status"))
+    fault_bus.remove_rule(rule)
+    peer.send(_frame(0x100))
+
+    assert fault_bus.recv(1.0).arbitration_id == 0x100
+    assert fault_bus.injections() == []
+
+
+def test_rule_for_unknown_message_raises(fault_bus):
+    with pytest.raises(KeyError):
+        fault_bus.add_rule(FaultRule("drop", "VC_Missing"))
@@ -0,0 +1,108 @@
+import signal
+import threading
+import uuid
+import can
+import pytest
+from formula_e_hil import Hil
+from formula_e_hil.metrics import prometheus_text
+from formula_e_hil.virtual_ssm import VirtualSsm
+from .conftest import DBC_PATH, wait_until
+
+SUBSYSTEMS = {"fsm_fakes", "rsm_fakes", "bms_bus", "inverter_bus", "sensor_bus"}
+
+
+class _UnpluggedSsm(VirtualSsm):
+    """Virtual SSM whose every write fails, as if unplugged."""
+
+    def gpio_write(self, name: str, state: bool):
+        raise OSError("SSM disconnected.")
+
+
+@pytest.fixture(autouse=True)
+def restore_sigint():
+    """Restore the SIGINT handler each HIL replaces."""
+
+    handler = signal.getsignal(signal.SIGINT)
+    yield
+    signal.signal(signal.SIGINT, handler)
+
+
+@pytest.fixture
+def make_hil():
+    """Create virtual HILs on fresh channels, shutting them down after the test."""
+
+    hils = []
+
+    def make(**kwargs):
+        hil = Hil.virtual(DBC_PATH, channel_prefix=uuid.uuid4().hex, **kwargs)
+        hils.append(hil)
+        return hil
+
+    yield make
+    for hil in hils:
+        busses = [hil.bms_bus, hil.inverter_bus, hil.sensor_bus]
+        hil.__exit__()
+        for bus in busses:
+            bus._can_bus.shutdown()
+
+
+def test_eager_startup_brings_up_everything(make_hil):
+    hil = make_hil()
+
+    assert set(hil._subsystems) == SUBSYSTEMS
+    assert set(hil.startup_secs) == SUBSYSTEMS | {"total"}
+
+
+def test_lazy_startup_brings_up_on_access(make_hil):
+    hil = make_hil(lazy=True)
+    assert hil._subsystems == {}
+
+    bus = hil.inverter_bus
+    assert set(hil._subsystems) == {"inverter_bus"}
+    assert hil.inverter_bus is bus
+
+
+@pytest.mark.parametrize("lazy", [False, True])
+def test_sigint_stops_every_bus(make_hil, lazy):
+    hil = make_hil(lazy=lazy)
+    busses = [hil.bms_bus, hil.inverter_bus, hil.sensor_bus]
+
+    signal.getsignal(signal.SIGINT)(signal.SIGINT, None)
+
+    for bus in busses:
+        wait_until(lambda: not bus._can_rx_thread.is_alive())
+
+
+def test_failed_startup_shuts_down_the_rest():
+    handles = [can.Bus(interface="virtual", channel=uuid.uuid4().hex) for _ in range(3)]
+    threads = threading.active_count()
+
+    try:
+        with pytest.raises(OSError):
+            Hil(
+                *handles,
+                fsm_backend=_UnpluggedSsm(),
+                rsm_backend=VirtualSsm(),
+                dbc_url=DBC_PATH,
+            )
+
+        # Every RX thread and the RSM's PWM thread were stopped.
+        wait_until(lambda: threading.active_count() == threads)
+    finally:
+        for handle in handles:
+            handle.shutdown()
+
+
+def test_metrics_snapshot_when_enabled(make_hil):
+    hil = make_hil()
+    hil.set_metrics_enabled(True)
+    hil.inverter_bus.transmit_message(
+        "INV_Command", {"INV_TorqueRequest": 5.0, "INV_Enable": 1}
+    )
+
+    snapshot = hil.metrics_snapshot()
+    assert snapshot["busses"]["inverter"]["tx_frames"] == 1
+    assert set(snapshot["ssms"]) == {"fsm", "rsm"}
+    assert 'formula_e_hil_can_tx_frames_total{bus="inverter"} 1.0' in (
+        prometheus_text(snapshot)
+    )
@@ -0,0 +1,53 @@
+import math
+import pytest
+from formula_e_hil.history import SignalHistory
+from .conftest import wait_until
+
+VC_STATUS = {"VC_State": 1, "VC_Counter": 0, "VC_Checksum": 0, "VC_Torque": 12.5}
+
+
+def test_history_records_every_frame(bus, send):
+    history = bus.enable_history("VC_Status")
+    for torque in (1.0, 2.0, 3.0):
+        send("VC_Status", {**VC_STATUS, "VC_Torque": torque})
+
+    wait_until(lambda: len(history) == 3)
+    timestamps, torques = history.window("VC_Torque")
+    assert torques.tolist() == [1.0, 2.0, 3.0]
+    assert (timestamps[1:] >= timestamps[:-1]).all()
+
+    # Choices are stored as their raw numbers.
+    assert history.window("VC_State")[1].tolist() == [1.0, 1.0, 1.0]
+    assert history.stats("VC_Torque")["mean"] == 2.0
+
+
+def test_history_stores_multiplexed_out_signals_as_nan(bus, send):
+    history = bus.enable_history("BMS_Mux")
+    send("BMS_Mux", {"BMS_MuxSelector": 0, "BMS_MuxA": 5, "BMS_MuxCommon": 1})
+    send("BMS_Mux", {"BMS_MuxSelector": 1, "BMS_MuxB": 7, "BMS_MuxCommon": 2})
+
+    wait_until(lambda: len(history) == 2)
+    mux_a = history.window("BMS_MuxA")[1].tolist()
+    mux_b = history.window("BMS_MuxB")[1].tolist()
+    assert mux_a[0] == 5 and math.isnan(mux_a[1])
+    assert math.isnan(mux_b[0]) and mux_b[1] == 7
+    assert history.window("BMS_MuxCommon")[1].tolist() == [1.0, 2.0]
+    assert bus.rx_failure_counts == {}
+
+
+def test_enable_history_rejects_unknown_signal(bus):
+    with pytest.raises(KeyError):
+        bus.enable_history("VC_Status", ["VC_Missing"])
+
+
+def test_ring_keeps_newest_samples():
+    history = SignalHistory(["speed"], capacity=4)
+    for sample in range(6):
+        history.append(float(sample), {"speed": sample * 10})
+
+    timestamps, speeds = history.window("speed")
+    assert timestamps.tolist() == [2.0, 3.0, 4.0, 5.0]
+    assert speeds.tolist() == [20.0, 30.0, 40.0, 50.0]
+    assert history.window("speed", duration_secs=1.0)[1].tolist() == [40.0, 50.0]
+    assert history.first_crossing("speed", 35.0) == 4.0
+    assert history.first_crossing("speed", 35.0, rising=False) is None
@@ -0,0 +1,14 @@
+import numpy as np
+from formula_e_hil.isospi import _pec15_rows, pec15
+
+
+def test_pec15_datasheet_vectors():
+    # RDCVA and WRCFGA commands, from the LTC6813 datasheet.
+    assert pec15(bytes([0x00, 0x04])) == 0x07C2
+    assert pec15(bytes([0x00, 0x01])) == 0x3D6E
+
+
+def test_pec15_rows_match_scalar():
+    data = np.random.default_rng(0).integers(0, 256, (16, 6), dtype=np.uint8)
+
+    assert _pec15_rows(data).tolist() == [pec15(row.tobytes()) for row in data]
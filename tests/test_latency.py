@@ -0,0 +1,107 @@
+import threading
+import pytest
+from formula_e_hil.fsm_fakes import FsmFakes
+from formula_e_hil.latency import LatencyResults, measure_latency
+from formula_e_hil.ssm import Ssm
+from formula_e_hil.virtual_ssm import VirtualSsm
+
+RESPONSE_DELAY_SECS = 0.05
+
+
+class _Firmware(VirtualSsm):
+    """Virtual SSM standing in for a VC, which requests torque some time after
+    the APPS is pressed.
+
+    """
+
+    def __init__(self, send):
+        super().__init__(transaction_latency_secs=0.005)
+        self._send = send
+
+    def _record(self, name, data):
+        pressed = self.dac_volts(Ssm.AnalogChannel.FIVE) > 0
+        super()._record(name, data)
+        if not pressed and self.dac_volts(Ssm.AnalogChannel.FIVE) > 0:
+            threading.Timer(
+                RESPONSE_DELAY_SECS,
+                self._send,
+                ("INV_Command", {"INV_TorqueRequest": 5.0, "INV_Enable": 1}),
+            ).start()
+
+
+def _measure(fakes, bus, stimulus, **kwargs):
+    return measure_latency(
+        stimulus,
+        fakes,
+        bus,
+        "INV_Command",
+        "INV_TorqueRequest",
+        lambda torque: torque > 0,
+        reset=lambda: fakes.set_apps_percentage(0),
+        settle_secs=0.01,
+        round_trip_samples=5,
+        **kwargs,
+    )
+
+
+def test_measures_response_latency(bus, send):
+    fakes = FsmFakes(_Firmware(send))
+    results = _measure(fakes, bus, lambda: fakes.set_apps_percentage(25), repeats=3)
+
+    assert results.timeouts == 0
+    assert results.summary()["count"] == 3
+    assert all(0 < latency < 0.5 for latency in results.latencies_secs)
+
+
+def test_frames_before_the_stimulus_takes_effect_are_skipped(bus, send):
+    fakes = FsmFakes(_Firmware(send))
+
+    def stimulus():
+        # A stale response, sent before the stimulus reaches the SSM.
+        send("INV_Command", {"INV_TorqueRequest": 1.0, "INV_Enable": 1})
+        fakes.set_apps_percentage(25)
+
+    results = _measure(fakes, bus, stimulus, repeats=3)
+
+    assert results.timeouts == 0
+    assert all(latency > 0 for latency in results.latencies_secs)
+
+
+def test_missing_responses_are_timeouts(bus):
+    fakes = FsmFakes(VirtualSsm())
+    results = _measure(
+        fakes, bus, lambda: fakes.set_apps_percentage(25), repeats=2, timeout=0.05
+    )
+
+    assert results.timeouts == 2
+    assert results.summary() == {
+        "label": None,
+        "count": 0,
+        "timeouts": 2,
+        "round_trip_secs": results.round_trip_secs,
+    }
+
+
+def test_stimulus_without_transactions_raises(bus):
+    fakes = FsmFakes(VirtualSsm())
+
+    with pytest.raises(ValueError):
+        measure_latency(
+            lambda: None,
+            fakes,
+            bus,
+            "INV_Command",
+            "INV_TorqueRequest",
+            bool,
+            round_trip_samples=1,
+        )
+
+
+def test_results_round_trip_through_json(tmp_path):
+    results = LatencyResults([0.01, 0.02, 0.03], 1, 0.001, label="build")
+    path = str(tmp_path / "results.json")
+    results.save(path)
+
+    loaded = LatencyResults.load(path)
+    assert loaded.summary() == results.summary()
+    assert loaded.percentiles((50,)) == {50: pytest.approx(0.02)}
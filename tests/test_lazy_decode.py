@@ -0,0 +1,71 @@
+import can
+import pytest
+from formula_e_hil.can import Can
+from .conftest import DBC_PATH, wait_until
+
+VC_STATUS = {"VC_State": 1, "VC_Counter": 0, "VC_Checksum": 0, "VC_Torque": 12.5}
+
+
+@pytest.fixture
+def lazy_bus(channel, registry):
+    """Lazily decoding bus on the test's channel."""
+
+    bus = Can(
+        can.Bus(interface="virtual", channel=channel),
+        DBC_PATH,
+        registry,
+        lazy_decode=True,
+    )
+    yield bus
+    bus.__exit__()
+    bus._can_bus.shutdown()
+
+
+def test_frames_are_decoded_on_read(lazy_bus, send):
+    send("VC_Status", VC_STATUS)
+    wait_until(lambda: lazy_bus.rx_table.sequence("VC_Status") == 1)
+
+    # Only the raw frame is stored until the message is read.
+    assert lazy_bus.rx_table._decoded["VC_Status"][0] == 0
+    assert lazy_bus.receive("VC_Status", "VC_Torque") == 12.5
+
+    send("VC_Status", {**VC_STATUS, "VC_Torque": -3.0})
+    wait_until(lambda: lazy_bus.receive("VC_Status", "VC_Torque") == -3.0)
+
+
+def test_decode_failure_is_counted_not_raised(lazy_bus, peer, send):
+    send("VC_Status", VC_STATUS)
+    wait_until(lambda: lazy_bus.receive("VC_Status", "VC_Torque") == 12.5)
+
+    peer.send(can.Message(arbitration_id=0x100, is_extended_id=False, data=bytes(1)))
+    wait_until(lambda: lazy_bus.rx_table.sequence("VC_Status") == 2)
+
+    # The message keeps its last value, and the bad frame is counted once.
+    assert lazy_bus.receive("VC_Status", "VC_Torque") == 12.5
+    assert lazy_bus.receive("VC_Status", "VC_Torque") == 12.5
+    assert lazy_bus.rx_failure_counts == {0x100: 1}
+    assert lazy_bus.last_rx_error is not None
+    assert lazy_bus.metrics_snapshot()["rx_failures"] == 1
+
+
+def test_rx_table_stays_dict_compatible(lazy_bus, send):
+    table = lazy_bus.rx_table
+    assert set(table) == {"VC_Status", "INV_Command", "BMS_Status", "BMS_Mux"}
+    assert table.get("VC_Missing") is None
+
+    table["INV_Command"] = {"INV_TorqueRequest": 5.0, "INV_Enable": 1}
+    assert lazy_bus.receive("INV_Command", "INV_Enable") == 1
+
+    # Assigned values last until a newer frame arrives.
+    send("INV_Command", {"INV_TorqueRequest": 7.0, "INV_Enable": 0})
+    wait_until(lambda: lazy_bus.receive("INV_Command", "INV_Enable") == 0)
+    assert dict(table)["INV_Command"]["INV_TorqueRequest"] == 7.0
+
+
+def test_waiters_decode_every_frame(lazy_bus, send):
+    expectation = lazy_bus.expect(
+        "VC_Status", "VC_Torque", lambda torque: torque == 12.5
+    )
+    send("VC_Status", VC_STATUS)
+
+    assert expectation.wait(2.0) > 0
@@ -0,0 +1,90 @@
+import time
+import urllib.request
+import can
+from formula_e_hil.can import Can
+from formula_e_hil.metrics import BusMetrics, Histogram, MetricsServer, prometheus_text
+from .conftest import DBC_PATH, wait_until
+
+VC_STATUS = {"VC_State": 1, "VC_Counter": 0, "VC_Checksum": 0, "VC_Torque": 12.5}
+
+
+def test_metrics_are_off_by_default(bus, send):
+    transmitter = bus.transmit_message_periodic(
+        0.005, "INV_Command", {"INV_TorqueRequest": 0.0, "INV_Enable": 0}
+    )
+    send("VC_Status", VC_STATUS)
+    wait_until(lambda: bus.receive("VC_Status", "VC_Torque") == 12.5)
+    time.sleep(0.05)
+    snapshot = bus.metrics_snapshot()
+    transmitter.stop()
+
+    assert bus.metrics is None
+    assert "rx_frames" not in snapshot
+    assert "decode_secs" not in snapshot
+    assert snapshot["periodic_jitter"]["0x101"]["count"] == 0
+
+
+def test_enabled_metrics_count_and_time(bus, send):
+    bus.metrics = BusMetrics()
+    transmitter = bus.transmit_message_periodic(
+        0.005, "INV_Command", {"INV_TorqueRequest": 0.0, "INV_Enable": 0}
+    )
+    send("VC_Status", VC_STATUS)
+    bus.transmit_message("BMS_Status", {"BMS_Voltage": 400.0, "BMS_Temp": 30})
+    wait_until(lambda: bus.metrics.rx_frames == 1)
+    time.sleep(0.05)
+    snapshot = bus.metrics_snapshot()
+    transmitter.stop()
+
+    assert snapshot["rx_frames"] == 1
+    assert snapshot["tx_frames"] == 1
+    assert snapshot["decode_secs"]["count"] == 1
+    assert snapshot["periodic_jitter"]["0x101"]["count"] > 0
+
+
+def test_snapshot_leaves_counters_untouched(bus, send):
+    bus.metrics = BusMetrics()
+    send("VC_Status", VC_STATUS)
+    wait_until(lambda: bus.metrics.rx_frames == 1)
+
+    first = bus.metrics_snapshot()
+    second = bus.metrics_snapshot()
+    assert bus.metrics.rx_frames == first["rx_frames"] == second["rx_frames"] == 1
+    assert second["rx_frames_per_sec"] == 0.0
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram((1.0, 2.0))
+    for value in (0.5, 1.5, 1.5, 5.0):
+        histogram.observe(value)
+
+    assert histogram.as_dict() == {
+        "count": 4,
+        "sum": 8.5,
+        "buckets": [(1.0, 1), (2.0, 3), (float("inf"), 4)],
+    }
+
+
+def test_prometheus_text_over_http(channel, registry):
+    bus = Can(
+        can.Bus(interface="virtual", channel=channel), DBC_PATH, registry, metrics=True
+    )
+    server = MetricsServer(
+        lambda: prometheus_text(
+            {"busses": {"bms": bus.metrics_snapshot()}, "ssms": {}, "pwm": {}}
+        ),
+        port=0,
+    )
+
+    try:
+        bus.transmit_message("BMS_Status", {"BMS_Voltage": 400.0, "BMS_Temp": 30})
+        with urllib.request.urlopen(f"http://127.0.0.1:{server.port}/metrics") as page:
+            text = page.read().decode()
+    finally:
+        server.stop()
+        bus.__exit__()
+        bus._can_bus.shutdown()
+
+    assert "# TYPE formula_e_hil_can_tx_frames_total counter" in text
+    assert 'formula_e_hil_can_tx_frames_total{bus="bms"} 1.0' in text
+    assert 'formula_e_hil_can_decode_seconds_bucket{bus="bms",le="+Inf"} 0' in text
@@ -0,0 +1,87 @@
+import gc
+import time
+from .conftest import drain, wait_until
+
+VC_STATUS = {"VC_State": 1, "VC_Counter": 0, "VC_Checksum": 0, "VC_Torque": 12.5}
+
+
+def test_periodic_transmitter_update(bus, db, peer):
+    decode = db.get_message_by_name("INV_Command").decode
+    transmitter = bus.transmit_message_periodic(
+        0.01, "INV_Command", {"INV_TorqueRequest": 0, "INV_Enable": 0}
+    )
+
+    wait_until(lambda: peer.recv(0.1) is not None)
+    transmitter.update(INV_TorqueRequest=5)
+    assert transmitter.signals == {"INV_TorqueRequest": 5, "INV_Enable": 0}
+
+    def updated_frame_received() -> bool:
+        frame = peer.recv(0.1)
+        return frame is not None and decode(frame.data)["INV_TorqueRequest"] == 5
+
+    wait_until(updated_frame_received)
+
+    transmitter.stop()
+    transmitter.stop()
+    time.sleep(0.03)
+    drain(peer)
+    time.sleep(0.05)
+    assert drain(peer) == []
+
+
+def test_periodic_transmitter_stops_when_deleted(bus, db, peer):
+    decode = db.get_message_by_name("VC_Status").decode
+    transmitter = bus.transmit_message_periodic(
+        0.005, "VC_Status", VC_STATUS, counter_signal="VC_Counter"
+    )
+
+    frames = [peer.recv(1.0) for _ in range(20)]
+    counters = [decode(frame.data)["VC_Counter"] for frame in frames]
+    assert counters == [count % 16 for count in range(20)]
+
+    del transmitter
+    gc.collect()
+    time.sleep(0.03)
+    drain(peer)
+    time.sleep(0.05)
+    assert drain(peer) == []
+
+
+def test_periodic_transmitter_patches_checksum(bus, db, peer):
+    message_type = db.get_message_by_name("VC_Status")
+
+    def checksum(data: bytes) -> int:
+        return sum(data) & 0xF
+
+    transmitter = bus.transmit_message_periodic(
+        0.005,
+        "VC_Status",
+        VC_STATUS,
+        counter_signal="VC_Counter",
+        checksum_signal="VC_Checksum",
+        checksum=checksum,
+    )
+
+    try:
+        frames = [peer.recv(1.0) for _ in range(5)]
+    finally:
+        transmitter.stop()
+
+    for frame in frames:
+        signals = message_type.decode(frame.data)
+        unsigned = message_type.encode({**signals, "VC_Checksum": 0})
+        assert signals["VC_Checksum"] == checksum(unsigned)
+
+
+def test_unchanged_signals_are_not_reencoded(bus):
+    transmitter = bus.transmit_message_periodic(
+        0.01, "INV_Command", {"INV_TorqueRequest": 0, "INV_Enable": 0}
+    )
+
+    try:
+        message = transmitter._scheduled_frame.message
+        transmitter.update(INV_Enable=0)
+        transmitter.signals = {"INV_TorqueRequest": 0, "INV_Enable": 0}
+        assert transmitter._scheduled_frame.message is message
+    finally:
+        transmitter.stop()
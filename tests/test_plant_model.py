@@ -0,0 +1,164 @@
+import uuid
+import can
+import numpy as np
+import pytest
+from formula_e_hil import Hil
+from formula_e_hil.plant_model import FeedbackMessage, PlantRunner, PowertrainModel
+from .conftest import DBC_PATH, drain, wait_until
+
+TORQUE_SIGNALS = [("INV_Command", "INV_TorqueRequest")] * 2
+
+
+@pytest.fixture
+def channel_prefix() -> str:
+    return uuid.uuid4().hex
+
+
+@pytest.fixture
+def hil(channel_prefix: str):
+    """Virtual HIL on fresh channels."""
+
+    hil = Hil.virtual(DBC_PATH, channel_prefix=channel_prefix)
+    busses = [hil.bms_bus, hil.inverter_bus, hil.sensor_bus]
+    yield hil
+    hil.__exit__()
+    for bus in busses:
+        bus._can_bus.shutdown()
+
+
+def request_torque(hil: Hil, channel_prefix: str, torque_nm: int):
+    """Send a torque request from the VC, and wait for the HIL to receive it."""
+
+    message_type = hil.inverter_bus._db.get_message_by_name("INV_Command")
+    with can.Bus(interface="virtual", channel=f"{channel_prefix}_inverter") as vc:
+        vc.send(
+            can.Message(
+                arbitration_id=message_type.frame_id,
+                is_extended_id=False,
+                data=message_type.encode(
+                    {"INV_TorqueRequest": torque_nm, "INV_Enable": 1}
+                ),
+            )
+        )
+    wait_until(
+        lambda: hil.inverter_bus.receive("INV_Command", "INV_TorqueRequest")
+        == torque_nm
+    )
+
+
+def test_model_accelerates_under_torque():
+    model = PowertrainModel()
+    for _ in range(1000):
+        model.step(np.array([50.0, 50.0]), 0.0, 0.001)
+
+    outputs = model.outputs()
+    assert outputs["time_secs"] == pytest.approx(1.0)
+    assert 0.0 < outputs["speed_mps"] < 20.0
+
+    # Only the rear wheels are driven, so only they slip.
+    front_left, front_right, rear_left, rear_right = outputs["slip_ratios"]
+    assert rear_left == rear_right > 0.0
+    assert abs(front_left) < rear_left
+
+
+def test_model_is_stable_at_the_largest_step():
+    model = PowertrainModel()
+    model.reset(speed_mps=20.0)
+    for _ in range(200):
+        model.step(np.array([30.0, 30.0]), 0.0, 0.01)
+
+    assert np.isfinite(model.wheel_speeds).all()
+    assert 20.0 < model.speed_mps < 60.0
+
+    # Braking to a stop never spins the wheels backwards.
+    for _ in range(500):
+        model.step(np.zeros(2), 1000.0, 0.01)
+    assert model.speed_mps == 0.0
+    assert (model.wheel_speeds == 0.0).all()
+
+
+def test_runner_closes_the_loop(hil, channel_prefix):
+    request_torque(hil, channel_prefix, 50)
+    speeds = []
+
+    def feedback(outputs):
+        speeds.append(outputs["speed_mps"])
+        return {"BMS_Voltage": min(outputs["speed_mps"], 600.0), "BMS_Temp": 25}
+
+    runner = PlantRunner(
+        hil,
+        PowertrainModel(),
+        TORQUE_SIGNALS,
+        [FeedbackMessage("bms", "BMS_Status", feedback, period_steps=10)],
+        time_scale=None,
+    )
+    with can.Bus(interface="virtual", channel=f"{channel_prefix}_bms") as bms:
+        runner.run(0.1)
+        frames = drain(bms, 0.1)
+
+    assert runner.outputs()["time_secs"] == pytest.approx(0.1)
+    assert runner.outputs()["speed_mps"] > 0.0
+    assert len(frames) == len(speeds) == 10
+    assert speeds == sorted(speeds)
+
+    stats = runner.stats()
+    assert (stats["steps"], stats["overruns"], stats["missed_steps"]) == (100, 0, 0)
+
+
+def test_missing_torque_request_counts_as_zero(hil):
+    runner = PlantRunner(hil, PowertrainModel(), TORQUE_SIGNALS, time_scale=None)
+    runner.run(0.1)
+
+    assert runner.outputs()["speed_mps"] == 0.0
+
+
+def test_driver_inputs_are_written_only_on_change(hil):
+    calls = []
+
+    def driver(time_secs, _outputs):
+        calls.append(time_secs)
+        return 0.0, 50.0 if time_secs >= 0.05 else 0.0
+
+    writes = []
+    set_brake_pressure = hil.rsm_fakes.set_brake_pressure
+    hil.rsm_fakes.set_brake_pressure = lambda psi: (
+        writes.append(psi),
+        set_brake_pressure(psi),
+    )
+
+    runner = PlantRunner(
+        hil,
+        PowertrainModel(),
+        TORQUE_SIGNALS,
+        driver=driver,
+        driver_period_steps=10,
+        time_scale=None,
+    )
+    runner.run(0.1)
+
+    assert len(calls) == 10
+    assert writes == [0.0, 50.0]
+
+
+def test_real_time_run_keeps_pace(hil):
+    runner = PlantRunner(hil, PowertrainModel(), TORQUE_SIGNALS, step_secs=0.005)
+    runner.run(0.2)
+
+    stats = runner.stats()
+    assert stats["steps"] + stats["missed_steps"] == 40
+    assert runner.outputs()["time_secs"] == pytest.approx(0.2)
+    assert stats["achieved_time_scale"] == pytest.approx(1.0, rel=0.2)
+
+
+def test_wait_reraises_driver_error(hil):
+    def driver(_time_secs, _outputs):
+        raise ValueError("Apps percentage out of range.")
+
+    runner = PlantRunner(
+        hil, PowertrainModel(), TORQUE_SIGNALS, driver=driver, time_scale=None
+    )
+    with pytest.raises(ValueError):
+        runner.run(0.1)
+
+    # Raised once, and the runner can run again.
+    assert runner.wait()
@@ -0,0 +1,97 @@
+import pytest
+from formula_e_hil import utils
+from formula_e_hil.fsm_fakes import FsmFakes
+from formula_e_hil.playback import TracePlayer
+from formula_e_hil.rsm_fakes import RsmFakes
+from formula_e_hil.ssm import Ssm
+from formula_e_hil.virtual_ssm import VirtualSsm
+
+
+@pytest.fixture
+def fsm_backend():
+    return VirtualSsm()
+
+
+@pytest.fixture
+def fsm_fakes(fsm_backend):
+    return FsmFakes(fsm_backend)
+
+
+def test_plays_every_sample_to_the_dac(fsm_backend, fsm_fakes):
+    player = TracePlayer(200)
+    player.add_trace(fsm_fakes, "apps_percentage", [0.0, 10.0, 25.0, 50.0])
+    player.start()
+
+    assert player.wait(2.0)
+
+    # Samples more than a period late are skipped, on a loaded machine.
+    stats = player.stats()
+    assert stats["samples_played"] + stats["missed_deadlines"] == 4
+    expected_volts = utils.apps_percentage_to_potential_volts(50.0)
+    for channel in (Ssm.AnalogChannel.FIVE, Ssm.AnalogChannel.THREE):
+        assert fsm_backend.dac_volts(channel) == pytest.approx(expected_volts, abs=0.01)
+
+
+def test_traces_on_two_ssms_play_together(fsm_backend, fsm_fakes):
+    rsm_backend = VirtualSsm()
+    rsm_fakes = RsmFakes(rsm_backend)
+    player = TracePlayer(200)
+
+    try:
+        player.add_trace(fsm_fakes, "brake_pressure", [100.0, 200.0])
+        player.add_trace(rsm_fakes, "brake_pressure", [300.0, 400.0])
+        player.start()
+        assert player.wait(2.0)
+    finally:
+        rsm_fakes.__exit__()
+
+    assert fsm_backend.dac_volts(Ssm.AnalogChannel.SEVEN) == pytest.approx(
+        utils.brake_pressure_to_potential_volts(200.0), abs=0.01
+    )
+    assert rsm_backend.dac_volts(Ssm.AnalogChannel.FIVE) == pytest.approx(
+        utils.brake_pressure_to_potential_volts(400.0), abs=0.01
+    )
+
+
+def test_start_while_playing_raises(fsm_fakes):
+    player = TracePlayer(10)
+    player.add_trace(fsm_fakes, "steering_angle", [0.0] * 100)
+    player.start()
+
+    try:
+        with pytest.raises(AssertionError):
+            player.start()
+    finally:
+        player.stop()
+
+    # Stopped, so it can play again.
+    player.start(position=99)
+    assert player.wait(2.0)
+
+
+def test_pause_holds_position(fsm_fakes):
+    player = TracePlayer(100)
+    player.add_trace(fsm_fakes, "steering_angle", [0.0] * 1000)
+    player.start()
+
+    try:
+        player.pause()
+        position = player.stats()["position"]
+        assert not player.wait(0.05)
+        assert player.stats()["position"] == position
+
+        player.seek(990)
+        player.resume()
+        assert player.wait(2.0)
+    finally:
+        player.stop()
+
+
+def test_invalid_traces_raise(fsm_fakes):
+    player = TracePlayer(10)
+    player.add_trace(fsm_fakes, "apps_1_percentage", [0.0, 1.0])
+
+    with pytest.raises(ValueError):
+        player.add_trace(fsm_fakes, "steering_angle", [0.0])
+    with pytest.raises(ValueError):
+        player.add_trace(fsm_fakes, "apps_percentage", [0.0, 1.0])
@@ -0,0 +1,92 @@
+import time
+import pytest
+from formula_e_hil.pwm import PwmGenerator
+from formula_e_hil.ssm import Ssm
+from formula_e_hil.virtual_ssm import VirtualSsm
+from .conftest import wait_until
+
+CHANNEL = Ssm.DigitalChannel.TWO
+
+
+class _FailingSsm(VirtualSsm):
+    """Virtual SSM whose digital outputs fail, as if unplugged."""
+
+    def gpio_write(self, name: str, state: bool):
+        if name == CHANNEL.value:
+            raise OSError("SSM disconnected.")
+        super().gpio_write(name, state)
+
+
+def _levels(backend: VirtualSsm):
+    return [event.data for event in backend.events if event.name == CHANNEL.value]
+
+
+def test_pulse_train_frequency_and_edges():
+    backend = VirtualSsm()
+    pwm = PwmGenerator(Ssm(backend))
+
+    try:
+        pwm.set_channel(CHANNEL, 100)
+        time.sleep(0.2)
+        stats = pwm.stats(CHANNEL)
+    finally:
+        pwm.stop()
+
+    # Only edges are written, alternating from a rising edge.
+    levels = _levels(backend)
+    assert levels[:4] == [True, False, True, False]
+    assert all(level != previous for previous, level in zip(levels, levels[1:]))
+    assert stats["achieved_frequency_hz"] == pytest.approx(100, rel=0.2)
+
+
+def test_constant_outputs():
+    backend = VirtualSsm()
+    pwm = PwmGenerator(Ssm(backend))
+
+    try:
+        pwm.set_channel(CHANNEL, 100, duty_cycle=1)
+        assert backend.gpio_states[CHANNEL.value] is True
+        pwm.set_channel(CHANNEL, 0)
+        assert backend.gpio_states[CHANNEL.value] is False
+
+        time.sleep(0.05)
+        assert _levels(backend) == [True, False]
+    finally:
+        pwm.stop()
+
+
+@pytest.mark.parametrize("frequency_hz, duty_cycle", [(-1, 0.5), (10, 1.5)])
+def test_invalid_configuration_raises(frequency_hz, duty_cycle):
+    pwm = PwmGenerator(Ssm(VirtualSsm()))
+
+    try:
+        with pytest.raises(ValueError):
+            pwm.set_channel(CHANNEL, frequency_hz, duty_cycle)
+    finally:
+        pwm.stop()
+
+
+def test_stats_never_wait_on_writes():
+    pwm = PwmGenerator(Ssm(VirtualSsm(transaction_latency_secs=0.05)))
+
+    try:
+        pwm.set_channel(CHANNEL, 100)
+        time.sleep(0.02)
+
+        start = time.perf_counter()
+        pwm.stats(CHANNEL)
+        assert time.perf_counter() - start < 0.02
+    finally:
+        pwm.stop()
+
+
+def test_failed_write_is_reported():
+    pwm = PwmGenerator(Ssm(_FailingSsm()))
+    pwm.set_channel(CHANNEL, 100)
+    wait_until(lambda: not pwm._thread.is_alive())
+
+    with pytest.raises(RuntimeError):
+        pwm.stats(CHANNEL)
+    with pytest.raises(RuntimeError) as error:
+        pwm.stop()
+    assert isinstance(error.value.__cause__, OSError)
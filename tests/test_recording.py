@@ -0,0 +1,114 @@
+import math
+import can
+import pytest
+from can.interfaces.virtual import VirtualBus
+from formula_e_hil.can import Can
+from formula_e_hil.metrics import BusMetrics
+from formula_e_hil.recording import (
+    CanRecorder,
+    CanReplayer,
+    iter_messages,
+    read_recording,
+)
+from .conftest import DBC_PATH, drain, wait_until
+
+
+class _UnpluggedBus(VirtualBus):
+    """Virtual bus whose sends fail, as if the transceiver were unplugged."""
+
+    def send(self, msg, timeout=None):
+        raise can.CanOperationError("Transmit buffer full.")
+
+
+class _FullDisk:
+    """File whose writes fail, as if the disk were full."""
+
+    def write(self, data):
+        raise OSError("No space left on device.")
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def recording(tmp_path, bus, send):
+    """Recording of three frames from the test's bus."""
+
+    path = str(tmp_path / "recording.bin")
+    recorder = CanRecorder(path, [bus], batch_frames=2)
+    send(
+        "VC_Status",
+        {"VC_State": 0, "VC_Counter": 1, "VC_Checksum": 0, "VC_Torque": 1.5},
+    )
+    send("BMS_Status", {"BMS_Voltage": 400.0, "BMS_Temp": 30})
+    send(
+        "VC_Status",
+        {"VC_State": 1, "VC_Counter": 2, "VC_Checksum": 0, "VC_Torque": -2.0},
+    )
+    wait_until(lambda: recorder.frames_recorded == 3)
+    recorder.stop()
+    return path
+
+
+def test_recording_round_trips(recording, db):
+    messages = list(iter_messages(read_recording(recording)))
+
+    assert [message.arbitration_id for message in messages] == [0x100, 0x102, 0x100]
+    assert db.decode_message(0x100, messages[2].data)["VC_Torque"] == -2.0
+    assert all(message.channel == 0 for message in messages)
+
+
+def test_replay_is_counted_in_bus_metrics(recording, bus, peer):
+    bus.metrics = BusMetrics()
+    replayer = CanReplayer(bus, recording, speed=math.inf)
+    replayer.start()
+    assert replayer.wait(2.0)
+    replayer.stop()
+
+    assert [frame.arbitration_id for frame in drain(peer, 0.05)] == [
+        0x100,
+        0x102,
+        0x100,
+    ]
+    assert replayer.frames_sent == 3
+    assert bus.metrics.tx_frames == 3
+
+
+def test_replay_filters_messages(recording, bus, peer):
+    replayer = CanReplayer(bus, recording, speed=math.inf, message_names=["BMS_Status"])
+    replayer.start()
+    assert replayer.wait(2.0)
+    replayer.stop()
+
+    assert [frame.arbitration_id for frame in drain(peer, 0.05)] == [0x102]
+
+
+def test_replay_counts_failed_sends(recording, channel, registry):
+    bus = Can(_UnpluggedBus(channel=channel), DBC_PATH, registry, metrics=True)
+
+    try:
+        replayer = CanReplayer(bus, recording, speed=math.inf)
+        replayer.start()
+        assert replayer.wait(2.0)
+        replayer.stop()
+
+        assert replayer.frames_sent == 0
+        assert replayer.send_errors == 3
+        assert bus.metrics.tx_errors == 3
+    finally:
+        bus.__exit__()
+
+
+def test_writer_failure_is_raised_from_stop(tmp_path, bus, send):
+    recorder = CanRecorder(str(tmp_path / "recording.bin"), [bus], batch_frames=1)
+    recorder._file.close()
+    recorder._file = _FullDisk()
+    send(
+        "VC_Status",
+        {"VC_State": 0, "VC_Counter": 1, "VC_Checksum": 0, "VC_Torque": 0.0},
+    )
+    wait_until(lambda: recorder._writer_error is not None)
+
+    with pytest.raises(RuntimeError) as error:
+        recorder.stop()
+    assert isinstance(error.value.__cause__, OSError)
@@ -0,0 +1,74 @@
+import os
+import time
+import pytest
+from formula_e_hil.rig_pool import RigConfig, RigPool
+from .conftest import DBC_PATH
+
+
+def _rig_pid(hil):
+    hil.fsm_fakes.set_steering_angle(0.0)
+    return os.getpid()
+
+
+def _fail(hil):
+    raise AssertionError("Torque request never arrived.")
+
+
+def _crash(hil):
+    os._exit(3)
+
+
+def _hang(hil):
+    time.sleep(60)
+
+
+@pytest.fixture
+def make_pool():
+    """Create pools of virtual rigs, closing them after the test."""
+
+    pools = []
+
+    def make(*names):
+        pool = RigPool([RigConfig.virtual(name, dbc_url=DBC_PATH) for name in names])
+        pools.append(pool)
+        return pool
+
+    yield make
+    for pool in pools:
+        pool.close(timeout=1.0)
+
+
+def test_scenarios_are_spread_across_rigs(make_pool):
+    pool = make_pool("rig_a", "rig_b")
+    results = pool.run([_rig_pid] * 6 + [_fail], timeout=60.0)
+
+    assert all(result.passed for result in results[:6])
+    assert {result.rig for result in results[:6]} <= {"rig_a", "rig_b"}
+    assert len({result.value for result in results[:6]}) <= 2
+
+    assert not results[6].passed
+    assert "Torque request never arrived." in results[6].error
+
+
+def test_dead_rig_fails_only_its_scenario(make_pool):
+    pool = make_pool("rig_c")
+    crashed = pool.submit(_crash).result(60.0)
+
+    assert not crashed.passed
+    assert crashed.rig == "rig_c"
+    assert "exited (3)" in crashed.error
+
+    # No rig is left, so later scenarios fail rather than wait forever.
+    assert not pool.submit(_rig_pid).result(10.0).passed
+
+
+def test_close_terminates_stuck_rigs(make_pool):
+    pool = make_pool("rig_d")
+    future = pool.submit(_hang)
+    time.sleep(0.5)
+
+    start = time.monotonic()
+    pool.close(timeout=0.5)
+
+    assert time.monotonic() - start < 10.0
+    assert not future.result(0).passed
@@ -0,0 +1,139 @@
+import time
+import can
+import pytest
+from can.interfaces.virtual import VirtualBus
+from formula_e_hil.scheduler import PeriodicScheduler
+from .conftest import drain
+
+
+class _NativePeriodicBus(VirtualBus):
+    """Virtual bus claiming to send periodic frames natively."""
+
+    def _send_periodic_internal(self, *args, **kwargs):
+        return super()._send_periodic_internal(*args, **kwargs)
+
+
+def _frame(arbitration_id: int) -> can.Message:
+    return can.Message(
+        arbitration_id=arbitration_id, is_extended_id=False, data=bytes(8)
+    )
+
+
+def test_frames_sent_at_absolute_deadlines(channel, peer):
+    handle = can.Bus(interface="virtual", channel=channel)
+    scheduler = PeriodicScheduler(handle)
+    assert not scheduler._use_native_periodic
+
+    try:
+        scheduler.add(_frame(0x100), 0.01)
+        scheduler.add(_frame(0x101), 0.02)
+        time.sleep(0.2)
+        stats = scheduler.jitter_stats()
+    finally:
+        scheduler.stop()
+        handle.shutdown()
+
+    frames = drain(peer)
+    fast = sum(frame.arbitration_id == 0x100 for frame in frames)
+    slow = sum(frame.arbitration_id == 0x101 for frame in frames)
+    assert 15 <= fast <= 22
+    assert 8 <= slow <= 11
+    assert set(stats) == {"0x100", "0x101"}
+    assert scheduler.jitter_stats() == {}
+
+
+def test_tick_patches_frame_before_each_send(channel, peer):
+    handle = can.Bus(interface="virtual", channel=channel)
+    scheduler = PeriodicScheduler(handle)
+    sent = []
+
+    def tick(message: can.Message):
+        message.data[0] = len(sent)
+        sent.append(message.data[0])
+
+    try:
+        frame = scheduler.add(_frame(0x100), 0.005, tick)
+        frames = [peer.recv(1.0) for _ in range(5)]
+        assert [frame.data[0] for frame in frames] == [0, 1, 2, 3, 4]
+        assert scheduler.jitter_stats()["0x100"]["count"] >= 5
+    finally:
+        scheduler.remove(frame)
+        scheduler.remove(frame)
+        scheduler.stop()
+        handle.shutdown()
+
+
+def test_remove_stops_only_that_frame(channel, peer):
+    handle = can.Bus(interface="virtual", channel=channel)
+    scheduler = PeriodicScheduler(handle)
+
+    try:
+        removed = scheduler.add(_frame(0x100), 0.005)
+        scheduler.add(_frame(0x101), 0.005)
+        time.sleep(0.02)
+        scheduler.remove(removed)
+        time.sleep(0.02)
+        drain(peer)
+        time.sleep(0.05)
+        ids = {frame.arbitration_id for frame in drain(peer)}
+        assert ids == {0x101}
+    finally:
+        scheduler.stop()
+        handle.shutdown()
+
+
+def test_stop_stops_native_tasks(channel, peer):
+    handle = _NativePeriodicBus(channel=channel)
+    scheduler = PeriodicScheduler(handle)
+    assert scheduler._use_native_periodic
+
+    try:
+        frame = scheduler.add(_frame(0x100), 0.005)
+        assert frame.native_task is not None
+        assert peer.recv(1.0) is not None
+
+        # Offloaded frames have no scheduler-side jitter.
+        assert scheduler.jitter_stats() == {}
+
+        scheduler.stop()
+        time.sleep(0.03)
+        drain(peer)
+        time.sleep(0.05)
+        assert drain(peer) == []
+    finally:
+        handle.shutdown()
+
+
+def test_raising_tick_is_counted_without_stopping_other_frames(channel, peer):
+    handle = can.Bus(interface="virtual", channel=channel)
+    scheduler = PeriodicScheduler(handle)
+
+    def tick(_message: can.Message):
+        raise ValueError("Checksum failed.")
+
+    try:
+        failing = scheduler.add(_frame(0x100), 0.005, tick)
+        scheduler.add(_frame(0x101), 0.005)
+        time.sleep(0.05)
+        drain(peer)
+        assert peer.recv(1.0).arbitration_id == 0x101
+        assert failing.stats.send_errors >= 5
+        assert isinstance(scheduler.last_error, ValueError)
+        assert scheduler._thread.is_alive()
+    finally:
+        scheduler.stop()
+        handle.shutdown()
+
+
+@pytest.mark.parametrize("period_secs", [0.0, -0.01])
+def test_non_positive_period_raises(channel, period_secs):
+    handle = can.Bus(interface="virtual", channel=channel)
+    scheduler = PeriodicScheduler(handle)
+
+    try:
+        with pytest.raises(ValueError):
+            scheduler.add(_frame(0x100), period_secs)
+        assert scheduler._thread is None
+    finally:
+        scheduler.stop()
+        handle.shutdown()
@@ -0,0 +1,100 @@
+import itertools
+import os
+import can
+import pytest
+from formula_e_hil.can import Can
+from formula_e_hil.shared_rx import SharedRxTable
+from .conftest import DBC_PATH, wait_until
+
+VC_STATUS = {"VC_State": 1, "VC_Counter": 0, "VC_Checksum": 0, "VC_Torque": 12.5}
+
+# Virtual channels do not cross processes, so the decode process listens
+# on a UDP multicast group instead, one per test.
+_groups = itertools.count(1)
+
+
+@pytest.fixture
+def group():
+    """Fresh multicast group, skipping the test if multicast is unavailable."""
+
+    address = f"239.74.{os.getpid() % 256}.{next(_groups)}"
+    try:
+        can.Bus(interface="udp_multicast", channel=address).shutdown()
+    except Exception as error:
+        pytest.skip(f"UDP multicast unavailable: {error}")
+    return address
+
+
+@pytest.fixture
+def multicast_peer(group):
+    """Handle on the multicast group, standing in for the rest of the car."""
+
+    handle = can.Bus(interface="udp_multicast", channel=group)
+    yield handle
+    handle.shutdown()
+
+
+@pytest.fixture
+def process_bus(group, registry):
+    """Bus that receives and decodes in a separate process."""
+
+    bus = Can(
+        can.Bus(interface="udp_multicast", channel=group),
+        DBC_PATH,
+        registry,
+        decode_process_bus_kwargs={"interface": "udp_multicast", "channel": group},
+    )
+    yield bus
+    bus.__exit__()
+    bus._can_bus.shutdown()
+
+
+def _send(handle, db, message_name, signals):
+    message_type = db.get_message_by_name(message_name)
+    handle.send(
+        can.Message(
+            arbitration_id=message_type.frame_id,
+            is_extended_id=False,
+            data=message_type.encode(signals),
+        )
+    )
+
+
+def test_decode_process_fills_the_table(process_bus, multicast_peer, db):
+    _send(multicast_peer, db, "VC_Status", VC_STATUS)
+    _send(multicast_peer, db, "BMS_Status", {"BMS_Voltage": 400.0, "BMS_Temp": -5})
+
+    wait_until(lambda: process_bus.receive("BMS_Status", "BMS_Temp") == -5, 10.0)
+    assert process_bus.receive("VC_Status", "VC_Torque") == 12.5
+
+    # Integer signals come back as ints, and choices as raw numbers.
+    assert process_bus.receive("VC_Status", "VC_State") == 1
+    assert isinstance(process_bus.receive("VC_Status", "VC_State"), int)
+    assert process_bus.receive("INV_Command", "INV_Enable") is None
+    assert process_bus.rx_table.sequence("VC_Status") == 1
+
+
+def test_decode_process_counts_bad_frames(process_bus, multicast_peer):
+    multicast_peer.send(
+        can.Message(arbitration_id=0x100, is_extended_id=False, data=bytes(1))
+    )
+    multicast_peer.send(
+        can.Message(arbitration_id=0x7FF, is_extended_id=False, data=bytes(8))
+    )
+
+    wait_until(lambda: process_bus.rx_table.unknown_frames == 1, 10.0)
+    snapshot = process_bus.metrics_snapshot()
+    assert snapshot["rx_failures"] == 1
+    assert snapshot["unknown_frames"] == 1
+
+
+def test_features_needing_every_frame_raise(process_bus):
+    with pytest.raises(RuntimeError):
+        process_bus.subscribe("VC_Status")
+    with pytest.raises(RuntimeError):
+        process_bus.add_rx_listener(lambda _message: None)
+
+
+def test_failed_startup_raises_with_traceback(db):
+    with pytest.raises(RuntimeError, match="interface"):
+        SharedRxTable(db, {"interface": "no_such_interface", "channel": 0})
@@ -0,0 +1,78 @@
+import time
+import can
+import numpy as np
+import pytest
+from formula_e_hil.metrics import BusMetrics
+from formula_e_hil.signal_log import SignalLogger, read_signal_log, signal_dtype
+from .conftest import wait_until
+
+VC_STATUS = {"VC_State": 2, "VC_Counter": 0, "VC_Checksum": 0, "VC_Torque": 0.0}
+
+
+def test_signal_dtype_uses_smallest_columns(db):
+    dtype = signal_dtype(db.get_message_by_name("VC_Status"))
+
+    assert dtype.names == (
+        "timestamp",
+        "VC_State",
+        "VC_Counter",
+        "VC_Checksum",
+        "VC_Torque",
+    )
+    assert dtype["VC_State"] == np.uint8
+    assert dtype["VC_Torque"] == np.float64
+
+
+def test_logs_round_trip(bus, send, tmp_path):
+    bus.metrics = BusMetrics()
+    logger = SignalLogger(bus, str(tmp_path), ["VC_Status", "BMS_Mux"], batch_rows=4)
+    for count in range(10):
+        send("VC_Status", {**VC_STATUS, "VC_Counter": count, "VC_Torque": count / 2})
+    send("BMS_Mux", {"BMS_MuxSelector": 1, "BMS_MuxB": 7, "BMS_MuxCommon": 3})
+
+    wait_until(lambda: bus.metrics.rx_frames == 11)
+    logger.stop()
+
+    assert logger.frames_logged == 11
+    assert logger.frames_dropped == 0
+
+    log = read_signal_log(str(tmp_path / "VC_Status.npy"))
+    assert log["VC_Counter"].tolist() == list(range(10))
+    assert log["VC_Torque"].tolist() == [count / 2 for count in range(10)]
+    assert (np.diff(log["timestamp"]) >= 0).all()
+
+    # Multiplexed out integer signals are logged as 0.
+    mux = np.load(tmp_path / "BMS_Mux.npy", mmap_mode="r")
+    assert mux[["BMS_MuxA", "BMS_MuxB", "BMS_MuxCommon"]].tolist() == [(0, 7, 3)]
+
+
+def test_undecodable_frame_is_skipped(bus, peer, send, tmp_path):
+    bus.metrics = BusMetrics()
+    logger = SignalLogger(bus, str(tmp_path), ["VC_Status"])
+    peer.send(can.Message(arbitration_id=0x100, is_extended_id=False, data=bytes(1)))
+    send("VC_Status", VC_STATUS)
+
+    wait_until(lambda: bus.metrics.rx_frames == 2)
+    start = time.monotonic()
+    logger.stop()
+    assert time.monotonic() - start < 1.0
+
+    assert (logger.frames_logged, logger.frames_failed) == (1, 1)
+    assert read_signal_log(str(tmp_path / "VC_Status.npy"))["VC_State"].tolist() == [2]
+
+
+def test_stop_raises_if_writer_failed(bus, send, tmp_path):
+    bus.metrics = BusMetrics()
+    logger = SignalLogger(bus, str(tmp_path), ["VC_Status"], batch_rows=1)
+
+    def write_batch(_batch: np.ndarray, _fill: int):
+        raise OSError("No space left on device.")
+
+    logger._write_batch = write_batch
+    for _ in range(3):
+        send("VC_Status", VC_STATUS)
+    wait_until(lambda: bus.metrics.rx_frames == 3)
+
+    with pytest.raises(RuntimeError) as error:
+        logger.stop()
+    assert isinstance(error.value.__cause__, OSError)
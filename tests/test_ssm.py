@@ -0,0 +1,94 @@
+import threading
+import pytest
+from formula_e_hil.ssm import Ssm
+from formula_e_hil.virtual_ssm import VirtualSsm
+
+
+class _StallingSsm(VirtualSsm):
+    """Virtual SSM stalling its first DAC write after it is sent, until another
+    write is sent, or a short timeout.
+
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.first_write_sent = threading.Event()
+        self.second_write_sent = threading.Event()
+
+    def _record(self, name, data):
+        super()._record(name, data)
+        if name != Ssm._DAC_NAME:
+            return
+
+        if not self.first_write_sent.is_set():
+            self.first_write_sent.set()
+            self.second_write_sent.wait(0.2)
+        else:
+            self.second_write_sent.set()
+
+
+def _dac_events(backend: VirtualSsm):
+    return [event for event in backend.events if event.name == Ssm._DAC_NAME]
+
+
+def test_redundant_writes_are_elided():
+    backend = VirtualSsm()
+    ssm = Ssm(backend)
+
+    ssm.set_analog(Ssm.AnalogChannel.ONE, 1.0)
+    ssm.set_analog(Ssm.AnalogChannel.ONE, 1.0)
+    ssm.set_digital(Ssm.DigitalChannel.ONE, True)
+    ssm.set_digital(Ssm.DigitalChannel.ONE, True)
+
+    assert len(_dac_events(backend)) == 1
+    assert backend.dac_volts(Ssm.AnalogChannel.ONE) == pytest.approx(1.0, abs=0.01)
+    assert ssm.transaction_stats() == {
+        "spi_transactions": 1,
+        "spi_transactions_elided": 1,
+        "gpio_writes": 2,
+        "gpio_writes_elided": 1,
+    }
+
+
+def test_set_analogs_updates_all_channels_at_once():
+    backend = VirtualSsm()
+    ssm = Ssm(backend)
+
+    ssm.set_analogs({Ssm.AnalogChannel.ONE: 1.0, Ssm.AnalogChannel.TWO: 2.0})
+    assert len(_dac_events(backend)) == 2
+    assert backend.dac_volts(Ssm.AnalogChannel.TWO) == pytest.approx(2.0, abs=0.01)
+
+    # Only the changed channel is sent.
+    ssm.set_analogs({Ssm.AnalogChannel.ONE: 1.0, Ssm.AnalogChannel.TWO: 3.0})
+    assert len(_dac_events(backend)) == 3
+    assert backend.dac_volts(Ssm.AnalogChannel.ONE) == pytest.approx(1.0, abs=0.01)
+    assert backend.dac_volts(Ssm.AnalogChannel.TWO) == pytest.approx(3.0, abs=0.01)
+
+
+def test_invalidate_shadow_resends():
+    backend = VirtualSsm()
+    ssm = Ssm(backend)
+
+    ssm.set_analog(Ssm.AnalogChannel.ONE, 1.0)
+    ssm.invalidate_shadow()
+    ssm.set_analog(Ssm.AnalogChannel.ONE, 1.0)
+    assert len(_dac_events(backend)) == 2
+
+
+def test_concurrent_writes_keep_shadow_in_step():
+    backend = _StallingSsm()
+    ssm = Ssm(backend)
+
+    # The first write stalls once it reached the DAC, while another thread writes.
+    first = threading.Thread(
+        target=ssm.set_analog_codes, args=({Ssm.AnalogChannel.ONE: 100},)
+    )
+    first.start()
+    assert backend.first_write_sent.wait(1.0)
+    ssm.set_analog_codes({Ssm.AnalogChannel.ONE: 200})
+    first.join()
+
+    # Whatever the shadow believes is what the DAC outputs.
+    assert backend._dac_output_codes[Ssm.AnalogChannel.ONE.value] == 200
+    assert ssm._dac_output_codes[Ssm.AnalogChannel.ONE] == 200
+    assert ssm.spi_transactions == 2
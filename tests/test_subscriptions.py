@@ -0,0 +1,93 @@
+import threading
+import can
+import pytest
+from formula_e_hil.can import Can
+from .conftest import DBC_PATH, wait_until
+
+VC_STATUS = {"VC_State": 1, "VC_Counter": 0, "VC_Checksum": 0, "VC_Torque": 12.5}
+BMS_STATUS = {"BMS_Voltage": 400.0, "BMS_Temp": 30}
+
+
+@pytest.fixture
+def filtered_bus(channel, registry):
+    """Bus on the test's channel, filtered to its subscriptions."""
+
+    bus = Can(
+        can.Bus(interface="virtual", channel=channel),
+        DBC_PATH,
+        registry,
+        filter_to_subscriptions=True,
+    )
+    yield bus
+    bus.__exit__()
+    bus._can_bus.shutdown()
+
+
+def test_callback_receives_selected_signals(bus, send):
+    received = []
+    bus.subscribe(
+        "VC_Status",
+        lambda name, signals, timestamp: received.append((name, signals)),
+        signal_names=["VC_Torque"],
+    )
+    send("VC_Status", VC_STATUS)
+
+    wait_until(lambda: received)
+    assert received == [("VC_Status", {"VC_Torque": 12.5})]
+
+
+def test_callbacks_run_off_the_rx_thread(bus, send):
+    release = threading.Event()
+    bus.subscribe("VC_Status", lambda *_: release.wait(2.0))
+    send("VC_Status", VC_STATUS)
+    send("BMS_Status", BMS_STATUS)
+
+    # A blocked callback never stalls reception.
+    wait_until(lambda: bus.receive("BMS_Status", "BMS_Temp") == 30)
+    release.set()
+
+
+def test_raising_callback_is_counted(bus, send):
+    received = []
+
+    def callback(_name, signals, _timestamp):
+        received.append(signals["VC_Torque"])
+        raise RuntimeError("Callback failed.")
+
+    bus.subscribe("VC_Status", callback)
+    send("VC_Status", VC_STATUS)
+    send("VC_Status", {**VC_STATUS, "VC_Torque": 1.0})
+
+    wait_until(lambda: bus._callback_dispatcher.errors == 2)
+    assert received == [12.5, 1.0]
+
+
+def test_unsubscribed_callback_stops(bus, send):
+    received = []
+    subscription = bus.subscribe("VC_Status", lambda *args: received.append(args))
+    subscription.unsubscribe()
+    send("VC_Status", VC_STATUS)
+
+    wait_until(lambda: bus.receive("VC_Status", "VC_Torque") == 12.5)
+    assert received == []
+
+
+def test_filters_follow_subscriptions(filtered_bus, send):
+    subscription = filtered_bus.subscribe("BMS_Status")
+    send("VC_Status", VC_STATUS)
+    send("BMS_Status", BMS_STATUS)
+
+    wait_until(lambda: filtered_bus.receive("BMS_Status", "BMS_Temp") == 30)
+    assert filtered_bus.receive("VC_Status", "VC_Torque") is None
+
+    # With no subscriptions left, every frame is received again.
+    subscription.unsubscribe()
+    send("VC_Status", VC_STATUS)
+    wait_until(lambda: filtered_bus.receive("VC_Status", "VC_Torque") == 12.5)
+
+
+def test_unknown_names_raise(bus):
+    with pytest.raises(KeyError):
+        bus.subscribe("VC_Missing")
+    with pytest.raises(KeyError):
+        bus.subscribe("VC_Status", signal_names=["VC_Missing"])
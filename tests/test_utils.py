@@ -0,0 +1,32 @@
+import math
+import numpy as np
+import pytest
+from formula_e_hil import utils
+
+
+def test_scalar_and_array_conversions_match():
+    percentages = [0.0, 25.0, 100.0]
+
+    volts = utils.apps_percentage_to_potential_volts(percentages)
+    assert volts.tolist() == [
+        utils.apps_percentage_to_potential_volts(percentage)
+        for percentage in percentages
+    ]
+
+
+@pytest.mark.parametrize(
+    "convert, value",
+    [
+        (utils.suspension_travel_to_potential_volts, -0.01),
+        (utils.flow_rate_to_frequency_hz, -1.0),
+        (utils.brake_pressure_to_potential_volts, 1001.0),
+        (utils.apps_percentage_to_potential_volts, 101.0),
+        (utils.thermistor_temperature_to_potential_volts, 126.0),
+        (utils.apps_percentage_to_potential_volts, math.nan),
+    ],
+)
+def test_out_of_range_raises(convert, value):
+    with pytest.raises(ValueError):
+        convert(value)
+    with pytest.raises(ValueError):
+        convert(np.array([0.0, value]))
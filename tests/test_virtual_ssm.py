@@ -0,0 +1,71 @@
+import time
+import pytest
+from formula_e_hil.fsm_fakes import FsmFakes
+from formula_e_hil.ssm import Ssm
+from formula_e_hil.virtual_ssm import VirtualSsm
+
+
+def test_records_gpio_writes():
+    backend = VirtualSsm()
+    ssm = Ssm(backend)
+    ssm.set_interlock(Ssm.Interlock.ONE, True)
+
+    assert backend.gpio_states == {
+        Ssm._DAC_N_CLEAR_NAME: True,
+        Ssm.Interlock.ONE.value: True,
+    }
+    assert [(event.name, event.data) for event in backend.events] == [
+        (Ssm._DAC_N_CLEAR_NAME, True),
+        (Ssm.Interlock.ONE.value, True),
+    ]
+
+
+def test_decodes_dac_commands_into_volts():
+    backend = VirtualSsm()
+    fakes = FsmFakes(backend)
+    fakes.set_brake_pressure(500)
+
+    assert backend.dac_volts(Ssm.AnalogChannel.SEVEN) > 0
+    assert backend.dac_volts(Ssm.AnalogChannel.ONE) == 0
+
+    # Holding the clear pin low clears every register.
+    backend.gpio_write(Ssm._DAC_N_CLEAR_NAME, False)
+    assert backend.dac_volts(Ssm.AnalogChannel.SEVEN) == 0
+
+
+def test_dac_volts_of_all_raises():
+    with pytest.raises(ValueError):
+        VirtualSsm().dac_volts(Ssm.AnalogChannel.ALL)
+
+
+def test_events_are_bounded():
+    backend = VirtualSsm(max_events=3)
+    ssm = Ssm(backend)
+    for _ in range(5):
+        ssm.set_debug_led(True)
+        ssm.set_debug_led(False)
+
+    assert len(backend.events) == 3
+    assert backend.events[-1].data is False
+
+
+def test_spi_responder_answers_transactions():
+    backend = VirtualSsm()
+    device = backend.spi_device("SPI_TEST")
+    device.responder = lambda request: bytes(reversed(request))
+
+    assert device.transaction(b"\x01\x02", 4) == b"\x02\x01\x00\x00"
+    assert backend.spi_device("SPI_TEST") is device
+    assert backend.events[-1].data == b"\x01\x02"
+
+
+def test_transaction_latency_is_modelled():
+    backend = VirtualSsm(transaction_latency_secs=0.01)
+    ssm = Ssm(backend)
+
+    round_trips = ssm.measure_round_trip(5)
+    assert (round_trips >= 0.01).all()
+
+    start = time.perf_counter()
+    ssm.set_debug_led(True)
+    assert time.perf_counter() - start >= 0.01
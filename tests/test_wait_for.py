@@ -0,0 +1,54 @@
+import threading
+import time
+import pytest
+from .conftest import wait_until
+
+VC_STATUS = {"VC_State": 1, "VC_Counter": 0, "VC_Checksum": 0, "VC_Torque": 12.5}
+
+
+def test_expect_matches_frame_after_arming(bus, send):
+    send("VC_Status", VC_STATUS)
+    wait_until(lambda: bus.receive("VC_Status", "VC_Torque") == 12.5)
+
+    expectation = bus.expect("VC_Status", "VC_Torque", lambda torque: torque > 20)
+    send("VC_Status", {**VC_STATUS, "VC_Torque": 25.0})
+
+    assert expectation.wait(2.0) <= time.time()
+    with pytest.raises(TimeoutError):
+        bus.wait_for("VC_Status", "VC_Torque", lambda torque: torque < 0, 0.05)
+
+
+def test_wait_for_multiplexed_signal_skips_other_branch(bus, send):
+    expectation = bus.expect("BMS_Mux", "BMS_MuxB", lambda value: value == 7)
+    send("BMS_Mux", {"BMS_MuxSelector": 0, "BMS_MuxA": 5, "BMS_MuxCommon": 1})
+    send("BMS_Mux", {"BMS_MuxSelector": 1, "BMS_MuxB": 7, "BMS_MuxCommon": 2})
+
+    timestamp = expectation.wait(2.0)
+    assert bus.receive("BMS_Mux", "BMS_MuxB") == 7
+    assert timestamp == pytest.approx(time.time(), abs=1.0)
+
+
+def test_predicate_error_is_raised_in_waiting_thread(bus, send):
+    def predicate(_value):
+        raise ZeroDivisionError
+
+    expectation = bus.expect("VC_Status", "VC_Torque", predicate)
+    send("VC_Status", VC_STATUS)
+
+    with pytest.raises(ZeroDivisionError):
+        expectation.wait(2.0)
+
+
+def test_wait_for_any_returns_first_match(bus, send):
+    threading.Timer(
+        0.05, send, ("BMS_Status", {"BMS_Voltage": 1, "BMS_Temp": 1})
+    ).start()
+
+    index, _ = bus.wait_for_any(
+        [
+            ("VC_Status", "VC_Torque", lambda torque: torque > 0),
+            ("BMS_Status", "BMS_Temp", lambda temp: temp > 0),
+        ],
+        2.0,
+    )
+    assert index == 1